@@ -1,7 +1,7 @@
 import { useState, useEffect, useContext } from 'react';
 import { Link } from 'react-router-dom';
 import { AuthContext } from '../../context/AuthContext';
-import { likePost, unlikePost, getFollowing } from '../../services/api';
+import { likePost, unlikePost, getRelationships } from '../../services/api';
 import { showToast } from '../../utils/toast';
 import PostActions from './PostActions';
 import PostEditForm from './PostEditForm';
@@ -20,9 +20,8 @@ function PostCard({ post, onDelete }) {
     const checkFollowing = async () => {
       if (user && user.id !== post.author.id) {
         try {
-          const response = await getFollowing('me');
-          const followingIds = response.data.map((f) => f.id);
-          setIsFollowing(followingIds.includes(post.author.id));
+          const response = await getRelationships([post.author.id]);
+          setIsFollowing(Boolean(response.data[post.author.id]?.following));
         } catch (error) {
           console.error('Failed to check following status:', error);
           showToast.error('Failed to check following status.');
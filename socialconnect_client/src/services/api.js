@@ -70,8 +70,11 @@ export const updateProfile = (data) => {
 export const getUser = (userId) => api.get(`/api/users/${userId}/`);
 export const followUser = (userId) => api.post(`/api/users/${userId}/follow/`);
 export const unfollowUser = (userId) => api.delete(`/api/users/${userId}/unfollow/`);
-export const getFollowers = (userId) => api.get(`/api/users/${userId}/followers/`);
-export const getFollowing = (userId) => api.get(`/api/users/${userId}/following/`);
+// Membership checks only need ids; the full lists are cursor-paginated.
+const idsToUsers = (response) => ({ ...response, data: response.data.map((id) => ({ id })) });
+export const getFollowers = (userId) => api.get(`/api/users/${userId}/followers/?ids_only=1`).then(idsToUsers);
+export const getFollowing = (userId) => api.get(`/api/users/${userId}/following/?ids_only=1`).then(idsToUsers);
+export const getRelationships = (userIds) => api.get(`/api/users/relationships/?ids=${userIds.join(',')}`);
 
 export const createPost = (data) => {
   const formData = new FormData();
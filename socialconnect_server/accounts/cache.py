@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.cache import cache
+from socialconnect_server.conditional import bump_profiles
+from socialconnect_server.metrics import record_cache
+from .models import User
+
+USER_CACHE_KEY = 'accounts:user:{}'
+
+def get_cached_user(user_id):
+    """Return the User row for `user_id`, served from the cache for USER_CACHE_TIMEOUT seconds."""
+    key = USER_CACHE_KEY.format(user_id)
+    user = cache.get(key)
+    record_cache(user is not None)
+    if user is None:
+        user = User.objects.filter(pk=user_id).first()
+        if user is not None:
+            cache.set(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 60))
+    return user
+
+async def aget_cached_user(user_id):
+    """get_cached_user() for async views."""
+    key = USER_CACHE_KEY.format(user_id)
+    user = await cache.aget(key)
+    record_cache(user is not None)
+    if user is None:
+        user = await User.objects.filter(pk=user_id).afirst()
+        if user is not None:
+            await cache.aset(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 60))
+    return user
+
+def invalidate_user(user_id):
+    cache.delete(USER_CACHE_KEY.format(user_id))
+    bump_profiles([user_id])
+
+def invalidate_users(user_ids):
+    cache.delete_many([USER_CACHE_KEY.format(user_id) for user_id in user_ids])
+    bump_profiles(user_ids)
@@ -0,0 +1,52 @@
+"""Follower, following and post counts stored on User.
+
+Follows and posts saved or deleted through the ORM adjust the counts from
+signal receivers, inside the writing transaction. Bulk paths that skip signals
+(purge's raw deletes, `generate_dataset`) adjust or recount them here. The
+counts back profile serialization and the admin user listing's sorts and
+filters, which use the indexes on these columns.
+"""
+from collections import Counter
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from interactions.models import Follow
+from posts.models import Post
+from .models import User
+
+def _shifted(field, counts):
+    # Greatest keeps a drifted counter at zero rather than failing the unsigned column.
+    whens = [When(pk=user_id, then=Greatest(F(field) + delta, Value(0))) for user_id, delta in counts.items() if delta]
+    return Case(*whens, default=F(field), output_field=IntegerField()) if whens else F(field)
+
+def adjust_follow_counts(edges, delta):
+    """Add `delta` to both sides' counts for each (follower_id, following_id) in `edges`, in one UPDATE."""
+    followers, following = Counter(), Counter()
+    for follower_id, following_id in edges:
+        following[follower_id] += delta
+        followers[following_id] += delta
+    if edges:
+        User.objects.filter(pk__in=set(following) | set(followers)).update(
+            following_count=_shifted('following_count', following),
+            followers_count=_shifted('followers_count', followers),
+        )
+
+def adjust_posts_count(author_id, delta):
+    User.objects.filter(pk=author_id).update(posts_count=_shifted('posts_count', {author_id: delta}))
+
+def _count(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+def recount_user_counts(chunk_size=10000):
+    """Recompute every user's counts from the Follow and Post tables, one id range per UPDATE."""
+    last_id = 0
+    while True:
+        ids = list(User.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        User.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(
+            followers_count=_count(Follow.objects.all(), 'following'),
+            following_count=_count(Follow.objects.all(), 'follower'),
+            posts_count=_count(Post.objects.all(), 'author'),
+        )
+        last_id = ids[-1]
@@ -0,0 +1,85 @@
+"""Account data export as a stream of NDJSON records.
+
+The export is a generator pipeline: `export_records` walks the account's rows
+section by section with `.values()` querysets and `iterator(chunk_size=...)`
+(server-side cursors on PostgreSQL), `ndjson` turns each record into a line,
+`buffered` groups lines into write-sized chunks and `gzipped` optionally
+compresses them. Only one chunk of rows is held in memory at a time, however
+much history the account has.
+
+The first record describes the account; every record has a `type`.
+"""
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+from interactions.models import Comment, Follow, Like
+from notifications.models import Notification
+from posts.models import Post
+from .models import User
+
+EXPORT_CHUNK_SIZE = 2000
+BUFFER_BYTES = 64 * 1024
+
+ACCOUNT_FIELDS = ['id', 'username', 'email', 'first_name', 'last_name', 'bio', 'avatar_url', 'website', 'location',
+                  'privacy', 'is_active', 'date_joined', 'last_login']
+
+def export_sections(user):
+    """(record type, queryset of dicts) for each kind of row the account owns, in export order."""
+    return [
+        ('post', Post.objects.filter(author=user).order_by('id').values(
+            'id', 'content', 'category', 'image_url', 'like_count', 'comment_count', 'is_active', 'created_at', 'updated_at')),
+        ('comment', Comment.objects.filter(author=user).order_by('id').values(
+            'id', 'post_id', 'content', 'is_active', 'created_at')),
+        ('like', Like.objects.filter(user=user).order_by('id').values('id', 'post_id', 'created_at')),
+        ('following', Follow.objects.filter(follower=user).order_by('id').values(
+            'id', 'created_at', user_id=F('following_id'), username=F('following__username'))),
+        ('follower', Follow.objects.filter(following=user).order_by('id').values(
+            'id', 'created_at', user_id=F('follower_id'), username=F('follower__username'))),
+        ('notification', Notification.objects.filter(recipient=user).order_by('id').values(
+            'id', 'notification_type', 'sender_id', 'post_id', 'message', 'is_read', 'created_at',
+            sender_username=F('sender__username'))),
+    ]
+
+def export_records(user, chunk_size=EXPORT_CHUNK_SIZE):
+    # Notifications with ids up to the read watermark are read whatever their is_read flag says.
+    account = User.objects.filter(pk=user.pk).values(
+        *ACCOUNT_FIELDS, notifications_read_up_to=F('notification_read_mark__read_up_to')).get()
+    yield {'type': 'account', 'exported_at': timezone.now(), **account}
+    for record_type, rows in export_sections(user):
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield {'type': record_type, **row}
+
+def ndjson(records):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for record in records:
+        yield encoder.encode(record) + '\n'
+
+def buffered(lines, size=BUFFER_BYTES):
+    """Join lines into UTF-8 chunks of about `size` bytes, so each write carries many records."""
+    chunk, length = [], 0
+    for line in lines:
+        data = line.encode()
+        chunk.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield b''.join(chunk)
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(user, compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Bytes of the account's NDJSON export, gzip-compressed if `compress`."""
+    stream = buffered(ndjson(export_records(user, chunk_size)))
+    return gzipped(stream) if compress else stream
+
+def export_filename(user, compress=False):
+    return f'socialconnect-{user.username}-export.ndjson' + ('.gz' if compress else '')
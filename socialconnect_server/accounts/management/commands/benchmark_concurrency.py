@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from posts.models import Post
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def add_db_latency(latency):
+    """Sleep `latency` seconds per statement on every connection, standing in for a network round trip."""
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install, weak=False)
+    for connection in connections.all():
+        install(connection)
+
+
+class Command(BaseCommand):
+    help = ('Compare request throughput and latency for the read endpoints (feed, post list/detail, notifications, '
+            'profiles) under the WSGI deployment with a fixed thread pool and under ASGI with the async views, at '
+            'increasing client concurrency. Each server runs in its own process against the configured database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64], help='Concurrent clients per run.')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per run.')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads (e.g. gunicorn --threads).')
+        parser.add_argument('--db-latency-ms', type=float, default=2.0,
+                            help='Added to every SQL statement to model the network hop to Postgres (0 to disable).')
+        parser.add_argument('--prefix', default='synthetic', help='Username prefix of the generated users.')
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], help='Run one server in this process (used internally).')
+
+    def handle(self, *args, **options):
+        if options['server']:
+            return self.run_server(options)
+        results = []
+        for server in ('wsgi', 'asgi'):
+            # URL routing depends on ASYNC_READ_VIEWS, which is read once at startup.
+            env = dict(os.environ, ASYNC_READ_VIEWS='True' if server == 'asgi' else 'False')
+            command = [sys.executable, '-m', 'django', 'benchmark_concurrency', '--server', server,
+                       '--requests', str(options['requests']), '--threads', str(options['threads']),
+                       '--db-latency-ms', str(options['db_latency_ms']), '--prefix', options['prefix'],
+                       '--concurrency', *map(str, options['concurrency'])]
+            output = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+            if output.returncode:
+                raise CommandError(f'{server} run failed:\n{output.stderr}')
+            results.extend(json.loads(line) for line in output.stdout.splitlines() if line.startswith('{'))
+
+        self.stdout.write(f'{"server":<7}{"clients":>8}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"errors":>8}')
+        for row in results:
+            self.stdout.write(f'{row["server"]:<7}{row["concurrency"]:>8}{row["throughput"]:>9.1f}{row["p50"]:>9.1f}'
+                              f'{row["p95"]:>9.1f}{row["p99"]:>9.1f}{row["errors"]:>8}')
+        self.stdout.write(f'WSGI with {options["threads"]} threads vs ASGI async views; '
+                          f'{options["db_latency_ms"]} ms added per SQL statement.')
+
+    def run_server(self, options):
+        users = list(User.objects.filter(username__startswith=f'{options["prefix"]}_', is_active=True)[:50])
+        post_ids = list(Post.objects.filter(is_active=True, author__privacy='public').values_list('id', flat=True)[:500])
+        if not users or not post_ids:
+            raise CommandError('No users or public posts to request; run generate_dataset first.')
+        tokens = [f'Bearer {RefreshToken.for_user(user).access_token}' for user in users]
+        paths = ['/api/feed/', '/api/posts/', '/api/notifications/']
+        paths += [f'/api/posts/{pk}/' for pk in post_ids[:20]] + [f'/api/users/{user.pk}/' for user in users[:10]]
+        if options['db_latency_ms']:
+            add_db_latency(options['db_latency_ms'] / 1000)
+
+        def request_args(index):
+            return paths[index % len(paths)], {'Authorization': tokens[index % len(tokens)]}
+
+        run = self.run_asgi if options['server'] == 'asgi' else self.run_wsgi
+        for concurrency in options['concurrency']:
+            # Warm up connections, caches and code paths before timing.
+            run(request_args, concurrency, concurrency * 2, options['threads'])
+            wall, samples, errors = run(request_args, concurrency, options['requests'], options['threads'])
+            self.stdout.write(json.dumps({
+                'server': options['server'], 'concurrency': concurrency, 'throughput': len(samples) / wall,
+                'p50': percentile(samples, 0.5) * 1000, 'p95': percentile(samples, 0.95) * 1000,
+                'p99': percentile(samples, 0.99) * 1000, 'errors': errors,
+            }))
+
+    def run_wsgi(self, request_args, concurrency, total, threads):
+        """`concurrency` clients against a WSGI server that handles at most `threads` requests at once."""
+        from socialconnect_server.wsgi import application
+        client = httpx.Client(transport=httpx.WSGITransport(app=application), base_url='http://localhost')
+        server_threads = threading.Semaphore(threads)
+        counter = iter(range(total))
+        lock = threading.Lock()
+        samples, errors = [], [0]
+
+        def serve(path, headers):
+            with server_threads:
+                return client.get(path, headers=headers)
+
+        def worker():
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                started = time.perf_counter()
+                response = serve(*request_args(index))
+                elapsed = time.perf_counter() - started
+                with lock:
+                    samples.append(elapsed)
+                    errors[0] += response.status_code >= 400
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(worker)
+        return time.perf_counter() - started, samples, errors[0]
+
+    def run_asgi(self, request_args, concurrency, total, threads):
+        """`concurrency` clients against the ASGI application on one event loop."""
+        from socialconnect_server.asgi import application
+
+        async def main():
+            samples, errors = [], 0
+            counter = iter(range(total))
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=application), base_url='http://localhost') as client:
+                async def worker():
+                    nonlocal errors
+                    for index in counter:
+                        started = time.perf_counter()
+                        path, headers = request_args(index)
+                        response = await client.get(path, headers=headers)
+                        samples.append(time.perf_counter() - started)
+                        errors += response.status_code >= 400
+
+                started = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+                return time.perf_counter() - started, samples, errors
+
+        return asyncio.run(main())
@@ -0,0 +1,72 @@
+import json
+import random
+import time
+from operator import methodcaller
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from accounts.models import User
+from interactions.models import Follow, Like
+from interactions.partitioning import PARTITION_KEYS, partition_count
+from posts.models import Post
+
+# (label, queryset for (user id, other user id, post id), how the API evaluates it): the Like and Follow
+# lookups behind like buttons, like counts, the feed, follow buttons and follower lists.
+QUERIES = (
+    ('like status', lambda user, other, post: Like.objects.filter(post_id=post, user_id=user), methodcaller('exists')),
+    ('post like count', lambda user, other, post: Like.objects.filter(post_id=post), methodcaller('count')),
+    ('following ids', lambda user, other, post: Follow.objects.filter(follower_id=user).values_list('following_id', flat=True), list),
+    ('follow check', lambda user, other, post: Follow.objects.filter(follower_id=user, following_id=other), methodcaller('exists')),
+    ('follower page', lambda user, other, post: Follow.objects.filter(following_id=user).order_by('-id').values_list('follower_id', flat=True)[:20], list),
+)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def scanned_tables(queryset):
+    """Tables (partitions) the PostgreSQL plan for `queryset` reads, after partition pruning."""
+    names = set()
+
+    def walk(node):
+        if 'Relation Name' in node:
+            names.add(node['Relation Name'])
+        for child in node.get('Plans', ()):
+            walk(child)
+    for plan in json.loads(queryset.explain(format='json')):
+        walk(plan['Plan'])
+    return len(names)
+
+
+class Command(BaseCommand):
+    help = ('Time the Like and Follow lookups the API runs most on the current dataset (see generate_dataset) and '
+            'report how many partitions each one reads. Run it before and after partitioning '
+            '(`partition_interactions` or `migrate interactions`) to compare.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Executions per query.')
+        parser.add_argument('--samples', type=int, default=500, help='Users and posts to draw query arguments from.')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for the argument draws.')
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(is_active=True).values_list('id', flat=True)[:options['samples']])
+        posts = list(Post.objects.filter(like_count__gt=0).values_list('id', flat=True)[:options['samples']])
+        if not users or not posts:
+            raise CommandError('No users or liked posts to query; run generate_dataset first.')
+        for table, key in PARTITION_KEYS.items():
+            count = partition_count(connection, table)
+            self.stdout.write(f'{table}: ' + (f'{count} hash partitions by {key}' if count else f'plain table ({connection.vendor})'))
+
+        self.stdout.write(f'{"query":<16}{"p50 us":>9}{"p95 us":>9}{"mean us":>9}{"tables":>8}')
+        for label, build, evaluate in QUERIES:
+            rng = random.Random(options['seed'])
+            samples = []
+            for _ in range(options['iterations']):
+                queryset = build(rng.choice(users), rng.choice(users), rng.choice(posts))
+                start = time.perf_counter()
+                evaluate(queryset)
+                samples.append((time.perf_counter() - start) * 1e6)
+            tables = scanned_tables(build(users[0], users[-1], posts[0])) if connection.vendor == 'postgresql' else '-'
+            self.stdout.write(f'{label:<16}{percentile(samples, 0.5):>9.0f}{percentile(samples, 0.95):>9.0f}'
+                              f'{sum(samples) / len(samples):>9.0f}{tables:>8}')
@@ -0,0 +1,69 @@
+import io
+import logging
+import time
+from django.core.management.base import BaseCommand
+from socialconnect_server.log import BackgroundQueueHandler, EventLogger
+
+
+class _User:
+    id = 42
+    username = 'bench_user'
+
+
+class SlowSink(io.TextIOBase):
+    """Discards output after `latency` seconds per write, standing in for a disk or log shipper."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def write(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return len(text)
+
+
+def _isolated_logger(name, handler, level):
+    logger = logging.getLogger(f'benchmark_logging.{name}')
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+class Command(BaseCommand):
+    help = 'Compare request-thread cost of eager f-string logging with structured events on the background handler.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000, help='Log calls per scenario.')
+        parser.add_argument('--sink-latency-us', type=float, default=50.0, help='Simulated write latency of the log sink.')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        sink = SlowSink(options['sink_latency_us'] / 1e6)
+        fmt = '%(asctime)s %(levelname)s %(name)s %(message)s'
+        user = _User()
+
+        blocking = logging.StreamHandler(sink)
+        blocking.setFormatter(logging.Formatter(fmt))
+        background = BackgroundQueueHandler(logging.StreamHandler(sink), format=fmt)
+        eager = _isolated_logger('eager', blocking, logging.INFO)
+        structured = EventLogger('benchmark_logging.structured')
+        structured.logger = _isolated_logger('structured', background, logging.INFO)
+
+        scenarios = [
+            ('f-string, emitted', lambda: eager.info(f"User {user.username} (ID: {user.id}) liked post ID: {7}")),
+            ('event, emitted', lambda: structured.info('post.liked', user_id=user.id, post_id=7)),
+            ('f-string, disabled', lambda: eager.debug(f"User {user.username} (ID: {user.id}) liked post ID: {7}")),
+            ('event, disabled', lambda: structured.debug('post.liked', user_id=user.id, post_id=7)),
+        ]
+        for label, call in scenarios:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                call()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{label:>20}: {elapsed * 1e6 / iterations:8.2f} us/call on the request thread')
+
+        # The listener keeps writing after the loop; report how long the backlog takes to drain.
+        start = time.perf_counter()
+        background.stop()
+        self.stdout.write(f'{"background drain":>20}: {time.perf_counter() - start:8.2f} s after the last call')
@@ -0,0 +1,51 @@
+import time
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from accounts.serializers import UserSerializer
+from accounts.views import LoginView
+
+
+def legacy_login(identifier, password):
+    """The previous login flow: lookup + check_password, then authenticate() again and a full-row save."""
+    if '@' in identifier:
+        user = User.objects.filter(email=identifier).first()
+    else:
+        user = User.objects.filter(username=identifier).first()
+    if not user or not user.check_password(password) or not user.is_active:
+        raise ValueError('Invalid credentials.')
+    authenticated = authenticate(username=user.username, password=password)
+    refresh = RefreshToken.for_user(authenticated)
+    user.last_login = timezone.now()
+    user.save()
+    return {'refresh': str(refresh), 'access': str(refresh.access_token), 'user': UserSerializer(user).data}
+
+
+def current_login(identifier, password):
+    serializer = LoginView.serializer_class(data={'username': identifier, 'password': password})
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+class Command(BaseCommand):
+    help = 'Measure logins/sec for the legacy double-hash flow and the current single-pass login.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help='Logins per flow.')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        password = 'Bench-login-pass-123'
+        # Everything runs in a transaction that is rolled back, so no benchmark user is left behind.
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench_login_user', email='bench_login@example.com', password=password, is_active=True)
+            for label, login in (('legacy', legacy_login), ('single-pass', current_login)):
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    login(user.username, password)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'{label:>12}: {iterations / elapsed:8.2f} logins/sec ({elapsed * 1000 / iterations:.1f} ms/login)')
+            transaction.set_rollback(True)
@@ -0,0 +1,89 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: what a new worker does before it can answer its first request.
+CHILD = '''
+import io, json, sys, time
+start = time.perf_counter()
+import django
+from django.conf import settings
+django.setup(set_prefix=False)
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+host = next((h for h in settings.ALLOWED_HOSTS if h and '*' not in h and not h.startswith('.')), 'localhost')
+environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': host,
+           'SERVER_PORT': '80', 'HTTP_HOST': host, 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+           'wsgi.errors': sys.stderr}
+status = []
+b''.join(application(environ, lambda s, headers, exc_info=None: status.append(s)))
+first = time.perf_counter()
+print(json.dumps({'setup': setup - start, 'urls': urls - setup, 'first_request': first - urls,
+                  'total': first - start, 'status': status[0], 'modules': sorted(sys.modules)}))
+'''
+
+
+def run_child(path, importtime=False):
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', CHILD, path]
+    output = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    if output.returncode:
+        raise CommandError(f'Startup run failed:\n{output.stderr}')
+    return json.loads(output.stdout.splitlines()[-1]), output.stderr
+
+
+def import_profile(stderr):
+    """(module, cumulative ms) for each top-level import in `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit() and not name.startswith('  '):  # nested imports are counted in their importer
+            rows.append((name.strip(), int(cumulative) / 1000))
+    return rows
+
+
+class Command(BaseCommand):
+    help = ('Measure how long a new worker takes to import the project and answer its first request, in fresh '
+            'interpreters, with an import-time profile of the slowest modules. Fails when the median time to first '
+            'request exceeds the budget.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time; the median is reported.')
+        parser.add_argument('--path', default='/api/', help='Path of the first request.')
+        parser.add_argument('--top', type=int, default=15, help='Slowest top-level imports to list.')
+        parser.add_argument('--budget-ms', type=float, default=getattr(settings, 'STARTUP_BUDGET_MS', 1500),
+                            help='Maximum median time to first request (default STARTUP_BUDGET_MS).')
+
+    def handle(self, *args, **options):
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+        runs = [run_child(options['path'])[0] for _ in range(options['runs'])]
+        # A separate run: -X importtime slows the imports it reports on.
+        profiled, stderr = run_child(options['path'], importtime=True)
+
+        if runs[0]['status'].startswith('5'):
+            raise CommandError(f'First request to {options["path"]} failed with {runs[0]["status"]}.')
+        self.stdout.write(f'First request: {runs[0]["status"]} for {options["path"]}, median of {len(runs)} runs')
+        for phase, label in [('setup', 'django.setup()'), ('urls', 'URLconf import'),
+                             ('first_request', 'first request'), ('total', 'time to first request')]:
+            self.stdout.write(f'{label:>22}: {statistics.median(run[phase] for run in runs) * 1000:8.1f} ms')
+
+        self.stdout.write('\nSlowest top-level imports (cumulative, under -X importtime):')
+        for name, ms in sorted(import_profile(stderr), key=lambda row: -row[1])[:options['top']]:
+            self.stdout.write(f'{ms:8.1f} ms  {name}')
+        heavy = [name for name in ('supabase', 'httpx', 'gotrue', 'postgrest', 'storage3') if name in profiled['modules']]
+        self.stdout.write(f'\nLoaded at startup: {", ".join(heavy)}' if heavy else '\nNo upload client loaded at startup.')
+
+        total = statistics.median(run['total'] for run in runs) * 1000
+        if total > options['budget_ms']:
+            raise CommandError(f'Time to first request {total:.1f} ms exceeds the budget of {options["budget_ms"]:.0f} ms.')
+        self.stdout.write(self.style.SUCCESS(f'Time to first request {total:.1f} ms is within the budget of '
+                                             f'{options["budget_ms"]:.0f} ms.'))
@@ -0,0 +1,166 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from posts.models import Post
+
+# (operation, weight): a read-heavy mix, roughly what the frontend issues per session.
+DEFAULT_MIX = (
+    ('feed', 30), ('post_list', 15), ('post_detail', 15), ('notifications', 10), ('like', 10),
+    ('comment', 6), ('post_create', 4), ('token_refresh', 6), ('login', 4),
+)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Session:
+    """One simulated user: an authenticated test client plus the refresh token it keeps rotating."""
+
+    def __init__(self, user, password, post_ids, rng):
+        self.user = user
+        self.password = password
+        self.post_ids = post_ids
+        self.rng = rng
+        self.client = Client()
+        self.liked = set()
+        refresh = RefreshToken.for_user(user)
+        self.set_tokens(str(refresh), str(refresh.access_token))
+
+    def set_tokens(self, refresh, access):
+        self.refresh = refresh
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {access}'
+
+    def run(self, operation):
+        post_id = self.rng.choice(self.post_ids)
+        if operation == 'feed':
+            return self.client.get('/api/feed/')
+        if operation == 'post_list':
+            return self.client.get('/api/posts/')
+        if operation == 'post_detail':
+            return self.client.get(f'/api/posts/{post_id}/')
+        if operation == 'notifications':
+            return self.client.get('/api/notifications/')
+        if operation == 'like':
+            # Toggle, so the mix exercises both halves; likes left by earlier runs are learned from the response.
+            if post_id in self.liked:
+                self.liked.discard(post_id)
+                return self.client.delete(f'/api/posts/{post_id}/unlike/')
+            response = self.client.post(f'/api/posts/{post_id}/like/')
+            detail = response.json().get('detail') if response.status_code == 200 else None
+            if detail == 'Already liked.':
+                response = self.client.delete(f'/api/posts/{post_id}/unlike/')
+            elif detail == 'Liked.':
+                self.liked.add(post_id)
+            return response
+        if operation == 'comment':
+            return self.client.post(f'/api/posts/{post_id}/comments/', {'content': 'Benchmark comment'}, content_type='application/json')
+        if operation == 'post_create':
+            return self.client.post('/api/posts/', {'content': 'Benchmark post', 'category': 'general'}, content_type='application/json')
+        if operation == 'token_refresh':
+            response = self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh}, content_type='application/json')
+            if response.status_code == 200:
+                # Refresh tokens rotate and the old one is blacklisted, so keep the new pair.
+                self.set_tokens(response.json()['refresh'], response.json()['access'])
+            return response
+        if operation == 'login':
+            return self.client.post('/api/auth/login/', {'username': self.user.username, 'password': self.password}, content_type='application/json')
+        raise ValueError(f'Unknown operation {operation}')
+
+    def attempt(self, operation):
+        try:
+            return self.run(operation).status_code
+        except Exception:
+            # Database lock timeouts and similar surface as exceptions from the test client.
+            return 500
+
+
+class Command(BaseCommand):
+    help = ('Replay a weighted read/write mix (feed, posts, notifications, likes, comments, login, token refresh) '
+            'through the full middleware stack and report throughput and p50/p95/p99 latency per endpoint. '
+            'Writes are kept in the database; run it against a dataset from generate_dataset, not production.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Measured requests across all workers.')
+        parser.add_argument('--warmup', type=int, default=50, help='Unmeasured requests per worker before timing starts.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Worker threads, each with its own client and database connection.')
+        parser.add_argument('--users', type=int, default=100, help='Active users to sample sessions from.')
+        parser.add_argument('--prefix', default='synthetic', help='Username prefix of the generated users.')
+        parser.add_argument('--password', default='Synthetic-pass-123', help='Password of the generated users (used by login).')
+        parser.add_argument('--only', nargs='*', choices=[name for name, _ in DEFAULT_MIX], help='Restrict the mix to these operations.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        users = list(User.objects.filter(username__startswith=f'{options["prefix"]}_', is_active=True).order_by('?')[:options['users']])
+        post_ids = list(Post.objects.filter(is_active=True, author__privacy='public').values_list('id', flat=True)[:5000])
+        if not users or not post_ids:
+            raise CommandError('No users or public posts to drive the workload; run generate_dataset first.')
+        mix = [(name, weight) for name, weight in DEFAULT_MIX if not options['only'] or name in options['only']]
+        operations, weights = zip(*mix)
+
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        per_worker = options['requests'] // options['concurrency']
+
+        def worker(seed):
+            worker_rng = random.Random(seed)
+            try:
+                session = Session(worker_rng.choice(users), options['password'], post_ids, worker_rng)
+                for _ in range(options['warmup']):
+                    session.attempt(worker_rng.choices(operations, weights)[0])
+            except Exception:
+                barrier.abort()
+                raise
+            try:
+                barrier.wait()
+                for _ in range(per_worker):
+                    operation = worker_rng.choices(operations, weights)[0]
+                    started = time.perf_counter()
+                    status_code = session.attempt(operation)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        samples[operation].append(elapsed)
+                        if status_code >= 500 or status_code in (401, 403):
+                            errors[operation] += 1
+            finally:
+                connections.close_all()
+
+        barrier = threading.Barrier(options['concurrency'] + 1)
+        # Allows the `testserver` host, swaps in the locmem email backend and captures template renders.
+        setup_test_environment()
+        try:
+            threads = [threading.Thread(target=worker, args=(rng.random(),)) for _ in range(options['concurrency'])]
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            wall = time.perf_counter() - started
+        finally:
+            teardown_test_environment()
+
+        total = sum(len(values) for values in samples.values())
+        self.stdout.write(f'{"endpoint":<14}{"count":>7}{"errors":>8}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+        for operation in operations:
+            values = samples.get(operation)
+            if not values:
+                continue
+            self.stdout.write(
+                f'{operation:<14}{len(values):>7}{errors[operation]:>8}{len(values) / wall:>9.1f}'
+                f'{percentile(values, 0.50) * 1000:>9.1f}{percentile(values, 0.95) * 1000:>9.1f}{percentile(values, 0.99) * 1000:>9.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} requests in {wall:.2f}s with {options["concurrency"]} workers: {total / wall:.1f} req/s '
+            f'({connections["default"].vendor}).'
+        ))
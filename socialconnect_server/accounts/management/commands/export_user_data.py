@@ -0,0 +1,34 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from accounts.export import EXPORT_CHUNK_SIZE, export_filename, export_stream
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = ("Stream a user's posts, comments, likes, follows and notifications as NDJSON, in constant memory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='User ID or username.')
+        parser.add_argument('--output', '-o', help='File to write; "-" for stdout. Defaults to the export file name.')
+        parser.add_argument('--gzip', action='store_true', help='Compress the export with gzip.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Rows fetched per cursor round trip.')
+
+    def handle(self, *args, **options):
+        lookup = {'pk': options['user']} if options['user'].isdigit() else {'username': options['user']}
+        user = User.objects.filter(**lookup).first()
+        if user is None:
+            raise CommandError(f'No user matches "{options["user"]}".')
+        output = options['output'] or export_filename(user, options['gzip'])
+        stream = export_stream(user, options['gzip'], options['chunk_size'])
+        written = 0
+        if output == '-':
+            for chunk in stream:
+                sys.stdout.buffer.write(chunk)
+                written += len(chunk)
+            sys.stdout.buffer.flush()
+        else:
+            with open(output, 'wb') as f:
+                for chunk in stream:
+                    f.write(chunk)
+                    written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Exported user {user.pk} ({written} bytes) to {output}.'))
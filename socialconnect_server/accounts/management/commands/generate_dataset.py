@@ -0,0 +1,149 @@
+import random
+import time
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from accounts.counters import recount_user_counts
+from accounts.models import User
+from interactions.models import Comment, Follow, Like
+from notifications.models import Notification
+from posts.models import Post
+
+PRIVACY_WEIGHTS = (('public', 0.8), ('followers_only', 0.15), ('private', 0.05))
+CATEGORIES = ('general', 'announcement', 'question')
+WORDS = ('launch', 'coffee', 'weekend', 'python', 'django', 'design', 'music', 'travel', 'team', 'idea',
+         'release', 'garden', 'running', 'book', 'photo', 'question', 'update', 'city', 'lunch', 'demo')
+
+
+def heavy_tailed(rng, mean, alpha=2.0):
+    """Pareto-distributed non-negative integer with the given mean (most values small, a few very large)."""
+    scale = mean * (alpha - 1) / alpha
+    return int(scale * rng.paretovariate(alpha))
+
+
+class Command(BaseCommand):
+    help = ('Bulk-generate synthetic users, a power-law follow graph, posts, likes, comments and notifications. '
+            'Signals do not fire for bulk inserts; user counts and daily stats are rebuilt at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--follows-per-user', type=float, default=20, help='Mean out-degree of the follow graph.')
+        parser.add_argument('--posts-per-user', type=float, default=5, help='Mean posts per user.')
+        parser.add_argument('--likes-per-post', type=float, default=4, help='Mean likes per post.')
+        parser.add_argument('--comments-per-post', type=float, default=1, help='Mean comments per post.')
+        parser.add_argument('--notification-rate', type=float, default=1.0, help='Fraction of follows, likes and comments that also get a notification row.')
+        parser.add_argument('--alpha', type=float, default=1.1, help='Zipf exponent for how popular users are as follow and like targets.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows per bulk_create batch.')
+        parser.add_argument('--prefix', default='synthetic', help='Username prefix; must not already be in use.')
+        parser.add_argument('--password', default='Synthetic-pass-123', help='Password shared by every generated user.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a reproducible dataset.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Users with prefix "{prefix}_" already exist; pick another --prefix.')
+        started = time.perf_counter()
+
+        user_ids = self.create_users(prefix, options['users'], options['password'])
+        # Rank users by popularity once; follows and likes both prefer popular users.
+        popularity = list(user_ids)
+        self.rng.shuffle(popularity)
+        cum_weights = list(accumulate(1 / (rank + 1) ** options['alpha'] for rank in range(len(popularity))))
+
+        follows = self.create_follows(user_ids, popularity, cum_weights, options['follows_per_user'])
+        posts = self.create_posts(user_ids, options['posts_per_user'], options['likes_per_post'], options['comments_per_post'])
+        likes, comments = self.create_interactions(posts, popularity, cum_weights)
+        notifications = self.create_notifications(follows, likes, comments, posts, options['notification_rate'])
+
+        recount_user_counts(self.chunk_size)
+        call_command('backfill_daily_stats', start=None, end=None, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(user_ids)} users, {len(follows)} follows, {len(posts)} posts, {len(likes)} likes, '
+            f'{len(comments)} comments and {notifications} notifications in {time.perf_counter() - started:.1f}s.'
+        ))
+
+    def bulk_create(self, model, objects):
+        """Insert `objects` in chunks and return their primary keys in order."""
+        pks = []
+        for start in range(0, len(objects), self.chunk_size):
+            chunk = objects[start:start + self.chunk_size]
+            with transaction.atomic():
+                created = model.objects.bulk_create(chunk)
+                if created and created[0].pk is None:
+                    # Backends that cannot return ids from a bulk insert: the chunk holds the newest rows.
+                    ids = model.objects.order_by('-pk').values_list('pk', flat=True)[:len(chunk)]
+                    pks.extend(reversed(list(ids)))
+                else:
+                    pks.extend(obj.pk for obj in created)
+        return pks
+
+    def create_users(self, prefix, count, password):
+        # Hash once: every user shares the password, and hashing per row would dominate the run.
+        hashed = make_password(password)
+        privacy, weights = zip(*PRIVACY_WEIGHTS)
+        users = [
+            User(username=f'{prefix}_{i}', email=f'{prefix}_{i}@example.com', password=hashed, is_active=True,
+                 privacy=self.rng.choices(privacy, weights)[0], bio=' '.join(self.rng.sample(WORDS, 5)))
+            for i in range(count)
+        ]
+        return self.bulk_create(User, users)
+
+    def create_follows(self, user_ids, popularity, cum_weights, mean_degree):
+        edges = set()
+        for follower in user_ids:
+            degree = min(heavy_tailed(self.rng, mean_degree), len(user_ids) - 1)
+            targets = self.rng.choices(popularity, cum_weights=cum_weights, k=degree)
+            edges.update((follower, following) for following in targets if following != follower)
+        edges = list(edges)
+        self.bulk_create(Follow, [Follow(follower_id=a, following_id=b) for a, b in edges])
+        return edges
+
+    def create_posts(self, user_ids, posts_per_user, likes_per_post, comments_per_post):
+        """Plan like and comment counts up front so the denormalised counters are written with the post."""
+        posts = []
+        for author in user_ids:
+            for _ in range(heavy_tailed(self.rng, posts_per_user)):
+                likes = min(heavy_tailed(self.rng, likes_per_post), len(user_ids))
+                comments = heavy_tailed(self.rng, comments_per_post)
+                posts.append((author, likes, comments))
+        objects = [
+            Post(author_id=author, content=' '.join(self.rng.choices(WORDS, k=12))[:280],
+                 category=self.rng.choice(CATEGORIES), like_count=likes, comment_count=comments)
+            for author, likes, comments in posts
+        ]
+        pks = self.bulk_create(Post, objects)
+        return [(pk, author, likes, comments) for pk, (author, likes, comments) in zip(pks, posts)]
+
+    def create_interactions(self, posts, popularity, cum_weights):
+        likes, comments = [], []
+        for post_id, author, like_count, comment_count in posts:
+            # Distinct likers; retry draws that repeat so like_count stays exact.
+            likers = set()
+            while len(likers) < like_count:
+                likers.update(self.rng.choices(popularity, cum_weights=cum_weights, k=like_count - len(likers)))
+            likes.extend((user_id, post_id, author) for user_id in likers)
+            for user_id in self.rng.choices(popularity, cum_weights=cum_weights, k=comment_count):
+                comments.append((user_id, post_id, author))
+        self.bulk_create(Like, [Like(user_id=u, post_id=p) for u, p, _ in likes])
+        self.bulk_create(Comment, [
+            Comment(author_id=u, post_id=p, content=' '.join(self.rng.choices(WORDS, k=6))) for u, p, _ in comments
+        ])
+        return likes, comments
+
+    def create_notifications(self, follows, likes, comments, posts, rate):
+        rows = []
+        for follower, following in follows:
+            if self.rng.random() < rate:
+                rows.append(Notification(recipient_id=following, sender_id=follower, notification_type='follow',
+                                         message='Someone started following you.'))
+        for kind, interactions in (('like', likes), ('comment', comments)):
+            for user_id, post_id, author in interactions:
+                if user_id != author and self.rng.random() < rate:
+                    rows.append(Notification(recipient_id=author, sender_id=user_id, notification_type=kind, post_id=post_id,
+                                             message=f'Someone {"liked" if kind == "like" else "commented on"} your post.'))
+        self.bulk_create(Notification, rows)
+        return len(rows)
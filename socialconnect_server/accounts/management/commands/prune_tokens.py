@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted JWT rows in bounded chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Outstanding tokens deleted per chunk.')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between chunks.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        last_id = 0
+        outstanding_deleted = blacklisted_deleted = 0
+        while True:
+            # Walk the primary key so each chunk is an index range scan; expired tokens cluster at low ids.
+            ids = list(
+                OutstandingToken.objects.filter(id__gt=last_id, expires_at__lte=now)
+                .order_by('id')
+                .values_list('id', flat=True)[:options['chunk_size']]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            blacklisted_deleted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+            outstanding_deleted += OutstandingToken.objects.filter(id__in=ids).delete()[0]
+            self.stdout.write(f'Pruned chunk up to outstanding token ID {last_id}')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {outstanding_deleted} outstanding and {blacklisted_deleted} blacklisted tokens.'
+        ))
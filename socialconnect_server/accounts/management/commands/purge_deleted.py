@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from accounts.purge import run_purge_jobs
+
+
+class Command(BaseCommand):
+    help = 'Purge soft-deleted users and posts queued as PurgeJobs, in bounded chunks that can resume after interruption.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows per DELETE (defaults to PURGE_CHUNK_SIZE).')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between chunks, to limit load on the primary.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for jobs instead of exiting once none are due.')
+        parser.add_argument('--interval', type=float, default=10.0, help='Seconds to sleep between polls in --loop mode.')
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        try:
+            while True:
+                done, failed = run_purge_jobs(chunk_size=options['chunk_size'], sleep=options['sleep'])
+                total_done += done
+                total_failed += failed
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Purged {total_done} jobs, {total_failed} failed.'))
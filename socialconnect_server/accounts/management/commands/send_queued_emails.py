@@ -0,0 +1,34 @@
+import time
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from accounts.utils import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails in batches over a single mail connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails per batch (defaults to EMAIL_OUTBOX_BATCH_SIZE).')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting once it is drained.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls in --loop mode.')
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = send_queued_emails(batch_size=options['batch_size'], connection=connection)
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    continue
+                if not options['loop']:
+                    break
+                # Idle: release the SMTP session until there is work again.
+                connection.close()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} emails, {total_failed} failed.'))
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+# Expression indexes matching the UPPER(col::text) LIKE 'Q%' that istartswith
+# compiles to on PostgreSQL; text_pattern_ops makes them usable for prefix
+# LIKE under any collation. See accounts.search.
+PREFIX_COLUMNS = ('username', 'first_name', 'last_name')
+
+
+def index_name(column):
+    return f'accounts_user_{column}_prefix_idx'
+
+
+def create_indexes(apps, schema_editor):
+    # Other databases keep the plain scan.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in PREFIX_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(column)} '
+            f'ON accounts_user (UPPER({column}::text) text_pattern_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in PREFIX_COLUMNS:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name(column)}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; it builds without blocking writes.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0003_purgejob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
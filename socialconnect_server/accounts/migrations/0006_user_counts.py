@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:53
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+CHUNK_SIZE = 10000
+
+
+def count_existing(apps, schema_editor):
+    # The counts from here on are kept by accounts.counters; fill them in once, one id range per UPDATE.
+    User = apps.get_model('accounts', 'User')
+    Follow = apps.get_model('interactions', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+
+    def count(model, field):
+        counts = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('*')).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    last_id = 0
+    while True:
+        ids = list(User.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not ids:
+            return
+        User.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(
+            followers_count=count(Follow, 'following'),
+            following_count=count(Follow, 'follower'),
+            posts_count=count(Post, 'author'),
+        )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_emailoutbox_sending'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('interactions', '0003_partition_like_follow'),
+        ('posts', '0002_post_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-followers_count', '-id'], name='user_followers_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-following_count', '-id'], name='user_following_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-posts_count', '-id'], name='user_posts_count_idx'),
+        ),
+    ]
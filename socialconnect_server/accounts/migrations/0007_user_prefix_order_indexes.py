@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Replaces the text_pattern_ops indexes from 0004. Under the "C" collation the
+# default operator class serves prefix LIKE as well, and it also returns rows
+# in (UPPER(col), id) order, so each autocomplete query reads its prefix range
+# in order and stops at LIMIT instead of sorting every match. See accounts.search.
+PREFIX_COLUMNS = ('username', 'first_name', 'last_name')
+
+
+def old_index_name(column):
+    return f'accounts_user_{column}_prefix_idx'
+
+
+def index_name(column):
+    return f'accounts_user_{column}_prefix_order_idx'
+
+
+def create_indexes(apps, schema_editor):
+    # Other databases keep the plain scan.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in PREFIX_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(column)} '
+            f'ON accounts_user ((UPPER({column}::text) COLLATE "C"), id)')
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {old_index_name(column)}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in PREFIX_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {old_index_name(column)} '
+            f'ON accounts_user (UPPER({column}::text) text_pattern_ops)')
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name(column)}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; it builds without blocking writes.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0006_user_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -14,4 +14,56 @@ class User(AbstractUser):
         default='public'
     )
     last_login = models.DateTimeField(null=True, blank=True)
-    is_active = models.BooleanField(default=False)
\ No newline at end of file
+    is_active = models.BooleanField(default=False)
+    # Maintained by accounts.counters as follows and posts come and go.
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    posts_count = models.PositiveIntegerField(default=0)
+
+    class Meta(AbstractUser.Meta):
+        # Admin listings sort and filter by the counts, with the primary key as tie-breaker.
+        indexes = [
+            models.Index(fields=['-followers_count', '-id'], name='user_followers_count_idx'),
+            models.Index(fields=['-following_count', '-id'], name='user_following_count_idx'),
+            models.Index(fields=['-posts_count', '-id'], name='user_posts_count_idx'),
+        ]
+
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = [('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')]
+
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipient = models.EmailField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='emailoutbox_due_idx')]
+
+class PurgeJob(models.Model):
+    """Background removal of a soft-deleted user or post and everything that depends on it (see accounts.purge)."""
+    TARGET_CHOICES = [('user', 'User'), ('post', 'Post')]
+    STATUS_CHOICES = [('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')]
+
+    target = models.CharField(max_length=10, choices=TARGET_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    # Not a foreign key: the requester may be the account being purged.
+    requested_by_id = models.PositiveBigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    stage = models.CharField(max_length=30, blank=True)
+    progress = models.JSONField(default=dict)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['target', 'object_id'], name='purgejob_target_unique')]
+        indexes = [models.Index(fields=['status', 'created_at'], name='purgejob_status_idx')]
@@ -0,0 +1,199 @@
+"""Soft delete now, purge later.
+
+Deleting a user or post through Django cascades in Python: the collector loads
+every dependent like, comment, follow and notification before deleting them,
+which for a large account takes minutes and holds locks throughout.
+`delete_user` and `delete_post` instead hide the row (is_active=False) and
+queue a PurgeJob. `run_purge_jobs` (the `purge_deleted` command) then removes
+the dependents stage by stage in chunks of PURGE_CHUNK_SIZE rows. Each chunk is
+one SELECT of primary keys through the foreign key index and one DELETE by
+primary key, committed together with the job's progress. The hidden row itself
+goes last with an ordinary delete(), when nothing is left to collect.
+
+Every stage selects whatever still matches, so a job interrupted at any point
+resumes where it stopped. Jobs are claimed, leased and retried through
+socialconnect_server.jobs; each chunk renews the lease.
+"""
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from interactions.graph import follow_graph, invalidate_suggestions
+from interactions.models import Comment, Follow, Like
+from notifications.models import Notification
+from posts.models import Post
+from socialconnect_server.conditional import bump_profiles, bump_public_posts
+from socialconnect_server.jobs import LeasedJobs
+from socialconnect_server.log import get_logger
+from .counters import adjust_follow_counts
+from .models import PurgeJob, User
+
+logger = get_logger('users')
+
+def delete_user(user, requested_by=None):
+    """Deactivate `user` at once and queue the removal of their account and content."""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        _enqueue('user', [user.pk], requested_by)
+
+def delete_post(post, requested_by=None):
+    """Hide `post` at once and queue the removal of it, its likes and comments."""
+    with transaction.atomic():
+        post.is_active = False
+        post.save(update_fields=['is_active', 'updated_at'])
+        _enqueue('post', [post.pk], requested_by)
+
+def queue_post_purges(post_ids, requested_by=None):
+    """Queue the removal of posts already hidden in bulk (admin bulk delete), as delete_post does for one."""
+    _enqueue('post', post_ids, requested_by)
+
+def _enqueue(target, object_ids, requested_by):
+    # Deleting again is a no-op while a job is queued or running, and requeues a cancelled one.
+    requested_by_id = getattr(requested_by, 'pk', None)
+    PurgeJob.objects.bulk_create(
+        [PurgeJob(target=target, object_id=object_id, requested_by_id=requested_by_id) for object_id in object_ids],
+        ignore_conflicts=True)
+    PurgeJob.objects.filter(target=target, object_id__in=object_ids, status='cancelled').update(status='pending', updated_at=timezone.now())
+    logger.info('purge.queued', target=target, object_ids=object_ids)
+
+def _first_ids(queryset, chunk_size, *fields):
+    rows = queryset.order_by('pk').values_list('pk', *fields)[:chunk_size]
+    return list(rows) if fields else [row[0] for row in rows]
+
+def _raw_delete(model, ids):
+    """DELETE by primary key without collecting related objects or sending signals."""
+    if not ids:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    sql = 'DELETE FROM {} WHERE {} IN ({})'.format(
+        quote(model._meta.db_table), quote(model._meta.pk.column), ', '.join(['%s'] * len(ids)))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ids)
+        return cursor.rowcount
+
+def _decrement(field, post_counts):
+    # A post's counter drops by the number of its rows in the chunk; Greatest keeps drifted counters at zero.
+    for post_id, count in post_counts.items():
+        Post.objects.filter(pk=post_id).update(**{field: Greatest(F(field) - count, Value(0))})
+
+def _delete(model, label):
+    def step(queryset, chunk_size):
+        return Counter({label: _raw_delete(model, _first_ids(queryset, chunk_size))})
+    return step
+
+def _delete_counted(model, label, field):
+    """Delete likes or comments made by the purged user, keeping the posts' counters in step."""
+    def step(queryset, chunk_size):
+        rows = _first_ids(queryset, chunk_size, 'post_id')
+        deleted = _raw_delete(model, [pk for pk, _ in rows])
+        _decrement(field, Counter(post_id for _, post_id in rows))
+        return Counter({label: deleted})
+    return step
+
+def _delete_follows(queryset, chunk_size):
+    rows = _first_ids(queryset, chunk_size, 'follower_id', 'following_id')
+    deleted = _raw_delete(Follow, [pk for pk, _, _ in rows])
+    edges = [(follower_id, following_id) for _, follower_id, following_id in rows]
+    adjust_follow_counts(edges, -1)
+
+    def apply():
+        # What the Follow post_delete receiver does per row after commit.
+        for follower_id, following_id in edges:
+            follow_graph.remove_edge(follower_id, following_id)
+            invalidate_suggestions(follower_id)
+        bump_profiles({user_id for edge in edges for user_id in edge})
+    transaction.on_commit(apply)
+    return Counter({'follows': deleted})
+
+def _unlink_notifications(queryset, chunk_size):
+    # Notification.post is SET_NULL: notifications about the post outlive it.
+    return Counter({'notifications_unlinked': Notification.objects.filter(pk__in=_first_ids(queryset, chunk_size)).update(post=None)})
+
+def _hide_posts(queryset, chunk_size):
+    hidden = Post.objects.filter(pk__in=_first_ids(queryset, chunk_size)).update(is_active=False)
+    if hidden:
+        transaction.on_commit(bump_public_posts)
+    return Counter({'posts_hidden': hidden})
+
+def _delete_row(label):
+    def step(queryset, chunk_size):
+        # Nothing depends on the row any more, so the collector has nothing left to load.
+        return Counter({label: 1}) if queryset.delete()[0] else Counter()
+    return step
+
+def _purge_next_post(queryset, chunk_size):
+    """One chunk of the first remaining post's purge; the post is deleted once it is empty."""
+    post_id = queryset.order_by('pk').values_list('pk', flat=True).first()
+    if post_id is None:
+        return Counter()
+    for _, select, step in POST_STAGES:
+        done = step(select(post_id), chunk_size)
+        if +done:
+            return done
+    return Counter()
+
+# (stage, rows still to process for the target id, one chunk of work), in order.
+POST_STAGES = [
+    ('likes', lambda pk: Like.objects.filter(post_id=pk), _delete(Like, 'likes')),
+    ('comments', lambda pk: Comment.objects.filter(post_id=pk), _delete(Comment, 'comments')),
+    ('notifications', lambda pk: Notification.objects.filter(post_id=pk), _unlink_notifications),
+    ('post', lambda pk: Post.objects.filter(pk=pk), _delete_row('posts')),
+]
+
+USER_STAGES = [
+    ('hide_posts', lambda pk: Post.objects.filter(author_id=pk, is_active=True), _hide_posts),
+    ('likes', lambda pk: Like.objects.filter(user_id=pk), _delete_counted(Like, 'likes', 'like_count')),
+    ('comments', lambda pk: Comment.objects.filter(author_id=pk), _delete_counted(Comment, 'comments', 'comment_count')),
+    ('following', lambda pk: Follow.objects.filter(follower_id=pk), _delete_follows),
+    ('followers', lambda pk: Follow.objects.filter(following_id=pk), _delete_follows),
+    ('notifications_received', lambda pk: Notification.objects.filter(recipient_id=pk), _delete(Notification, 'notifications')),
+    ('notifications_sent', lambda pk: Notification.objects.filter(sender_id=pk), _delete(Notification, 'notifications')),
+    ('posts', lambda pk: Post.objects.filter(author_id=pk), _purge_next_post),
+    ('user', lambda pk: User.objects.filter(pk=pk), _delete_row('users')),
+]
+
+STAGES = {'user': USER_STAGES, 'post': POST_STAGES}
+TARGETS = {'user': User, 'post': Post}
+
+jobs = LeasedJobs(PurgeJob, 'PURGE', 'purge', lambda job: {'target': job.target, 'object_id': job.object_id, 'stage': job.stage},
+                 progress_fields=['stage'])
+
+def run_job(job, chunk_size=None, sleep=None):
+    """Run `job` from its current stage to completion, committing progress after every chunk."""
+    chunk_size = chunk_size or getattr(settings, 'PURGE_CHUNK_SIZE', 1000)
+    stages = STAGES[job.target]
+    target = TARGETS[job.target].objects.filter(pk=job.object_id).values_list('is_active', flat=True).first()
+    if not job.progress and target:
+        # Reactivated before any work was done (e.g. by an admin): nothing to purge.
+        job.status, job.lease_expires_at = 'cancelled', None
+        job.save(update_fields=['status', 'lease_expires_at', 'updated_at'])
+        logger.info('purge.cancelled', job_id=job.id, target=job.target, object_id=job.object_id)
+        return job
+    names = [name for name, _, _ in stages]
+    for name, select, step in stages[names.index(job.stage) if job.stage in names else 0:]:
+        job.stage = name
+        while True:
+            with transaction.atomic():
+                done = step(select(job.object_id), chunk_size)
+                for label, count in (+done).items():
+                    job.progress[label] = job.progress.get(label, 0) + count
+                job.lease_expires_at = jobs.lease()
+                job.save(update_fields=['stage', 'progress', 'lease_expires_at', 'updated_at'])
+            if not +done:
+                break
+            logger.debug('purge.chunk', job_id=job.id, stage=name, **done)
+            if sleep:
+                time.sleep(sleep)
+    job.status, job.lease_expires_at, job.finished_at = 'done', None, timezone.now()
+    job.save(update_fields=['status', 'lease_expires_at', 'finished_at', 'updated_at'])
+    logger.info('purge.done', job_id=job.id, target=job.target, object_id=job.object_id, progress=job.progress)
+    return job
+
+def run_purge_jobs(limit=None, chunk_size=None, sleep=None):
+    """Claim and run jobs until none is due (or `limit` ran). Returns (done, failed) counts."""
+    return jobs.run(lambda job: run_job(job, chunk_size, sleep), limit)
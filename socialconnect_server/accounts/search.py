@@ -0,0 +1,143 @@
+"""Username and display-name autocomplete for mention and follow UIs.
+
+`autocomplete_users(q, limit)` returns active, non-private users whose username,
+first name or last name starts with `q` (case-insensitively); "ann le" matches
+first name "Ann..." and last name "Le...". Username matches come first, then
+first-name, last-name and first-and-last-name matches, each kind in
+alphabetical order (so an exact username leads).
+
+Each kind is a separate query that filters and orders on one column's
+(UPPER(col) COLLATE "C", id) index from accounts migration 0007 on PostgreSQL,
+so it reads an index range in order and stops at LIMIT however many users
+share a short prefix. The kinds run in rank order and stop once `limit` users
+are found; a prefix with enough username matches costs one query.
+
+Private users are visible to themselves only and are never suggested, so the
+results are the same for every viewer. That lets the shortest prefixes, which
+match the most rows and are typed on every lookup, be served from an
+in-process LRU cache (`prefix_cache`) for AUTOCOMPLETE_CACHE_SECONDS. A user
+who turns private or is deactivated may still be suggested by a worker until
+its entry expires.
+
+On PostgreSQL each query runs under a statement_timeout of
+AUTOCOMPLETE_TIMEOUT_MS; a lookup that overruns returns no results rather than
+holding the request, and that empty result is cached for
+AUTOCOMPLETE_TIMEOUT_CACHE_SECONDS so the next keystrokes do not repeat it.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db import OperationalError, connections, router, transaction
+from django.db.models import Value
+from django.db.models.functions import Collate, Upper
+from socialconnect_server.log import get_logger
+from .models import User
+from .serializers import UserSummarySerializer
+
+logger = get_logger('users')
+
+MAX_QUERY_LENGTH = 50
+
+class PrefixCache:
+    """Thread-safe LRU of autocomplete results by normalised prefix, each kept for AUTOCOMPLETE_CACHE_SECONDS."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, prefix):
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is None:
+                return None
+            expires_at, results = entry
+            if expires_at < time.monotonic():
+                del self._entries[prefix]
+                return None
+            self._entries.move_to_end(prefix)
+            return results
+
+    def set(self, prefix, results, ttl=None):
+        if ttl is None:
+            ttl = getattr(settings, 'AUTOCOMPLETE_CACHE_SECONDS', 60)
+        with self._lock:
+            self._entries[prefix] = (time.monotonic() + ttl, results)
+            self._entries.move_to_end(prefix)
+            while len(self._entries) > getattr(settings, 'AUTOCOMPLETE_CACHE_SIZE', 1024):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+prefix_cache = PrefixCache()
+
+def normalise(q):
+    """Lower-case `q` and collapse runs of whitespace."""
+    return ' '.join(q.lower().split())[:MAX_QUERY_LENGTH]
+
+def _prefix_key(column, vendor):
+    # The expression the PostgreSQL indexes are built on; other databases compare as they do.
+    key = Upper(column)
+    return Collate(key, 'C') if vendor == 'postgresql' else key
+
+def matching_users(q, vendor):
+    """Querysets of active, non-private users matching the normalised prefix `q`, one per match kind in rank order."""
+    def starting_with(column, prefix, **filters):
+        return (
+            User.objects.alias(key=_prefix_key(column, vendor))
+            .filter(key__startswith=Upper(Value(prefix)), is_active=True, **filters).exclude(privacy='private')
+            .only('id', 'username', 'first_name', 'last_name', 'avatar_url')
+            .order_by('key', 'id')
+        )
+    first, _, last = q.partition(' ')
+    kinds = [starting_with('username', q), starting_with('first_name', q), starting_with('last_name', q)]
+    if last:
+        kinds.append(starting_with('first_name', first, last_name__istartswith=last))
+    return kinds
+
+def _collect(q, limit, alias, vendor):
+    users = {}
+    for queryset in matching_users(q, vendor):
+        # Users found by an earlier kind may match this one too, so take up to `limit` again.
+        for user in queryset.using(alias)[:limit]:
+            users.setdefault(user.pk, user)
+        if len(users) >= limit:
+            break
+    return [UserSummarySerializer(user).data for user in list(users.values())[:limit]]
+
+def _lookup(q, limit):
+    alias = router.db_for_read(User)
+    vendor = connections[alias].vendor
+    timeout = getattr(settings, 'AUTOCOMPLETE_TIMEOUT_MS', 200)
+    if vendor != 'postgresql' or not timeout:
+        return _collect(q, limit, alias, vendor)
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            # SET LOCAL ends with the transaction, so the pooled connection keeps its default.
+            cursor.execute('SET LOCAL statement_timeout = %s', [int(timeout)])
+        return _collect(q, limit, alias, vendor)
+
+def autocomplete_users(q, limit):
+    """Up to `limit` compact users matching `q`; an empty list if `q` is blank or the lookup overran."""
+    q = normalise(q)
+    if not q:
+        return []
+    # Longer prefixes are only in the cache after a lookup for them overran.
+    results = prefix_cache.get(q)
+    if results is not None:
+        return results[:limit]
+    cacheable = len(q) <= getattr(settings, 'AUTOCOMPLETE_CACHE_MAX_LENGTH', 3)
+    # Cache the longest list any request may ask for, so every limit is served from it.
+    fetch = getattr(settings, 'AUTOCOMPLETE_MAX_RESULTS', 20) if cacheable else limit
+    try:
+        results = _lookup(q, fetch)
+    except OperationalError as e:
+        logger.warning('autocomplete.timeout', prefix_length=len(q), error=e)
+        # Remember the overrun, so the keystrokes that follow do not run the same lookup again.
+        prefix_cache.set(q, [], getattr(settings, 'AUTOCOMPLETE_TIMEOUT_CACHE_SECONDS', 10))
+        return []
+    if cacheable:
+        prefix_cache.set(q, results)
+    return results[:limit]
@@ -1,14 +1,17 @@
-import logging
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions
+from django.db import transaction
+from rest_framework_simplejwt.serializers import TokenBlacklistSerializer, TokenRefreshSerializer
 from .utils import send_verification_email
 from .models import User
-from supabase import create_client # type: ignore
-from django.conf import settings
+from .tokens import FilteredRefreshToken
+from socialconnect_server import storage
+from socialconnect_server.log import get_logger
+from socialconnect_server.metrics import TimedSerializerMixin
 
 # Initialize logger
-logger = logging.getLogger('users')
+logger = get_logger('users')
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
@@ -19,7 +22,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 
     def validate_username(self, value):
         if not (3 <= len(value) <= 30 and (value.isalnum() or '_' in value)):
-            logger.warning(f"Username validation failed: {value}")
+            logger.warning('user.username_invalid', username=value)
             raise serializers.ValidationError("Username must be 3-30 characters, alphanumeric or underscore.")
         return value
 
@@ -27,79 +30,89 @@ class RegisterSerializer(serializers.ModelSerializer):
         try:
             validate_password(value)
         except exceptions.ValidationError as e:
-            logger.warning(f"Password validation failed for username {self.initial_data.get('username', 'unknown')}: {list(e.messages)}")
+            logger.warning('user.password_invalid', username=self.initial_data.get('username', 'unknown'), errors=e.messages)
             raise serializers.ValidationError(list(e.messages))
         return value
 
     def create(self, validated_data):
         try:
-            user = User.objects.create_user(
-                username=validated_data['username'],
-                email=validated_data['email'],
-                password=validated_data['password'],
-                first_name=validated_data.get('first_name', ''),
-                last_name=validated_data.get('last_name', '')
-            )
-            user.is_active = False
-            user.save()
-            logger.info(f"User created: {user.username} (ID: {user.id}, Email: {user.email})")
-            send_verification_email(user, self.context.get('request'))
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=validated_data['username'],
+                    email=validated_data['email'],
+                    password=validated_data['password'],
+                    first_name=validated_data.get('first_name', ''),
+                    last_name=validated_data.get('last_name', ''),
+                    is_active=False,
+                )
+                logger.info('user.created', user_id=user.id)
+                send_verification_email(user, self.context.get('request'))
             return user
         except Exception as e:
-            logger.error(f"Failed to create user: {validated_data['username']}. Error: {str(e)}")
+            logger.error('user.create_failed', username=validated_data['username'], error=e)
             raise
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     avatar = serializers.FileField(write_only=True, required=False)
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
-    posts_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'bio', 'avatar_url', 'website', 'location', 'privacy', 'avatar', 'followers_count', 'following_count', 'posts_count', 'is_staff', 'is_active']
         read_only_fields = ['email', 'followers_count', 'following_count', 'posts_count', 'is_staff', 'is_active']
 
-    def get_followers_count(self, obj):
-        return obj.followers_set.count()
-
-    def get_following_count(self, obj):
-        return obj.following_set.count()
-
-    def get_posts_count(self, obj):
-        return obj.posts.count()
-
     def update(self, instance, validated_data):
         if 'avatar' in self.context.get('request').FILES:
             file = self.context['request'].FILES['avatar']
             if file.size > 2 * 1024 * 1024:
-                logger.warning(f"Avatar upload failed for user {instance.username} (ID: {instance.id}): File size exceeds 2MB")
+                logger.warning('user.avatar_rejected', user_id=instance.id, reason='size')
                 raise serializers.ValidationError({'avatar': 'File size exceeds 2MB.'})
             if file.content_type not in ['image/jpeg', 'image/png']:
-                logger.warning(f"Avatar upload failed for user {instance.username} (ID: {instance.id}): Invalid file format ({file.content_type})")
+                logger.warning('user.avatar_rejected', user_id=instance.id, reason='format', content_type=file.content_type)
                 raise serializers.ValidationError({'avatar': 'Invalid file format. Only JPEG/PNG allowed.'})
             try:
-                supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+                avatars = storage.bucket('avatars')
                 path = f"{instance.id}/{file.name}"
-                logger.debug(f"Uploading avatar to Supabase bucket 'avatars' at path: {path} for user {instance.username} (ID: {instance.id})")
-                upload_response = supabase.storage.from_('avatars').upload(
+                logger.debug('user.avatar_uploading', user_id=instance.id, bucket='avatars', path=path)
+                upload_response = avatars.upload(
                     path,
                     file.read(),
                     {'content-type': file.content_type, 'upsert': 'true'}
                 )
-                logger.debug(f"Supabase upload response for user {instance.username} (ID: {instance.id}): {upload_response}")
+                logger.debug('user.avatar_upload_response', user_id=instance.id, response=upload_response)
                 # Check if upload_response is a dictionary with an error
                 if isinstance(upload_response, dict) and 'error' in upload_response:
                     error_msg = upload_response['error']
                     if upload_response.get('statusCode') == 403:
                         error_msg = 'Permission denied: Check Supabase bucket policies.'
-                    logger.error(f"Avatar upload failed for user {instance.username} (ID: {instance.id}): {error_msg}")
+                    logger.error('user.avatar_upload_failed', user_id=instance.id, error=error_msg)
                     raise serializers.ValidationError({'avatar': f'Upload failed: {error_msg}'})
                 # If upload_response is an UploadResponse object, assume success
-                public_url_response = supabase.storage.from_('avatars').get_public_url(path)
+                public_url_response = avatars.get_public_url(path)
                 validated_data['avatar_url'] = public_url_response if isinstance(public_url_response, str) else public_url_response.get('public_url', '')
-                logger.info(f"Avatar uploaded successfully for user {instance.username} (ID: {instance.id}). Public URL: {validated_data['avatar_url']}")
+                logger.info('user.avatar_uploaded', user_id=instance.id, url=validated_data['avatar_url'])
             except Exception as e:
-                logger.error(f"Supabase error during avatar upload for user {instance.username} (ID: {instance.id}): {str(e)}")
+                logger.error('user.avatar_upload_failed', user_id=instance.id, error=e)
                 raise serializers.ValidationError({'avatar': f'Failed to upload avatar: {str(e)}'})
-        return super().update(instance, validated_data)
\ No newline at end of file
+        return super().update(instance, validated_data)
+
+class UserSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Compact user projection for lists that must not trigger per-row queries."""
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name', 'avatar_url']
+        read_only_fields = fields
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Views embed follow state by passing a resolve_relationships() map in the context.
+        relationships = self.context.get('relationships')
+        if relationships is not None:
+            data['relationship'] = relationships.get(instance.pk)
+        return data
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = FilteredRefreshToken
+
+class FilteredTokenBlacklistSerializer(TokenBlacklistSerializer):
+    token_class = FilteredRefreshToken
@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from posts.models import Post
+from socialconnect_server.conditional import bump_profiles, bump_public_posts
+from .cache import invalidate_user
+from .counters import adjust_posts_count
+from .models import User
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Invalidate after commit so a concurrent request cannot re-cache the old row.
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_author_profile(sender, instance, created=True, **kwargs):
+    # posts_count is part of the author's profile; edits do not change it.
+    if created:
+        transaction.on_commit(lambda: bump_profiles([instance.author_id]))
+    elif instance.listing_changed():
+        # Edits, hiding and restoring change what public post pages show. Like and comment
+        # count saves do not start new pages; they reach the cached pages within PAGE_CACHE_TIMEOUT.
+        instance._loaded_listing = {field: getattr(instance, field) for field in Post.LISTED_FIELDS}
+        transaction.on_commit(bump_public_posts)
+
+@receiver(post_save, sender=Post)
+def count_author_post(sender, instance, created, **kwargs):
+    if created:
+        adjust_posts_count(instance.author_id, 1)
+
+@receiver(post_delete, sender=Post)
+def uncount_author_post(sender, instance, **kwargs):
+    adjust_posts_count(instance.author_id, -1)
@@ -1,3 +1,395 @@
-from django.test import TestCase
+import gzip
+import json
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
+from io import StringIO
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from interactions.models import Comment, Follow, Like
+from notifications.models import Notification
+from posts.models import Post
+from socialconnect_server.testing import PASSWORD, GraphTestCase
+from . import purge as accounts_purge
+from .models import EmailOutbox, PurgeJob, User
+from .purge import delete_user, run_purge_jobs
+from .search import prefix_cache
+from .tokens import BloomFilter, blacklist_filter
+from .cache import get_cached_user
+from .counters import recount_user_counts
+from .utils import queue_email, record_login, send_queued_emails
 
-# Create your tests here.
+class AccountExportTests(GraphTestCase):
+    def export(self, path, user):
+        response = self.graph.client(user).get(path)
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            content = b''.join(response.streaming_content)
+        return response, content, len(queries)
+
+    def records(self, content):
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_export_covers_the_account(self):
+        graph = self.graph
+        _, content, _ = self.export('/api/users/me/export/', graph.viewer)
+        records = self.records(content)
+        self.assertEqual(records[0]['type'], 'account')
+        self.assertEqual(records[0]['id'], graph.viewer.pk)
+        counts = Counter(record['type'] for record in records)
+        self.assertEqual(counts['post'], Post.objects.filter(author=graph.viewer).count())
+        self.assertEqual(counts['comment'], Comment.objects.filter(author=graph.viewer).count())
+        self.assertEqual(counts['like'], Like.objects.filter(user=graph.viewer).count())
+        self.assertEqual(counts['following'], Follow.objects.filter(follower=graph.viewer).count())
+        self.assertEqual(counts['follower'], Follow.objects.filter(following=graph.viewer).count())
+        self.assertEqual(counts['notification'], Notification.objects.filter(recipient=graph.viewer).count())
+
+    def test_gzip_and_admin_export(self):
+        graph = self.graph
+        plain = self.export(f'/api/users/{graph.viewer.pk}/export/', graph.admin)[1]
+        response, content, _ = self.export(f'/api/users/{graph.viewer.pk}/export/?gzip=1', graph.admin)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        # exported_at differs between the two runs.
+        self.assertEqual(self.records(gzip.decompress(content))[1:], self.records(plain)[1:])
+
+    async def test_asgi_streams_through_an_async_iterator(self):
+        graph = self.graph
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(graph.viewer).access_token))()
+        client = AsyncClient()
+        for path in ('/api/users/me/export/', f'/api/users/{graph.viewer.pk}/following/?ids_only=1'):
+            response = await client.get(path, headers={'Authorization': f'Bearer {token}'})
+            self.assertEqual(response.status_code, 200)
+            # A synchronous iterator would be read into a list before the first byte was sent.
+            self.assertTrue(response.is_async)
+            content = b''.join([chunk async for chunk in response.streaming_content])
+            if path.endswith('ids_only=1'):
+                expected = await sync_to_async(lambda: set(graph.viewer.following_set.values_list('following_id', flat=True)))()
+                self.assertEqual(set(json.loads(content)), expected)
+            else:
+                self.assertEqual(self.records(content)[0]['id'], graph.viewer.pk)
+
+    def test_queries_do_not_grow_with_history(self):
+        small = self.export('/api/users/me/export/', self.graph.viewer)[2]
+        self.graph.grow(30)
+        self.assertEqual(self.export('/api/users/me/export/', self.graph.viewer)[2], small)
+
+
+class PurgeTests(GraphTestCase):
+    def test_deleted_post_is_hidden_then_purged(self):
+        graph = self.graph
+        post = graph.author_post
+        client = graph.client(graph.author)
+        self.assertEqual(client.delete(f'/api/posts/{post.pk}/').status_code, 204)
+        self.assertEqual(client.get(f'/api/posts/{post.pk}/').status_code, 404)
+        self.assertTrue(Like.objects.filter(post=post).exists())
+        self.assertEqual(run_purge_jobs(chunk_size=2), (1, 0))
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        self.assertFalse(Like.objects.filter(post_id=post.pk).exists() or Comment.objects.filter(post_id=post.pk).exists())
+        job = PurgeJob.objects.get(target='post', object_id=post.pk)
+        self.assertEqual((job.status, job.progress['posts']), ('done', 1))
+
+    def test_deleted_user_is_purged_in_resumable_chunks(self):
+        graph = self.graph
+        user = User.objects.get(username='member1')
+        liked = graph.viewer_post
+        likes_before = Post.objects.get(pk=liked.pk).like_count
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(graph.client(user).delete('/api/users/me/').status_code, 204)
+        self.assertEqual(graph.client(user).get('/api/feed/').status_code, 401)
+
+        real_delete = accounts_purge._raw_delete
+        def fail_on_follows(model, ids):
+            if model is Follow:
+                raise RuntimeError('connection lost')
+            return real_delete(model, ids)
+        with mock.patch.object(accounts_purge, '_raw_delete', fail_on_follows):
+            self.assertEqual(run_purge_jobs(chunk_size=1), (0, 1))
+        job = PurgeJob.objects.get(target='user', object_id=user.pk)
+        self.assertEqual((job.status, job.stage, job.attempts), ('pending', 'following', 1))
+        self.assertEqual(job.progress['likes'], 2)
+
+        PurgeJob.objects.filter(pk=job.pk).update(lease_expires_at=None)  # the retry delay has passed
+
+        self.assertEqual(run_purge_jobs(chunk_size=1), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress['likes'], job.progress['posts']), ('done', 2, 1))
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        for queryset in (Follow.objects.filter(follower_id=user.pk), Follow.objects.filter(following_id=user.pk),
+                         Like.objects.filter(user_id=user.pk), Comment.objects.filter(author_id=user.pk),
+                         Notification.objects.filter(sender_id=user.pk), Post.objects.filter(author_id=user.pk)):
+            self.assertFalse(queryset.exists())
+        self.assertEqual(Post.objects.get(pk=liked.pk).like_count, likes_before - 1)
+
+    def test_reactivated_user_is_not_purged(self):
+        user = self.graph.stranger
+        delete_user(user)
+        User.objects.filter(pk=user.pk).update(is_active=True)
+        self.assertEqual(run_purge_jobs(), (1, 0))
+        self.assertEqual(PurgeJob.objects.get(object_id=user.pk, target='user').status, 'cancelled')
+        self.assertTrue(Post.objects.filter(author=user).exists())
+
+
+class AutocompleteTests(GraphTestCase):
+    def setUp(self):
+        super().setUp()
+        self.graph.user('ann', first_name='Annika', last_name='Lee')
+        self.graph.user('zed', first_name='Ann', last_name='Andrews')
+        self.client = self.graph.client(self.graph.viewer)
+        prefix_cache.clear()
+        self.addCleanup(prefix_cache.clear)
+
+    def usernames(self, q, **params):
+        response = self.client.get('/api/users/autocomplete/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['username'] for row in response.data]
+
+    def test_username_and_name_prefixes(self):
+        # Exact username first, then username prefixes, then name matches.
+        self.assertEqual(self.usernames('ANN'), ['ann', 'zed'])
+        self.assertEqual(self.usernames('ann lee'), ['ann'])
+        self.assertEqual(self.usernames('member', limit=2), ['member1', 'member2'])
+        self.assertEqual(self.usernames('%'), [])
+
+    def test_each_kind_stops_once_the_limit_is_filled(self):
+        def lookups(q, limit):
+            prefix_cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.usernames(q, limit=limit)
+            return [query['sql'] for query in queries.captured_queries if 'LIKE' in query['sql']]
+        # Username matches fill the list: the name columns are never read.
+        statements = lookups('member', 2)
+        self.assertEqual(len(statements), 1)
+        self.assertIn('LIMIT 2', statements[0])
+        # One bounded query per kind, whatever the number of matching users.
+        self.assertEqual(len(lookups('ann', 20)), 3)
+        self.assertEqual(len(lookups('ann lee', 20)), 4)
+
+    @override_settings(AUTOCOMPLETE_CACHE_MAX_LENGTH=0)
+    def test_overrun_lookups_are_not_repeated(self):
+        with mock.patch('accounts.search._collect', side_effect=OperationalError('canceling statement due to statement timeout')) as collect:
+            self.assertEqual(self.usernames('member'), [])
+            self.assertEqual(self.usernames('member'), [])
+        collect.assert_called_once()
+
+    def test_private_and_inactive_users_are_excluded(self):
+        self.assertEqual(self.usernames('pri'), [])
+        self.assertEqual(self.usernames('pending'), [])
+        self.assertEqual(self.usernames('fo_'), ['fo_author'])
+
+    def test_short_prefixes_are_cached_in_process(self):
+        self.assertEqual(self.usernames('me', limit=1), ['member1'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.usernames('me', limit=3), ['member1', 'member2', 'member3'])
+        self.assertFalse([query for query in queries.captured_queries if 'LIKE' in query['sql']])
+
+    def test_query_and_limit_are_bounded(self):
+        self.assertEqual(self.client.get('/api/users/autocomplete/').status_code, 400)
+        self.assertEqual(self.client.get('/api/users/autocomplete/', {'q': 'a' * 51}).status_code, 400)
+        self.assertEqual(self.client.get('/api/users/autocomplete/', {'q': 'a', 'limit': 'x'}).status_code, 400)
+        for index in range(25):
+            self.graph.user(f'bulk{index}')
+        self.assertEqual(len(self.usernames('bulk', limit=100)), 20)
+        self.assertEqual(APIClient().get('/api/users/autocomplete/', {'q': 'a'}).status_code, 401)
+
+
+class EmailOutboxTests(TestCase):
+    def queue(self, count=1):
+        return [queue_email(f'Subject {index}', 'Body', f'user{index}@example.com') for index in range(count)]
+
+    def test_batch_is_sent_over_one_connection(self):
+        self.queue(3)
+        connection = mock.Mock(wraps=mail.get_connection())
+        self.assertEqual(send_queued_emails(batch_size=2, connection=connection), (2, 0))
+        self.assertEqual(send_queued_emails(connection=connection), (1, 0))
+        self.assertEqual(send_queued_emails(connection=connection), (0, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f'user{index}@example.com' for index in range(3)])
+        self.assertFalse(connection.close.called)
+        self.assertEqual(set(EmailOutbox.objects.values_list('status', 'attempts')), {('sent', 1)})
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_BACKOFF=60)
+    def test_failures_back_off_then_give_up(self):
+        email, = self.queue()
+        connection = mock.Mock()
+        connection.send_messages.side_effect = OSError('connection refused')
+        self.assertEqual(send_queued_emails(connection=connection), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), ('pending', 1, 'connection refused'))
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=55))
+        # Not due yet.
+        self.assertEqual(send_queued_emails(connection=connection), (0, 0))
+        EmailOutbox.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_emails(connection=connection), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 2))
+        self.assertTrue(connection.close.called)
+
+    def test_claimed_emails_wait_for_the_lease(self):
+        email, = self.queue()
+        # A worker claimed the email, then died before sending it.
+        EmailOutbox.objects.filter(pk=email.pk).update(status='sending', next_attempt_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(send_queued_emails(), (0, 0))
+        EmailOutbox.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_emails(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_sends_commit_one_by_one(self):
+        self.queue(2)
+        connection = mock.Mock()
+        def fail_on_second(messages):
+            if messages[0].to == ['user1@example.com']:
+                raise KeyboardInterrupt
+        connection.send_messages.side_effect = fail_on_second
+        with self.assertRaises(KeyboardInterrupt):
+            send_queued_emails(connection=connection)
+        # The first send is recorded; the second stays leased to the dead worker.
+        self.assertEqual(list(EmailOutbox.objects.order_by('id').values_list('status', flat=True)), ['sent', 'sending'])
+
+    @override_settings(EMAIL_OUTBOX_EAGER=True)
+    def test_eager_mode_sends_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post('/api/auth/register/', {
+                'username': 'newcomer', 'email': 'newcomer@example.com', 'password': PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox[0].to, ['newcomer@example.com'])
+        self.assertEqual(EmailOutbox.objects.get().status, 'sent')
+
+
+class CachedUserTests(GraphTestCase):
+    rows = 0
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_profile_save_refreshes_the_cached_principal(self):
+        viewer = self.graph.viewer
+        self.assertEqual(get_cached_user(viewer.pk).bio, '')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.graph.client(viewer).patch('/api/users/me/', {'bio': 'new bio'}, format='json')
+        self.assertEqual(get_cached_user(viewer.pk).bio, 'new bio')
+
+    def test_login_refreshes_the_cached_principal(self):
+        viewer = self.graph.viewer
+        self.assertIsNone(get_cached_user(viewer.pk).last_login)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(record_login(viewer))
+        self.assertEqual(get_cached_user(viewer.pk).last_login, viewer.last_login)
+        # A second login within LAST_LOGIN_UPDATE_INTERVAL writes nothing.
+        self.assertFalse(record_login(viewer))
+
+
+class TokenBlacklistTests(GraphTestCase):
+    rows = 0
+
+    def setUp(self):
+        super().setUp()
+        # The filter is process-wide; start it from this test's (empty) blacklist.
+        blacklist_filter.rebuild()
+
+    def refresh(self, token):
+        return APIClient().post('/api/auth/token/refresh/', {'refresh': str(token)}, format='json')
+
+    def blacklist_elsewhere(self, token):
+        """Blacklist `token` as another worker would, without touching this process's filter."""
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        values = [f'jti-{index}' for index in range(1000)]
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+        false_positives = sum(f'other-{index}' in bloom for index in range(1000))
+        self.assertLess(false_positives, 50)
+
+    def test_rotated_and_logged_out_tokens_are_rejected(self):
+        token = RefreshToken.for_user(self.graph.viewer)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 401)
+        rotated = response.data['refresh']
+        self.assertEqual(APIClient().post('/api/auth/logout/', {'refresh': rotated}, format='json').status_code, 200)
+        self.assertEqual(self.refresh(rotated).status_code, 401)
+
+    @override_settings(TOKEN_BLACKLIST_FILTER_SYNC_SECONDS=3600)
+    def test_token_blacklisted_by_another_worker_is_rejected(self):
+        # Before this worker syncs, rotation's own blacklist write finds the existing row.
+        token = RefreshToken.for_user(self.graph.viewer)
+        self.blacklist_elsewhere(token)
+        self.assertFalse(blacklist_filter.might_contain(token['jti']))
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_rejected_after_sync_and_rebuild(self):
+        synced = RefreshToken.for_user(self.graph.viewer)
+        self.blacklist_elsewhere(synced)
+        with override_settings(TOKEN_BLACKLIST_FILTER_SYNC_SECONDS=0):
+            self.assertTrue(blacklist_filter.might_contain(synced['jti']))
+            self.assertEqual(self.refresh(synced).status_code, 401)
+        rebuilt = RefreshToken.for_user(self.graph.viewer)
+        self.blacklist_elsewhere(rebuilt)
+        blacklist_filter.rebuild()
+        for token in (synced, rebuilt):
+            self.assertTrue(blacklist_filter.might_contain(token['jti']))
+            self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_prune_tokens_deletes_expired_rows_only(self):
+        expired = [RefreshToken.for_user(self.graph.viewer) for _ in range(3)]
+        live = RefreshToken.for_user(self.graph.viewer)
+        self.blacklist_elsewhere(expired[0])
+        self.blacklist_elsewhere(live)
+        OutstandingToken.objects.filter(jti__in=[token['jti'] for token in expired]).update(
+            expires_at=timezone.now() - timedelta(minutes=1))
+        out = StringIO()
+        call_command('prune_tokens', chunk_size=2, stdout=out)
+        self.assertIn('Deleted 3 outstanding and 1 blacklisted tokens.', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']])
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=live['jti']).exists())
+
+
+class UserCountTests(GraphTestCase):
+    def assertCountsExact(self):
+        expected = {user.pk: (user.followers_set.count(), user.following_set.count(), user.posts.count())
+                    for user in User.objects.all()}
+        actual = {pk: tuple(counts) for pk, *counts in
+                  User.objects.values_list('pk', 'followers_count', 'following_count', 'posts_count')}
+        self.assertEqual(actual, expected)
+
+    def test_counts_follow_writes(self):
+        graph = self.graph
+        self.assertCountsExact()
+        client = graph.client(graph.stranger)
+        client.post(f'/api/users/{graph.author.pk}/follow/')
+        client.post('/api/posts/', {'content': 'counted'}, format='json')
+        graph.client(graph.viewer).delete(f'/api/users/{graph.author.pk}/unfollow/')
+        self.assertCountsExact()
+        profile = graph.client(graph.viewer).get(f'/api/users/{graph.author.pk}/').data
+        self.assertEqual(profile['followers_count'], graph.author.followers_set.count())
+
+    def test_purge_and_recount_keep_counts_exact(self):
+        member = User.objects.get(username='member1')
+        delete_user(member)
+        self.assertEqual(run_purge_jobs(chunk_size=2), (1, 0))
+        self.assertCountsExact()
+        User.objects.update(followers_count=0, posts_count=7)
+        recount_user_counts(chunk_size=3)
+        self.assertCountsExact()
+
+    def test_admin_listing_sorts_and_filters_by_counts(self):
+        client = self.graph.client(self.graph.admin)
+        rows = client.get('/api/admin/users/', {'ordering': '-followers_count'}).data['results']
+        counts = [row['followers_count'] for row in rows]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertEqual(rows[0]['id'], self.graph.author.pk)
+        rows = client.get('/api/admin/users/', {'min_followers': 3}).data['results']
+        self.assertEqual({row['username'] for row in rows}, {'viewer', 'author', 'stranger'})
+        plan = str(User.objects.order_by('-followers_count', '-pk')[:20].explain())
+        self.assertIn('user_followers_count_idx', plan)
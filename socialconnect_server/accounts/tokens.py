@@ -0,0 +1,141 @@
+import hashlib
+import math
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, using double hashing of one blake2b digest."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+class BlacklistFilter:
+    """Process-wide Bloom filter of blacklisted JTIs.
+
+    Built lazily from the blacklist table on first use, updated in-process on
+    every blacklist and topped up from rows added by other workers at most every
+    TOKEN_BLACKLIST_FILTER_SYNC_SECONDS. A miss means the JTI is definitely not
+    blacklisted as of the last sync, so the DB lookup can be skipped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._last_id = 0
+        self._synced_at = 0.0
+
+    def _rows(self, after_id=0):
+        return (
+            BlacklistedToken.objects.filter(id__gt=after_id)
+            .order_by('id')
+            .values_list('id', 'token__jti')
+            .iterator(chunk_size=5000)
+        )
+
+    def rebuild(self):
+        capacity = max(
+            getattr(settings, 'TOKEN_BLACKLIST_FILTER_CAPACITY', 100000),
+            BlacklistedToken.objects.count() * 2,
+        )
+        bloom = BloomFilter(capacity, getattr(settings, 'TOKEN_BLACKLIST_FILTER_ERROR_RATE', 0.01))
+        last_id = 0
+        for row_id, jti in self._rows():
+            bloom.add(jti)
+            last_id = row_id
+        with self._lock:
+            self._bloom, self._last_id, self._synced_at = bloom, last_id, time.monotonic()
+
+    def _sync(self):
+        if self._bloom is None or self._bloom.count > self._bloom.capacity:
+            self.rebuild()
+            return
+        if time.monotonic() - self._synced_at < getattr(settings, 'TOKEN_BLACKLIST_FILTER_SYNC_SECONDS', 30):
+            return
+        rows = list(self._rows(self._last_id))
+        with self._lock:
+            for row_id, jti in rows:
+                self._bloom.add(jti)
+                self._last_id = max(self._last_id, row_id)
+            self._synced_at = time.monotonic()
+
+    def add(self, jti):
+        self._sync()
+        with self._lock:
+            self._bloom.add(jti)
+
+    def might_contain(self, jti):
+        self._sync()
+        return jti in self._bloom
+
+blacklist_filter = BlacklistFilter()
+
+class FilteredRefreshToken(RefreshToken):
+    """Refresh token whose blacklist check consults `blacklist_filter` before the database.
+
+    Reuse of a token blacklisted by another worker since the last filter sync is
+    still caught: blacklisting it again on rotation or logout finds the existing
+    row and fails.
+    """
+
+    def check_blacklist(self):
+        if not blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            return
+        super().check_blacklist()
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        user_id = self.payload.get(api_settings.USER_ID_CLAIM)
+        User = get_user_model()
+        # The outstanding row normally exists already; the user is only loaded if it has to be created.
+        # Not `token, _ = ...`: `_` is gettext, used for the error below.
+        token = OutstandingToken.objects.get_or_create(
+            jti=jti,
+            defaults={
+                'user': lambda: User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first(),
+                'created_at': self.current_time,
+                'token': str(self),
+                'expires_at': datetime_from_epoch(self.payload['exp']),
+            },
+        )[0]
+        blacklisted, created = BlacklistedToken.objects.get_or_create(token=token)
+        blacklist_filter.add(jti)
+        if not created:
+            raise TokenError(_("Token is blacklisted"))
+        return blacklisted, created
+
+    def outstand(self):
+        # Only called on rotation, after the refresh serializer has loaded the user and set a fresh jti.
+        token = OutstandingToken.objects.create(
+            user_id=self.payload.get(api_settings.USER_ID_CLAIM),
+            jti=self.payload[api_settings.JTI_CLAIM],
+            token=str(self),
+            created_at=self.current_time,
+            expires_at=datetime_from_epoch(self.payload['exp']),
+        )
+        return token, True
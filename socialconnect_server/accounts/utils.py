@@ -1,26 +1,141 @@
-import logging
+from datetime import timedelta
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from socialconnect_server.log import get_logger
+from .cache import invalidate_user
+from .models import EmailOutbox, User
+from admin_panel.stats import increment_stat
 
-logger = logging.getLogger('users')
+logger = get_logger('users')
+
+def queue_email(subject, message, recipient):
+    """Write an email to the outbox; it is delivered by `manage.py send_queued_emails`.
+
+    The row joins the caller's transaction, so a rolled back registration never
+    leaves a verification email behind. With EMAIL_OUTBOX_EAGER the outbox is
+    drained right after commit through the configured EMAIL_BACKEND (locmem in tests).
+    """
+    email = EmailOutbox.objects.create(
+        subject=subject,
+        body=message,
+        from_email=settings.DEFAULT_FROM_EMAIL or '',
+        recipient=recipient,
+    )
+    if getattr(settings, 'EMAIL_OUTBOX_EAGER', False):
+        transaction.on_commit(send_queued_emails)
+    return email
+
+def _claim_emails(batch_size):
+    """Lease up to `batch_size` due emails to this worker in one short transaction.
+
+    Claimed rows turn 'sending' with `next_attempt_at` moved to the lease expiry,
+    so a worker that dies mid-batch leaves them to be claimed again once it passes.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        batch = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        EmailOutbox.objects.filter(pk__in=[email.pk for email in batch]).update(
+            status='sending', next_attempt_at=lease, attempts=F('attempts') + 1)
+    for email in batch:
+        email.status, email.next_attempt_at, email.attempts = 'sending', lease, email.attempts + 1
+    return batch
+
+def send_queued_emails(batch_size=None, connection=None):
+    """Deliver one batch of due outbox emails over a single mail connection.
+
+    Rows are claimed first and no lock is held while talking to the mail
+    server. Each outcome is committed right after its send, so a crash resends
+    at most the message in flight. Failed messages are retried with exponential
+    backoff until EMAIL_OUTBOX_MAX_ATTEMPTS is reached. Returns (sent, failed) counts.
+    """
+    batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    backoff = getattr(settings, 'EMAIL_OUTBOX_RETRY_BACKOFF', 60)
+    sent = failed = 0
+
+    batch = _claim_emails(batch_size)
+    if not batch:
+        return sent, failed
+    owns_connection = connection is None
+    connection = connection or get_connection()
+    try:
+        for email in batch:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email or None,
+                to=[email.recipient],
+            )
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                # Drop a possibly broken connection; the next send reopens it.
+                connection.close()
+                email.last_error = str(e)
+                if email.attempts >= max_attempts:
+                    email.status = 'failed'
+                else:
+                    email.status = 'pending'
+                    email.next_attempt_at = timezone.now() + timedelta(seconds=backoff * 2 ** (email.attempts - 1))
+                failed += 1
+                logger.error('email.send_failed', email_id=email.id, attempt=email.attempts, error=e)
+            else:
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                sent += 1
+            email.save(update_fields=['status', 'next_attempt_at', 'last_error', 'sent_at'])
+    finally:
+        if owns_connection:
+            connection.close()
+    logger.info('email.batch_processed', sent=sent, failed=failed)
+    return sent, failed
+
+def record_login(user):
+    """Stamp `last_login` with a single-column UPDATE, coalescing repeated logins.
+
+    Logins within LAST_LOGIN_UPDATE_INTERVAL seconds of the stored value on the
+    same day skip the write entirely. Returns True when the row was updated.
+    """
+    now = timezone.now()
+    previous = user.last_login
+    interval = timedelta(seconds=getattr(settings, 'LAST_LOGIN_UPDATE_INTERVAL', 300))
+    if previous and now - previous < interval and timezone.localdate(previous) == timezone.localdate(now):
+        return False
+    User.objects.filter(pk=user.pk).update(last_login=now)
+    user.last_login = now
+    # update() sends no post_save, so drop the cached principal here.
+    transaction.on_commit(lambda: invalidate_user(user.pk))
+    if previous is None or timezone.localdate(previous) != timezone.localdate(now):
+        # First login of the day counts towards daily active users.
+        increment_stat('active_users')
+    return True
 
 def send_verification_email(user, request=None):
     try:
         uid = urlsafe_base64_encode(force_bytes(user.pk))
         token = default_token_generator.make_token(user)
-        
+
         # Determine the domain dynamically
         if request:
-            domain = request.build_absolute_uri('/')[:-1] 
+            domain = request.build_absolute_uri('/')[:-1]
         else:
             domain = getattr(settings, 'BASE_URL', 'http://localhost:8000')
-        
-        verification_url = f"{domain}/api/verify/{uid}/{token}/"  
-        
-        send_mail(
+
+        verification_url = f"{domain}/api/verify/{uid}/{token}/"
+
+        queue_email(
             subject='Verify Your Email',
             message=(
                 f'Hi {user.username},\n\n'
@@ -28,25 +143,23 @@ def send_verification_email(user, request=None):
                 f'{verification_url}\n\n'
                 f'If you did not sign up for SocialConnect, ignore this email.'
             ),
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
+            recipient=user.email,
         )
-        logger.info(f"Verification email sent to user: {user.username} (ID: {user.id}, Email: {user.email})")
+        logger.info('email.verification_queued', user_id=user.id)
     except Exception as e:
-        logger.error(f"Failed to send verification email to user: {user.username} (ID: {user.id}, Email: {user.email}). Error: {str(e)}")
+        logger.error('email.verification_queue_failed', user_id=user.id, error=e)
         raise
 
 def send_password_reset_email(user, request=None):
     try:
         uid = urlsafe_base64_encode(force_bytes(user.pk))
         token = default_token_generator.make_token(user)
-        
+
         # Use frontend URL for reset link
         frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
         reset_url = f"{frontend_url}/reset/{uid}/{token}"
-        
-        send_mail(
+
+        queue_email(
             subject='Password Reset Request',
             message=(
                 f'Hi {user.username},\n\n'
@@ -55,11 +168,9 @@ def send_password_reset_email(user, request=None):
                 f'{reset_url}\n\n'
                 f'If you did not request this, please ignore this email.'
             ),
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
+            recipient=user.email,
         )
-        logger.info(f"Password reset email sent to user: {user.username} (ID: {user.id}, Email: {user.email})")
+        logger.info('email.password_reset_queued', user_id=user.id)
     except Exception as e:
-        logger.error(f"Failed to send password reset email to user: {user.username} (ID: {user.id}, Email: {user.email}). Error: {str(e)}")
-        raise
\ No newline at end of file
+        logger.error('email.password_reset_queue_failed', user_id=user.id, error=e)
+        raise
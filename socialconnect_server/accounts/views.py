@@ -1,4 +1,4 @@
-import logging
+import time
 from rest_framework import viewsets, status
 from rest_framework import serializers
 from rest_framework.response import Response
@@ -11,15 +11,27 @@ from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
 from django.conf import settings
 from django.http import HttpResponseRedirect
+from rest_framework.pagination import CursorPagination
 from .models import User
-from .serializers import RegisterSerializer, UserSerializer
+from .serializers import RegisterSerializer, UserSerializer, UserSummarySerializer
 from interactions.models import Follow
+from interactions.graph import MAX_SUGGESTIONS, suggested_users
+from interactions.relationships import can_view_profile, resolve_relationships
 from rest_framework.decorators import action
-from django.utils import timezone
 from rest_framework import permissions
-from .utils import send_password_reset_email
+from rest_framework.exceptions import NotFound, PermissionDenied
+from .export import export_filename, export_stream
+from .purge import delete_user
+from .search import MAX_QUERY_LENGTH, autocomplete_users
+from .utils import send_password_reset_email, record_login
+from socialconnect_server import page_cache
+from socialconnect_server.async_views import AsyncAPIView, gather, streaming_response
+from socialconnect_server.conditional import (
+    aprofile_versions, not_modified, profile_validators, profile_versions, set_validators, unchanged_since,
+)
+from socialconnect_server.log import get_logger
 
-logger = logging.getLogger('users')
+logger = get_logger('users')
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -28,9 +40,9 @@ class RegisterView(APIView):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            logger.info(f"User registered successfully: {user.username} (ID: {user.id})")
+            logger.info('user.registered', user_id=user.id)
             return Response({'message': 'User created. Check email for verification.'}, status=status.HTTP_201_CREATED)
-        logger.error(f"User registration failed: {serializer.errors}")
+        logger.warning('user.registration_invalid', errors=serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class LoginView(TokenObtainPairView):
@@ -38,23 +50,28 @@ class LoginView(TokenObtainPairView):
         def validate(self, attrs):
             identifier = attrs.get('username')
             password = attrs.get('password')
-            user = None
-            if '@' in identifier:
-                user = User.objects.filter(email=identifier).first()
-            else:
-                user = User.objects.filter(username=identifier).first()
-            if not user or not user.check_password(password):
-                logger.warning(f"Failed login attempt for identifier: {identifier}")
+            # Single indexed lookup on the unique email or username column; the
+            # password is hashed exactly once and tokens are issued directly
+            # instead of re-authenticating through super().validate().
+            lookup = 'email' if '@' in identifier else 'username'
+            user = User.objects.filter(**{lookup: identifier}).first()
+            if user is None:
+                # Pay the hashing cost anyway so unknown accounts are not revealed by timing.
+                User().set_password(password)
+            if user is None or not user.check_password(password):
+                logger.warning('auth.login_failed', identifier=identifier)
                 raise serializers.ValidationError('Invalid credentials.')
             if not user.is_active:
-                logger.warning(f"Login attempt with unverified account: {user.username} (ID: {user.id})")
+                logger.warning('auth.login_unverified', user_id=user.id)
                 raise serializers.ValidationError('Account not verified.')
-            data = super().validate(attrs)
-            user.last_login = timezone.now()
-            user.save()
-            logger.info(f"User logged in: {user.username} (ID: {user.id})")
-            data['user'] = UserSerializer(user).data
-            return data
+            refresh = self.get_token(user)
+            record_login(user)
+            logger.info('auth.login', user_id=user.id)
+            return {
+                'refresh': str(refresh),
+                'access': str(refresh.access_token),
+                'user': UserSerializer(user).data,
+            }
 
     serializer_class = CustomTokenObtainPairSerializer
 
@@ -66,9 +83,9 @@ class PasswordResetView(APIView):
         user = User.objects.filter(email=email).first()
         if user:
             send_password_reset_email(user, request)
-            logger.info(f"Password reset email sent for user: {user.username} (ID: {user.id})")
+            logger.info('auth.password_reset_requested', user_id=user.id)
         else:
-            logger.warning(f"Password reset requested for non-existent email: {email}")
+            logger.warning('auth.password_reset_unknown_email')
         return Response({'message': 'If email exists, reset instructions sent.'}, status=status.HTTP_200_OK)
 
 class PasswordResetConfirmView(APIView):
@@ -84,12 +101,12 @@ class PasswordResetConfirmView(APIView):
             if default_token_generator.check_token(user, token):
                 user.set_password(password)
                 user.save()
-                logger.info(f"Password reset successful for user: {user.username} (ID: {user.id})")
+                logger.info('auth.password_reset', user_id=user.id)
                 return Response({'message': 'Password reset successful.'})
             else:
-                logger.warning(f"Invalid password reset token for user ID: {uid}")
+                logger.warning('auth.password_reset_token_invalid', user_id=uid)
         except Exception as e:
-            logger.error(f"Password reset failed: {str(e)}")
+            logger.error('auth.password_reset_failed', error=e)
         return Response({'error': 'Invalid token.'}, status=status.HTTP_400_BAD_REQUEST)
 
 class ChangePasswordView(APIView):
@@ -99,11 +116,12 @@ class ChangePasswordView(APIView):
         old_password = request.data.get('old_password')
         new_password = request.data.get('new_password')
         if not request.user.check_password(old_password):
-            logger.warning(f"Invalid old password attempt for user: {request.user.username} (ID: {request.user.id})")
+            logger.warning('auth.password_change_rejected', user_id=request.user.id)
             return Response({'error': 'Invalid old password.'}, status=status.HTTP_400_BAD_REQUEST)
         request.user.set_password(new_password)
-        request.user.save()
-        logger.info(f"Password changed for user: {request.user.username} (ID: {request.user.id})")
+        # request.user may come from the auth cache; write only the password column.
+        request.user.save(update_fields=['password'])
+        logger.info('auth.password_changed', user_id=request.user.id)
         return Response({'message': 'Password changed.'})
 
 class VerifyEmailView(APIView):
@@ -114,21 +132,43 @@ class VerifyEmailView(APIView):
             uid = force_str(urlsafe_base64_decode(uidb64))
             user = User.objects.get(pk=uid)
         except (TypeError, ValueError, OverflowError, User.DoesNotExist):
-            logger.error(f"Invalid email verification attempt: uid={uidb64}, token={token}")
+            logger.warning('auth.verification_uid_invalid', uid=uidb64)
             user = None
 
         if user is not None and default_token_generator.check_token(user, token):
             if not user.is_active:
                 user.is_active = True
                 user.save()
-                logger.info(f"Email verified for user: {user.username} (ID: {user.id})")
+                logger.info('auth.email_verified', user_id=user.id)
                 frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
                 return HttpResponseRedirect(f"{frontend_url}/login?verified=true")
-            logger.info(f"Email already verified for user: {user.username} (ID: {user.id})")
+            logger.info('auth.email_already_verified', user_id=user.id)
             return Response({'detail': 'Email already verified.'}, status=status.HTTP_200_OK)
-        logger.warning(f"Invalid email verification link: uid={uidb64}, token={token}")
+        logger.warning('auth.verification_link_invalid', uid=uidb64)
         return Response({'detail': 'Invalid verification link.'}, status=status.HTTP_400_BAD_REQUEST)
 
+class FollowCursorPagination(CursorPagination):
+    page_size = 20
+    ordering = '-id'
+
+SUMMARY_FIELDS = UserSummarySerializer.Meta.fields
+
+def stream_ids(request, values, chunk_size=2000):
+    """Stream an iterable of ids as a JSON array without materialising it."""
+    def generate():
+        yield '['
+        batch = []
+        first = True
+        for value in values:
+            batch.append(str(value))
+            if len(batch) == chunk_size:
+                yield ('' if first else ',') + ','.join(batch)
+                batch, first = [], False
+        if batch:
+            yield ('' if first else ',') + ','.join(batch)
+        yield ']'
+    return streaming_response(request, generate(), content_type='application/json')
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -139,46 +179,85 @@ class UserViewSet(viewsets.ModelViewSet):
         return [IsAuthenticated()]
 
     def get_queryset(self):
-        if self.request.user.is_staff:
-            return User.objects.all()
-        return User.objects.filter(is_active=True)
+        queryset = User.objects.all() if self.request.user.is_staff else User.objects.filter(is_active=True)
+        return queryset.order_by('id')
 
     def get_object(self):
         pk = self.kwargs['pk']
         if pk == 'me':
-            return self.request.user
+            if self.request.method in permissions.SAFE_METHODS and self.action != 'retrieve':
+                return self.request.user
+            # A fresh, annotated row: one query instead of three counts, and a cached
+            # principal is never written back.
+            return self.get_queryset().get(pk=self.request.user.pk)
         return super().get_object()
 
     def retrieve(self, request, *args, **kwargs):
+        pk = str(self.kwargs['pk'])
+        user_id = request.user.pk if pk == 'me' else int(pk) if pk.isdigit() else None
+        validators = None
+        if user_id is not None:
+            # The profile version alone decides freshness, so a 304 costs no query.
+            version = profile_versions([user_id])[user_id]
+            validators = profile_validators(user_id, version, request.user)
+            response = not_modified(request, *validators)
+            if response is not None:
+                logger.info('profile.not_modified', user_id=user_id, viewer_id=request.user.id)
+                return response
+            started = time.time()
+        if validators is not None and page_cache.enabled(request):
+            # Anonymous visitors all see the same public profile.
+            status_code, data = page_cache.cached_page(request, 'profile', version, self._profile_data)
+        else:
+            status_code, data = self._profile_data()
+        response = Response(data, status=status_code)
+        if status_code != 200:
+            return response
+        if validators is not None and unchanged_since([version], started):
+            set_validators(response, *validators)
+        logger.info('profile.retrieved', user_id=data['id'], viewer_id=request.user.id)
+        return response
+
+    def _profile_data(self):
         user = self.get_object()
-        if user.privacy == 'private' and user != request.user:
-            logger.warning(f"Unauthorized access to private profile: {user.username} by {request.user.username}")
-            return Response({'detail': 'Private profile.'}, status=status.HTTP_403_FORBIDDEN)
-        if user.privacy == 'followers_only' and not Follow.objects.filter(follower=request.user, following=user).exists() and user != request.user:
-            logger.warning(f"Unauthorized access to followers-only profile: {user.username} by {request.user.username}")
-            return Response({'detail': 'Followers only.'}, status=status.HTTP_403_FORBIDDEN)
-        serializer = self.get_serializer(user)
-        logger.info(f"Profile retrieved: {user.username} (ID: {user.id}) by {request.user.username}")
-        return Response(serializer.data)
+        viewer = self.request.user
+        if not can_view_profile(viewer, user):
+            if user.privacy == 'private':
+                logger.warning('profile.access_denied', user_id=user.id, viewer_id=viewer.id, privacy='private')
+                return status.HTTP_403_FORBIDDEN, {'detail': 'Private profile.'}
+            logger.warning('profile.access_denied', user_id=user.id, viewer_id=viewer.id, privacy='followers_only')
+            return status.HTTP_403_FORBIDDEN, {'detail': 'Followers only.'}
+        return 200, self.get_serializer(user).data
 
     def perform_update(self, serializer):
-        if self.get_object() != self.request.user and not self.request.user.is_staff:
-            logger.warning(f"Unauthorized profile update attempt by {self.request.user.username} on user ID: {self.get_object().id}")
+        if serializer.instance != self.request.user and not self.request.user.is_staff:
+            logger.warning('profile.update_denied', user_id=self.kwargs['pk'], viewer_id=self.request.user.id)
             raise permissions.PermissionDenied('Cannot edit this profile.')
         serializer.save()
-        logger.info(f"Profile updated: {self.request.user.username} (ID: {self.request.user.id})")
+        logger.info('profile.updated', user_id=self.request.user.id)
+
+    def perform_destroy(self, instance):
+        if instance != self.request.user and not self.request.user.is_staff:
+            logger.warning('account.delete_denied', user_id=instance.id, viewer_id=self.request.user.id)
+            raise PermissionDenied('Cannot delete this account.')
+        if instance.is_staff and instance != self.request.user:
+            logger.warning('account.delete_denied', user_id=instance.id, viewer_id=self.request.user.id)
+            raise PermissionDenied('Cannot delete admin users.')
+        # Deactivated now; the account and its content are removed in the background.
+        delete_user(instance, requested_by=self.request.user)
+        logger.info('account.deleted', user_id=instance.id, viewer_id=self.request.user.id)
 
     @action(detail=True, methods=['post'])
     def follow(self, request, pk=None):
         target_user = self.get_object()
         if target_user == request.user:
-            logger.warning(f"User {request.user.username} attempted to follow themselves")
+            logger.warning('follow.self', user_id=request.user.id)
             return Response({'detail': 'Cannot follow yourself.'}, status=status.HTTP_400_BAD_REQUEST)
         _, created = Follow.objects.get_or_create(follower=request.user, following=target_user)
         if not created:
-            logger.info(f"User {request.user.username} already following {target_user.username}")
+            logger.info('follow.exists', follower_id=request.user.id, following_id=target_user.id)
             return Response({'detail': 'Already following.'}, status=status.HTTP_400_BAD_REQUEST)
-        logger.info(f"User {request.user.username} followed {target_user.username} (ID: {target_user.id})")
+        logger.info('follow.created', follower_id=request.user.id, following_id=target_user.id)
         return Response({'detail': 'Followed.'})
 
     @action(detail=True, methods=['delete'])
@@ -186,24 +265,148 @@ class UserViewSet(viewsets.ModelViewSet):
         target_user = self.get_object()
         follow = Follow.objects.filter(follower=request.user, following=target_user).first()
         if not follow:
-            logger.info(f"User {request.user.username} not following {target_user.username}")
+            logger.info('follow.missing', follower_id=request.user.id, following_id=target_user.id)
             return Response({'detail': 'Not following.'}, status=status.HTTP_400_BAD_REQUEST)
         follow.delete()
-        logger.info(f"User {request.user.username} unfollowed {target_user.username} (ID: {target_user.id})")
+        logger.info('follow.deleted', follower_id=request.user.id, following_id=target_user.id)
         return Response({'detail': 'Unfollowed.'})
 
+    @action(detail=False, methods=['get'])
+    def relationships(self, request):
+        """Follow state in both directions for `?ids=1,2,3` (at most RELATIONSHIP_LOOKUP_MAX ids)."""
+        max_ids = getattr(settings, 'RELATIONSHIP_LOOKUP_MAX', 100)
+        try:
+            ids = [int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()]
+        except ValueError:
+            return Response({'ids': 'Must be a comma-separated list of user IDs.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > max_ids:
+            return Response({'ids': f'At most {max_ids} IDs per request.'}, status=status.HTTP_400_BAD_REQUEST)
+        relationships = resolve_relationships(request.user, ids)
+        logger.info('relationships.resolved', user_id=request.user.id, count=len(ids))
+        return Response({str(pk): state for pk, state in relationships.items()})
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """The account's posts, comments, likes, follows and notifications as streamed NDJSON (`?gzip=1` to compress)."""
+        user = self.get_object()
+        if user.pk != request.user.pk and not request.user.is_staff:
+            logger.warning('export.denied', user_id=user.id, viewer_id=request.user.id)
+            raise PermissionDenied('Cannot export this account.')
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        response = streaming_response(
+            request, export_stream(user, compress), content_type='application/gzip' if compress else 'application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(user, compress)}"'
+        response['Cache-Control'] = 'no-store'
+        logger.info('export.started', user_id=user.id, viewer_id=request.user.id, gzip=compress)
+        return response
+
+    def _summary_context(self, request, users):
+        if request.query_params.get('with_relationship') in ('1', 'true'):
+            return {'relationships': resolve_relationships(request.user, [user.pk for user in users])}
+        return {}
+
+    @action(detail=False, methods=['get'])
+    def suggestions(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), MAX_SUGGESTIONS)
+        except ValueError:
+            return Response({'limit': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        suggestions = suggested_users(request.user, limit)
+        context = self._summary_context(request, [user for user, _ in suggestions])
+        results = []
+        for user, mutual_count in suggestions:
+            data = UserSummarySerializer(user, context=context).data
+            data['mutual_count'] = mutual_count
+            results.append(data)
+        logger.info('suggestions.retrieved', user_id=request.user.id, count=len(results))
+        return Response(results)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Users whose username or name starts with `?q=` (at most AUTOCOMPLETE_MAX_RESULTS; excludes private and inactive users)."""
+        max_results = getattr(settings, 'AUTOCOMPLETE_MAX_RESULTS', 20)
+        q = request.query_params.get('q', '')
+        if not q.strip():
+            return Response({'q': 'This parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(q) > MAX_QUERY_LENGTH:
+            return Response({'q': f'At most {MAX_QUERY_LENGTH} characters.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), max_results)
+        except ValueError:
+            return Response({'limit': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        results = autocomplete_users(q, limit)
+        logger.debug('autocomplete.retrieved', user_id=request.user.id, prefix_length=len(q), count=len(results))
+        return Response(results)
+
     @action(detail=True, methods=['get'])
     def followers(self, request, pk=None):
         user = self.get_object()
-        followers = [f.follower for f in user.followers_set.all()]
-        serializer = UserSerializer(followers, many=True)
-        logger.info(f"Followers retrieved for user: {user.username} (ID: {user.id}) by {request.user.username}")
-        return Response(serializer.data)
+        response = self._follow_list(request, Follow.objects.filter(following=user), 'follower')
+        logger.info('followers.retrieved', user_id=user.id, viewer_id=request.user.id)
+        return response
 
     @action(detail=True, methods=['get'])
     def following(self, request, pk=None):
         user = self.get_object()
-        following = [f.following for f in user.following_set.all()]
-        serializer = UserSerializer(following, many=True)
-        logger.info(f"Following list retrieved for user: {user.username} (ID: {user.id}) by {request.user.username}")
-        return Response(serializer.data)
\ No newline at end of file
+        response = self._follow_list(request, Follow.objects.filter(follower=user), 'following')
+        logger.info('following.retrieved', user_id=user.id, viewer_id=request.user.id)
+        return response
+
+    def _follow_list(self, request, follows, side):
+        """Cursor-paginated users on one side of `follows`, fetched with a single join.
+
+        `?ids_only=1` streams every id as a JSON array instead.
+        """
+        if request.query_params.get('ids_only') in ('1', 'true'):
+            return stream_ids(request, follows.order_by('-id').values_list(f'{side}_id', flat=True).iterator(chunk_size=2000))
+        follows = follows.select_related(side).only('id', *(f'{side}__{field}' for field in SUMMARY_FIELDS))
+        paginator = FollowCursorPagination()
+        page = paginator.paginate_queryset(follows, request, view=self)
+        users = [getattr(follow, side) for follow in page]
+        serializer = UserSummarySerializer(users, many=True, context=self._summary_context(request, users))
+        return paginator.get_paginated_response(serializer.data)
+
+class AsyncUserDetailView(AsyncAPIView):
+    """UserViewSet.retrieve for ASGI; profile updates go to UserViewSet.
+
+    The annotated profile row and the viewer's follow state (needed for
+    followers-only profiles) are fetched concurrently.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    async def get(self, request, pk):
+        viewer = request.user
+        if pk == 'me' and not viewer.is_authenticated:
+            raise NotFound('No User matches the given query.')
+        user_id = viewer.pk if pk == 'me' else int(pk)
+        version = (await aprofile_versions([user_id]))[user_id]
+        validators = profile_validators(user_id, version, viewer)
+        response = not_modified(request, *validators)
+        if response is not None:
+            logger.info('profile.not_modified', user_id=user_id, viewer_id=viewer.id)
+            return response
+        started = time.time()
+        queryset = User.objects.all() if viewer.is_staff else User.objects.filter(is_active=True)
+        lookup_following = viewer.is_authenticated and viewer.pk != user_id
+
+        def following():
+            return resolve_relationships(viewer, [user_id])[user_id]['following'] if lookup_following else False
+
+        async def build():
+            user, is_following = await gather(queryset.filter(pk=user_id).first, following)
+            if user is None:
+                raise NotFound('No User matches the given query.')
+            if not can_view_profile(viewer, user, following=is_following):
+                logger.warning('profile.access_denied', user_id=user.id, viewer_id=viewer.id, privacy=user.privacy)
+                raise PermissionDenied('Private profile.' if user.privacy == 'private' else 'Followers only.')
+            return 200, UserSerializer(user).data
+
+        if page_cache.enabled(request):
+            _, data = await page_cache.acached_page(request, 'profile', version, build)
+        else:
+            _, data = await build()
+        response = self.render(data)
+        if unchanged_since([version], started):
+            set_validators(response, *validators)
+        logger.info('profile.retrieved', user_id=user_id, viewer_id=viewer.id)
+        return response
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.db import transaction
+from socialconnect_server.log import get_logger
+
+logger = get_logger('users')
+
+OUTCOMES = ['updated', 'unchanged', 'skipped', 'not_found']
+# Rows one request may target, by id list or by filter.
+MAX_TARGETS = 10000
+
+def _filtered_id_chunks(queryset, chunk_size, after, limit):
+    # Keyset pagination over the primary key keeps every chunk an index range scan.
+    last_id = after
+    while limit > 0:
+        ids = list(queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:min(chunk_size, limit)])
+        if not ids:
+            return
+        last_id = ids[-1]
+        limit -= len(ids)
+        yield ids
+
+def bulk_set_active(queryset, target, is_active, protected_field=None, on_changed=None, chunk_size=None):
+    """Set `is_active` on the rows selected by `target` (validated BulkActionSerializer data).
+
+    Rows are processed in chunks of ADMIN_BULK_CHUNK_SIZE: one SELECT to classify
+    the chunk and one set-based UPDATE for the rows that actually change. Rows
+    with `protected_field` set are skipped. `on_changed` receives the ids updated
+    in each chunk inside the chunk's transaction, e.g. to queue follow-up work
+    or (with transaction.on_commit) to invalidate caches in batch.
+
+    A filter matching more than MAX_TARGETS rows stops after the first
+    MAX_TARGETS by id; `next_after` in the report is then the last id
+    processed, to send back as `after` for the next batch.
+    """
+    chunk_size = chunk_size or getattr(settings, 'ADMIN_BULK_CHUNK_SIZE', 500)
+    if 'ids' in target:
+        ids = list(dict.fromkeys(target['ids']))
+        chunks = (ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size))
+    else:
+        filtered = queryset.filter(**target['filter'])
+        chunks = _filtered_id_chunks(filtered, chunk_size, target.get('after', 0), MAX_TARGETS)
+
+    fields = ['pk', 'is_active'] + ([protected_field] if protected_field else [])
+    results = {}
+    processed = chunk_count = 0
+    last_id = None
+    for chunk in chunks:
+        chunk_count += 1
+        last_id = chunk[-1]
+        rows = {row[0]: row[1:] for row in queryset.filter(pk__in=chunk).values_list(*fields)}
+        changed = []
+        for pk in chunk:
+            if pk not in rows:
+                results[pk] = 'not_found'
+            elif protected_field and rows[pk][1]:
+                results[pk] = 'skipped'
+            elif rows[pk][0] == is_active:
+                results[pk] = 'unchanged'
+            else:
+                changed.append(pk)
+        if changed:
+            with transaction.atomic():
+                # The is_active guard keeps the UPDATE a no-op for rows changed concurrently.
+                queryset.filter(pk__in=changed, is_active=not is_active).update(is_active=is_active)
+                if on_changed:
+                    on_changed(changed)
+        for pk in changed:
+            results[pk] = 'updated'
+        processed += len(chunk)
+        logger.info('admin.bulk_chunk', model=queryset.model.__name__, is_active=is_active, chunk=chunk_count, processed=processed)
+
+    next_after = None
+    if 'filter' in target and processed >= MAX_TARGETS and filtered.filter(pk__gt=last_id).exists():
+        next_after = last_id
+        logger.info('admin.bulk_truncated', model=queryset.model.__name__, is_active=is_active, next_after=next_after)
+
+    summary = {outcome: 0 for outcome in OUTCOMES}
+    for outcome in results.values():
+        summary[outcome] += 1
+    return {'processed': processed, 'chunks': chunk_count, 'summary': summary, 'results': results, 'next_after': next_after}
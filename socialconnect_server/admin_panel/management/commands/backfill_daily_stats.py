@@ -0,0 +1,68 @@
+from datetime import datetime, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from accounts.models import User
+from posts.models import Post
+from interactions.models import Like, Comment
+from admin_panel.models import DailyStats
+
+
+class Command(BaseCommand):
+    help = 'Recompute DailyStats rollup rows from the source tables (run nightly).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD). Defaults to yesterday.')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD). Defaults to today.')
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild from the first user or post onwards; the admin stats totals are sums of these rows.')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        tz = timezone.get_current_timezone()
+        start = parse_date(options['start']) if options['start'] else today - timedelta(days=1)
+        end = parse_date(options['end']) if options['end'] else today
+        if options['all']:
+            first = min(filter(None, [
+                User.objects.aggregate(first=Min('date_joined'))['first'],
+                Post.objects.aggregate(first=Min('created_at'))['first'],
+            ]), default=None)
+            start = timezone.localtime(first, tz).date() if first else today
+        if not start or not end or start > end:
+            raise CommandError('Invalid date range.')
+
+        since = timezone.make_aware(datetime.combine(start, time.min), tz)
+        until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+
+        def daily_counts(queryset, field):
+            return dict(
+                queryset.filter(**{f'{field}__gte': since, f'{field}__lt': until})
+                .annotate(day=TruncDate(field, tzinfo=tz))
+                .values('day')
+                .annotate(total=Count('id'))
+                .values_list('day', 'total')
+            )
+
+        new_users = daily_counts(User.objects.all(), 'date_joined')
+        posts = daily_counts(Post.objects.all(), 'created_at')
+        likes = daily_counts(Like.objects.all(), 'created_at')
+        comments = daily_counts(Comment.objects.all(), 'created_at')
+        # Only the latest login per user is stored, so this is a lower bound for past days.
+        logins = daily_counts(User.objects.all(), 'last_login')
+
+        with transaction.atomic():
+            existing = {row.date: row for row in DailyStats.objects.select_for_update().filter(date__range=(start, end))}
+            day = start
+            while day <= end:
+                row = existing.get(day) or DailyStats(date=day)
+                row.new_users = new_users.get(day, 0)
+                row.posts = posts.get(day, 0)
+                row.likes = likes.get(day, 0)
+                row.comments = comments.get(day, 0)
+                row.active_users = max(row.active_users, logins.get(day, 0))
+                row.save()
+                day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt daily stats from {start} to {end}.'))
@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def seed_daily_stats(apps, schema_editor):
+    # The admin stats totals are sums of the daily rows, so count the rows from before the rollup once.
+    # Same counts as `backfill_daily_stats --all`; active users are left to the signals and the nightly run.
+    DailyStats = apps.get_model('admin_panel', 'DailyStats')
+    tz = timezone.get_current_timezone()
+    sources = {
+        'new_users': (apps.get_model('accounts', 'User'), 'date_joined'),
+        'posts': (apps.get_model('posts', 'Post'), 'created_at'),
+        'likes': (apps.get_model('interactions', 'Like'), 'created_at'),
+        'comments': (apps.get_model('interactions', 'Comment'), 'created_at'),
+    }
+    days = {}
+    for stat, (model, field) in sources.items():
+        counts = (model.objects.annotate(day=TruncDate(field, tzinfo=tz)).values('day')
+                  .annotate(total=Count('id')).values_list('day', 'total'))
+        for day, total in counts:
+            days.setdefault(day, {})[stat] = total
+    existing = DailyStats.objects.in_bulk(list(days), field_name='date')
+    for day, counts in days.items():
+        row = existing.get(day) or DailyStats(date=day)
+        for stat in sources:
+            setattr(row, stat, counts.get(stat, 0))
+        row.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0001_initial'),
+        ('accounts', '0007_user_prefix_order_indexes'),
+        ('interactions', '0003_partition_like_follow'),
+        ('posts', '0002_post_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_daily_stats, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,13 @@
 from django.db import models
 
-# Create your models here.
+class DailyStats(models.Model):
+    """Per-day activity rollup, kept current by admin_panel.stats and reconciled by `backfill_daily_stats`."""
+    date = models.DateField(unique=True)
+    new_users = models.PositiveIntegerField(default=0)
+    active_users = models.PositiveIntegerField(default=0)
+    posts = models.PositiveIntegerField(default=0)
+    likes = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
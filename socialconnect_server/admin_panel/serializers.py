@@ -0,0 +1,34 @@
+from rest_framework import serializers
+from accounts.models import PurgeJob
+from .bulk import MAX_TARGETS
+
+class BulkActionSerializer(serializers.Serializer):
+    """Targets for a bulk moderation action: an explicit id list or a whitelisted filter expression.
+
+    A filter is applied to at most MAX_TARGETS rows per request, in id order
+    from `after`.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False, max_length=MAX_TARGETS)
+    filter = serializers.DictField(required=False, allow_empty=False)
+    after = serializers.IntegerField(min_value=0, required=False)
+
+    def validate_filter(self, value):
+        allowed = self.context.get('filter_fields', [])
+        unknown = [key for key in value if key not in allowed]
+        if unknown:
+            raise serializers.ValidationError(f"Unsupported filter fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}.")
+        return value
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError('Provide exactly one of "ids" or "filter".')
+        if 'after' in attrs and 'ids' in attrs:
+            raise serializers.ValidationError('"after" only applies to "filter".')
+        return attrs
+
+class PurgeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PurgeJob
+        fields = ['id', 'target', 'object_id', 'requested_by_id', 'status', 'stage', 'progress', 'attempts',
+                  'last_error', 'created_at', 'updated_at', 'finished_at']
+        read_only_fields = fields
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from accounts.models import User
+from posts.models import Post
+from interactions.models import Like, Comment
+from .stats import decrement_stat, increment_stat
+
+@receiver(post_save, sender=User)
+def count_new_user(sender, instance, created, **kwargs):
+    if created:
+        increment_stat('new_users')
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        increment_stat('posts')
+
+@receiver(post_save, sender=Like)
+def count_new_like(sender, instance, created, **kwargs):
+    if created:
+        increment_stat('likes')
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        increment_stat('comments')
+
+# Purged users and posts leave the all-time totals on the day they were counted.
+@receiver(post_delete, sender=User)
+def uncount_user(sender, instance, **kwargs):
+    decrement_stat('new_users', timezone.localdate(instance.date_joined))
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    decrement_stat('posts', timezone.localdate(instance.created_at))
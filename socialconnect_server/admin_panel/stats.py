@@ -0,0 +1,38 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import DailyStats
+
+STAT_FIELDS = ['new_users', 'active_users', 'posts', 'likes', 'comments']
+
+def increment_stat(field, amount=1, date=None):
+    """Atomically add `amount` to one counter of the rollup row for `date` (today by default)."""
+    date = date or timezone.localdate()
+    if DailyStats.objects.filter(date=date).update(**{field: F(field) + amount}):
+        return
+    try:
+        with transaction.atomic():
+            DailyStats.objects.create(date=date, **{field: amount})
+    except IntegrityError:
+        # Another request created today's row first.
+        DailyStats.objects.filter(date=date).update(**{field: F(field) + amount})
+
+def decrement_stat(field, date):
+    """Take one off a counter of `date`'s row, for a row deleted after being counted there."""
+    # A day the rollup never counted (not backfilled yet) has nothing to take off.
+    DailyStats.objects.filter(date=date, **{f'{field}__gt': 0}).update(**{field: F(field) - 1})
+
+def platform_totals(date=None):
+    """All-time users and posts plus `date`'s active users, in one query over the rollup.
+
+    The table has one row per day, so this stays cheap however large the source
+    tables grow. Totals are the sum of the daily counts; admin_panel migration
+    0002 counted the rows from before the rollup.
+    """
+    date = date or timezone.localdate()
+    return DailyStats.objects.aggregate(
+        total_users=Coalesce(Sum('new_users'), 0),
+        total_posts=Coalesce(Sum('posts'), 0),
+        active_today=Coalesce(Sum('active_users', filter=Q(date=date)), 0),
+    )
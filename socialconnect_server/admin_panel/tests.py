@@ -1,3 +1,150 @@
-from django.test import TestCase
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from accounts.models import PurgeJob, User
+from accounts.purge import run_purge_jobs
+from interactions.models import Comment, Like
+from posts.models import Post
+from socialconnect_server.testing import PASSWORD, GraphTestCase
+from .models import DailyStats
+from .stats import STAT_FIELDS
+
+
+class DailyStatsTests(GraphTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = self.graph.client(self.graph.admin)
+
+    def today(self):
+        return DailyStats.objects.values(*STAT_FIELDS).get(date=timezone.localdate())
+
+    def stats(self):
+        response = self.client.get('/api/admin/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_writes_are_counted_as_they_happen(self):
+        self.assertEqual(self.today(), {
+            'new_users': User.objects.count(), 'active_users': 0, 'posts': Post.objects.count(),
+            'likes': Like.objects.count(), 'comments': Comment.objects.count(),
+        })
+        author = self.graph.client(self.graph.author)
+        author.post('/api/posts/', {'content': 'counted'}, format='json')
+        author.post(f'/api/posts/{self.graph.stranger_post.pk}/like/')
+        self.graph.client().post('/api/auth/login/', {'username': 'stranger', 'password': PASSWORD}, format='json')
+        today = self.today()
+        self.assertEqual((today['posts'], today['likes'], today['active_users']),
+                         (Post.objects.count(), Like.objects.count(), 1))
+
+    def test_totals_come_from_the_rollup(self):
+        self.assertEqual(self.stats(), {'total_users': User.objects.count(), 'total_posts': Post.objects.count(), 'active_today': 0})
+        # Purging deletes rows; they leave the totals on the day they were counted.
+        self.graph.spare_post.delete()
+        self.graph.stranger.delete()
+        self.assertEqual(self.stats(), {'total_users': User.objects.count(), 'total_posts': Post.objects.count(), 'active_today': 0})
+        # Rows from before the rollup are counted once backfilled.
+        DailyStats.objects.all().delete()
+        self.assertEqual(self.stats()['total_users'], 0)
+        earlier = timezone.now() - timedelta(days=40)
+        User.objects.filter(username='member1').update(date_joined=earlier)
+        Post.objects.filter(pk=self.graph.viewer_post.pk).update(created_at=earlier)
+        out = StringIO()
+        call_command('backfill_daily_stats', all=True, stdout=out)
+        self.assertIn(f'from {timezone.localdate(earlier)} ', out.getvalue())
+        self.assertEqual(self.stats(), {'total_users': User.objects.count(), 'total_posts': Post.objects.count(), 'active_today': 0})
+        self.assertEqual(DailyStats.objects.get(date=timezone.localdate(earlier)).new_users, 1)
+
+    def test_migration_seeds_totals_from_existing_rows(self):
+        seed = import_module('admin_panel.migrations.0002_seed_daily_stats').seed_daily_stats
+        # A deployment whose rows predate the rollup.
+        DailyStats.objects.all().delete()
+        earlier = timezone.now() - timedelta(days=40)
+        User.objects.filter(username='member1').update(date_joined=earlier)
+        seed(apps, None)
+        self.assertEqual(self.stats(), {'total_users': User.objects.count(), 'total_posts': Post.objects.count(), 'active_today': 0})
+        self.assertEqual(DailyStats.objects.get(date=timezone.localdate(earlier)).new_users, 1)
+        self.assertEqual(self.today()['likes'], Like.objects.count())
+
+    def test_backfill_rejects_bad_ranges(self):
+        with self.assertRaises(CommandError):
+            call_command('backfill_daily_stats', start='2026-02-01', end='2026-01-01', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('backfill_daily_stats', start='yesterday', stdout=StringIO())
+
+    def test_series_fills_every_day_of_a_valid_range(self):
+        today = timezone.localdate()
+        response = self.client.get('/api/admin/stats/daily/')
+        self.assertEqual(len(response.data['results']), 30)
+        self.assertEqual(response.data['results'][-1]['new_users'], User.objects.count())
+        self.assertEqual(response.data['results'][0]['new_users'], 0)
+        start, end = today - timedelta(days=365), today
+        self.assertEqual(len(self.client.get('/api/admin/stats/daily/', {'start': start, 'end': end}).data['results']), 366)
+        for params in ({'start': 'soon'}, {'start': '2026-02-31'}, {'start': today, 'end': today - timedelta(days=1)},
+                       {'start': start - timedelta(days=1), 'end': end}):
+            self.assertEqual(self.client.get('/api/admin/stats/daily/', params).status_code, 400, params)
+        self.assertEqual(self.graph.client(self.graph.viewer).get('/api/admin/stats/daily/').status_code, 403)
+
+
+class BulkModerationTests(GraphTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = self.graph.client(self.graph.admin)
+        cache.clear()
+
+    def bulk(self, action, body, status=200, model='users'):
+        # Cache invalidation waits for the chunk to commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/admin/{model}/bulk-{action}/', body, format='json')
+        self.assertEqual(response.status_code, status, response.data)
+        return response.data
+
+    def test_per_id_outcomes(self):
+        graph = self.graph
+        ids = [graph.stranger.pk, graph.pending.pk, graph.admin.pk, 10 ** 9, graph.stranger.pk]
+        report = self.bulk('deactivate', {'ids': ids})
+        self.assertEqual(report['results'], {
+            graph.stranger.pk: 'updated', graph.pending.pk: 'unchanged', graph.admin.pk: 'skipped', 10 ** 9: 'not_found'})
+        self.assertEqual(report['summary'], {'updated': 1, 'unchanged': 1, 'skipped': 1, 'not_found': 1})
+        self.assertEqual(report['processed'], 4)
+        self.assertFalse(User.objects.get(pk=graph.stranger.pk).is_active)
+        # Admins are never deactivated, by id or by filter.
+        self.bulk('deactivate', {'filter': {'is_staff': True}}, status=400)
+        self.bulk('deactivate', {'filter': {'username__startswith': 'adm'}})
+        self.assertTrue(User.objects.get(pk=graph.admin.pk).is_active)
+
+    def test_deactivated_users_lose_their_cached_session(self):
+        member = User.objects.get(username='member1')
+        client = self.graph.client(member)
+        self.assertEqual(client.get('/api/feed/').status_code, 200)  # caches the principal
+        self.bulk('deactivate', {'filter': {'username__startswith': 'member'}})
+        self.assertEqual(client.get('/api/feed/').status_code, 401)
+        self.bulk('activate', {'ids': [member.pk]})
+        self.assertEqual(client.get('/api/feed/').status_code, 200)
+
+    def test_filter_targets_are_capped(self):
+        members = list(User.objects.filter(username__startswith='member').order_by('pk').values_list('pk', flat=True))
+        with mock.patch('admin_panel.bulk.MAX_TARGETS', 2):
+            report = self.bulk('deactivate', {'filter': {'username__startswith': 'member'}})
+            self.assertEqual((report['processed'], report['next_after']), (2, members[1]))
+            report = self.bulk('deactivate', {'filter': {'username__startswith': 'member'}, 'after': report['next_after']})
+        self.assertEqual((report['processed'], report['next_after']), (1, None))
+        self.assertFalse(User.objects.filter(pk__in=members, is_active=True).exists())
+        self.bulk('deactivate', {'ids': members, 'after': 0}, status=400)
+
+    def test_bulk_deleted_posts_are_purged_like_single_deletes(self):
+        graph = self.graph
+        posts = list(Post.objects.filter(author__username__startswith='member').values_list('pk', flat=True))
+        report = self.bulk('delete', {'ids': posts}, model='posts')
+        self.assertEqual(report['summary']['updated'], len(posts))
+        self.assertEqual(set(PurgeJob.objects.filter(target='post').values_list('object_id', 'requested_by_id')),
+                         {(pk, graph.admin.pk) for pk in posts})
+        self.assertEqual(run_purge_jobs(), (len(posts), 0))
+        self.assertFalse(Post.objects.filter(pk__in=posts).exists())
+        self.assertEqual(set(User.objects.filter(username__startswith='member').values_list('posts_count', flat=True)), {0})
 
-# Create your tests here.
@@ -1,45 +1,87 @@
-import logging
-from rest_framework import viewsets
+from rest_framework import viewsets, status
 from rest_framework.permissions import IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import action
-from accounts.models import User
+from rest_framework.exceptions import MethodNotAllowed, ValidationError
+from accounts.models import PurgeJob, User
 from accounts.serializers import UserSerializer
 from posts.models import Post
 from posts.serializers import PostSerializer
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from accounts.cache import invalidate_users
+from accounts.purge import delete_post, queue_post_purges
+from posts.queries import with_post_relations
+from .bulk import bulk_set_active
+from .models import DailyStats
+from .serializers import BulkActionSerializer, PurgeJobSerializer
+from .stats import STAT_FIELDS, platform_totals
+from socialconnect_server.conditional import bump_public_posts
+from socialconnect_server.log import get_logger
 
-logger = logging.getLogger('users')
+logger = get_logger('users')
 
 class AdminPagination(PageNumberPagination):
     page_size = 20
 
+def apply_listing_params(queryset, params, ordering_fields, count_filters, default_ordering):
+    """Apply `?ordering=` and integer count filters in SQL; both may reference annotations."""
+    for param, lookup in count_filters.items():
+        if param in params:
+            try:
+                value = int(params[param])
+            except ValueError:
+                raise ValidationError({param: 'Must be an integer.'})
+            queryset = queryset.filter(**{lookup: value})
+    ordering = params.get('ordering', default_ordering)
+    if ordering.lstrip('-') not in ordering_fields:
+        raise ValidationError({'ordering': f"Must be one of: {', '.join(ordering_fields)} (prefix with - for descending)."})
+    # The primary key tie-breaker keeps pages stable when counts are equal.
+    return queryset.order_by(ordering, '-pk')
+
 class AdminUserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all().order_by('-date_joined')
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
     pagination_class = AdminPagination
     http_method_names = ['get', 'post']  # List, retrieve, deactivate, activate
+    bulk_filter_fields = ['username__startswith', 'email__endswith', 'date_joined__gte', 'date_joined__lte', 'last_login__lte', 'is_active']
+    ordering_fields = ['date_joined', 'username', 'followers_count', 'following_count', 'posts_count']
+    count_filters = {
+        'min_followers': 'followers_count__gte',
+        'max_followers': 'followers_count__lte',
+        'min_following': 'following_count__gte',
+        'min_posts': 'posts_count__gte',
+    }
+
+    def get_queryset(self):
+        # One query per page: the counts are indexed columns maintained by accounts.counters.
+        queryset = User.objects.all()
+        if self.action == 'list':
+            return apply_listing_params(queryset, self.request.query_params, self.ordering_fields, self.count_filters, '-date_joined')
+        return queryset
 
     def list(self, request, *args, **kwargs):
         try:
             response = super().list(request, *args, **kwargs)
-            logger.info(f"Admin {request.user.username} (ID: {request.user.id}) retrieved user list")
+            logger.info('admin.users_listed', admin_id=request.user.id)
             return response
         except Exception as e:
-            logger.error(f"Admin {request.user.username} (ID: {request.user.id}) failed to retrieve user list: {str(e)}")
+            logger.error('admin.users_list_failed', admin_id=request.user.id, error=e)
             raise
 
     def retrieve(self, request, *args, **kwargs):
         try:
             response = super().retrieve(request, *args, **kwargs)
-            user = self.get_object()
-            logger.info(f"Admin {request.user.username} (ID: {request.user.id}) retrieved user: {user.username} (ID: {user.id})")
+            logger.info('admin.user_retrieved', admin_id=request.user.id, user_id=response.data['id'])
             return response
         except Exception as e:
-            logger.error(f"Admin {request.user.username} (ID: {request.user.id}) failed to retrieve user ID {self.kwargs.get('pk')}: {str(e)}")
+            logger.error('admin.user_retrieve_failed', admin_id=request.user.id, user_id=self.kwargs.get('pk'), error=e)
             raise
 
     @action(detail=True, methods=['post'], url_path='deactivate')
@@ -47,14 +89,14 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         try:
             user = self.get_object()
             if user.is_staff:
-                logger.warning(f"Admin {request.user.username} (ID: {request.user.id}) attempted to deactivate admin user: {user.username} (ID: {user.id})")
+                logger.warning('admin.deactivate_admin_denied', admin_id=request.user.id, user_id=user.id)
                 return Response({'detail': 'Cannot deactivate admin users.'}, status=400)
             user.is_active = False
             user.save()
-            logger.info(f"Admin {request.user.username} (ID: {request.user.id}) deactivated user: {user.username} (ID: {user.id})")
+            logger.info('admin.user_deactivated', admin_id=request.user.id, user_id=user.id)
             return Response({'detail': 'User deactivated.'})
         except Exception as e:
-            logger.error(f"Admin {request.user.username} (ID: {request.user.id}) failed to deactivate user ID {pk}: {str(e)}")
+            logger.error('admin.user_deactivate_failed', admin_id=request.user.id, user_id=pk, error=e)
             raise
 
     @action(detail=True, methods=['post'], url_path='activate')
@@ -62,69 +104,182 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         try:
             user = self.get_object()
             if user.is_staff:
-                logger.warning(f"Admin {request.user.username} (ID: {request.user.id}) attempted to activate admin user: {user.username} (ID: {user.id})")
+                logger.warning('admin.activate_admin_denied', admin_id=request.user.id, user_id=user.id)
                 return Response({'detail': 'Admin users are already active.'}, status=400)
             user.is_active = True
             user.save()
-            logger.info(f"Admin {request.user.username} (ID: {request.user.id}) activated user: {user.username} (ID: {user.id})")
+            logger.info('admin.user_activated', admin_id=request.user.id, user_id=user.id)
             return Response({'detail': 'User activated.'})
         except Exception as e:
-            logger.error(f"Admin {request.user.username} (ID: {request.user.id}) failed to activate user ID {pk}: {str(e)}")
+            logger.error('admin.user_activate_failed', admin_id=request.user.id, user_id=pk, error=e)
+            raise
+
+    @action(detail=False, methods=['post'], url_path='bulk-deactivate')
+    def bulk_deactivate(self, request):
+        return self._bulk_set_active(request, is_active=False)
+
+    @action(detail=False, methods=['post'], url_path='bulk-activate')
+    def bulk_activate(self, request):
+        return self._bulk_set_active(request, is_active=True)
+
+    def _bulk_set_active(self, request, is_active):
+        verb = 'activate' if is_active else 'deactivate'
+        serializer = BulkActionSerializer(data=request.data, context={'filter_fields': self.bulk_filter_fields})
+        if not serializer.is_valid():
+            logger.warning('admin.bulk_invalid', admin_id=request.user.id, action=verb, errors=serializer.errors)
+            return Response(serializer.errors, status=400)
+        try:
+            report = bulk_set_active(
+                User.objects.all(), serializer.validated_data, is_active,
+                protected_field='is_staff', on_changed=lambda ids: transaction.on_commit(lambda: invalidate_users(ids)),
+            )
+        except (ValueError, DjangoValidationError) as e:
+            return Response({'filter': getattr(e, 'messages', [str(e)])}, status=400)
+        except Exception as e:
+            logger.error('admin.bulk_failed', admin_id=request.user.id, action=verb, error=e)
             raise
+        logger.info('admin.bulk_applied', admin_id=request.user.id, action=verb, summary=report['summary'])
+        return Response({'detail': f'Bulk {verb} complete.', **report})
 
 class AdminPostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
     permission_classes = [IsAdminUser]
     pagination_class = AdminPagination
-    http_method_names = ['get', 'delete']  # List, retrieve, delete
+    http_method_names = ['get', 'post', 'delete']  # List, retrieve, delete, bulk-delete
+    bulk_filter_fields = ['author', 'category', 'created_at__gte', 'created_at__lte', 'content__icontains']
+    ordering_fields = ['created_at', 'like_count', 'comment_count', 'author_followers_count']
+    count_filters = {
+        'min_likes': 'like_count__gte',
+        'min_comments': 'comment_count__gte',
+        'author_min_followers': 'author_followers_count__gte',
+    }
+
+    def get_queryset(self):
+        queryset = Post.objects.all()
+        if self.action in ('list', 'retrieve'):
+            queryset = with_post_relations(queryset, self.request.user)
+        if self.action == 'list':
+            # The author's count is a column of the joined user row.
+            queryset = queryset.annotate(author_followers_count=F('author__followers_count'))
+            return apply_listing_params(queryset, self.request.query_params, self.ordering_fields, self.count_filters, '-created_at')
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        raise MethodNotAllowed(request.method)
 
     def list(self, request, *args, **kwargs):
         try:
             response = super().list(request, *args, **kwargs)
-            logger.info(f"Admin {request.user.username} (ID: {request.user.id}) retrieved post list")
+            logger.info('admin.posts_listed', admin_id=request.user.id)
             return response
         except Exception as e:
-            logger.error(f"Admin {request.user.username} (ID: {request.user.id}) failed to retrieve post list: {str(e)}")
+            logger.error('admin.posts_list_failed', admin_id=request.user.id, error=e)
             raise
 
     def retrieve(self, request, *args, **kwargs):
         try:
             response = super().retrieve(request, *args, **kwargs)
-            post = self.get_object()
-            logger.info(f"Admin {request.user.username} (ID: {request.user.id}) retrieved post ID: {post.id} by user {post.author.username}")
+            logger.info('admin.post_retrieved', admin_id=request.user.id, post_id=response.data['id'], author_id=response.data['author']['id'])
             return response
         except Exception as e:
-            logger.error(f"Admin {request.user.username} (ID: {request.user.id}) failed to retrieve post ID {self.kwargs.get('pk')}: {str(e)}")
+            logger.error('admin.post_retrieve_failed', admin_id=request.user.id, post_id=self.kwargs.get('pk'), error=e)
             raise
 
     def destroy(self, request, *args, **kwargs):
         try:
             post = self.get_object()
             post_id = post.id
-            user_username = post.author.username 
-            response = super().destroy(request, *args, **kwargs)
-            logger.info(f"Admin {request.user.username} (ID: {request.user.id}) deleted post ID: {post_id} by user {user_username}")
-            return response
+            author_id = post.author_id
+            self.perform_destroy(post)
+            logger.info('admin.post_deleted', admin_id=request.user.id, post_id=post_id, author_id=author_id)
+            return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
-            logger.error(f"Admin {request.user.username} (ID: {request.user.id}) failed to delete post ID {self.kwargs.get('pk')}: {str(e)}")
+            logger.error('admin.post_delete_failed', admin_id=request.user.id, post_id=self.kwargs.get('pk'), error=e)
             raise
 
+    def perform_destroy(self, instance):
+        delete_post(instance, requested_by=self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        # Same end state as deleting one post: hidden with is_active=False now, purged by a queued job later.
+        serializer = BulkActionSerializer(data=request.data, context={'filter_fields': self.bulk_filter_fields})
+        if not serializer.is_valid():
+            logger.warning('admin.bulk_invalid', admin_id=request.user.id, action='delete', errors=serializer.errors)
+            return Response(serializer.errors, status=400)
+        try:
+            report = bulk_set_active(
+                Post.objects.all(), serializer.validated_data, is_active=False,
+                on_changed=lambda ids: self._queue_purges(ids, request.user))
+        except (ValueError, DjangoValidationError) as e:
+            return Response({'filter': getattr(e, 'messages', [str(e)])}, status=400)
+        except Exception as e:
+            logger.error('admin.bulk_failed', admin_id=request.user.id, action='delete', error=e)
+            raise
+        logger.info('admin.bulk_applied', admin_id=request.user.id, action='delete', summary=report['summary'])
+        return Response({'detail': 'Bulk delete complete.', **report})
+
+    def _queue_purges(self, post_ids, requested_by):
+        queue_post_purges(post_ids, requested_by)
+        transaction.on_commit(bump_public_posts)
+
+class AdminPurgeJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Progress of background purges of deleted users and posts (`?status=`, `?target=`)."""
+    serializer_class = PurgeJobSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = AdminPagination
+
+    def get_queryset(self):
+        queryset = PurgeJob.objects.order_by('-created_at', '-id')
+        for field in ('status', 'target'):
+            if field in self.request.query_params:
+                queryset = queryset.filter(**{field: self.request.query_params[field]})
+        return queryset
 
 class AdminStatsView(APIView):
+    """Platform totals, summed from the DailyStats rollup instead of counting the user and post tables."""
     permission_classes = [IsAdminUser]
 
     def get(self, request):
         try:
-            total_users = User.objects.count()
-            total_posts = Post.objects.count()
-            active_today = User.objects.filter(last_login__date=timezone.now().date()).count()
-            logger.info(f"Admin {request.user.username} (ID: {request.user.id}) retrieved stats: total_users={total_users}, total_posts={total_posts}, active_today={active_today}")
-            return Response({
-                'total_users': total_users,
-                'total_posts': total_posts,
-                'active_today': active_today
-            })
+            totals = platform_totals()
+            logger.info('admin.stats_retrieved', admin_id=request.user.id, **totals)
+            return Response(totals)
         except Exception as e:
-            logger.error(f"Admin {request.user.username} (ID: {request.user.id}) failed to retrieve stats: {str(e)}")
-            raise
\ No newline at end of file
+            logger.error('admin.stats_failed', admin_id=request.user.id, error=e)
+            raise
+
+def _parse_day(value, default):
+    if not value:
+        return default
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+class AdminStatsSeriesView(APIView):
+    """Daily activity time series read from the DailyStats rollup table only."""
+    permission_classes = [IsAdminUser]
+    max_days = 366
+
+    def get(self, request):
+        end = _parse_day(request.query_params.get('end'), timezone.localdate())
+        start = _parse_day(request.query_params.get('start'), end - timedelta(days=29) if end else None)
+        if not start or not end or start > end:
+            logger.warning('admin.stats_range_invalid', admin_id=request.user.id, params=lambda: request.query_params.dict())
+            return Response({'detail': 'Invalid date range. Use start/end as YYYY-MM-DD.'}, status=400)
+        if (end - start).days >= self.max_days:
+            return Response({'detail': f'Date range cannot exceed {self.max_days} days.'}, status=400)
+        try:
+            rows = {row['date']: row for row in DailyStats.objects.filter(date__range=(start, end)).values('date', *STAT_FIELDS)}
+            series = []
+            day = start
+            while day <= end:
+                row = rows.get(day) or {'date': day, **{field: 0 for field in STAT_FIELDS}}
+                series.append(row)
+                day += timedelta(days=1)
+            logger.info('admin.stats_series_retrieved', admin_id=request.user.id, start=start, end=end)
+            return Response({'start': start, 'end': end, 'results': series})
+        except Exception as e:
+            logger.error('admin.stats_series_failed', admin_id=request.user.id, error=e)
+            raise
@@ -0,0 +1,176 @@
+import threading
+import time
+from array import array
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from accounts.models import User
+from socialconnect_server.log import get_logger
+from socialconnect_server.metrics import record_cache
+from .models import Follow
+
+logger = get_logger('users')
+
+class FollowGraph:
+    """In-memory CSR index of the follow graph (follower -> followed user ids).
+
+    `offsets` and `targets` are flat int64 arrays indexed by user id, built in
+    one ordered pass over Follow. Follow/unfollow events are applied to small
+    per-user delta sets; the arrays are rebuilt once the delta grows past
+    FOLLOW_GRAPH_MAX_DELTA edges or the snapshot is older than
+    FOLLOW_GRAPH_REBUILD_SECONDS (which also picks up other workers' writes).
+
+    Only the first build runs in the request. Later rebuilds run in one
+    background thread while requests keep reading the old snapshot; events that
+    arrive during the scan are replayed onto the new snapshot before the swap.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Held for a whole build so only one scan of Follow runs at a time.
+        self._build_lock = threading.Lock()
+        # (offsets, targets) swapped as one tuple so readers never mix two builds.
+        self._csr = (array('q', [0]), array('q'))
+        self._added = {}
+        self._removed = {}
+        self._delta = 0
+        self._built_at = None
+        self._building = False
+        # Events seen while a build scans Follow, as (follower_id, following_id, added); None outside a build.
+        self._pending = None
+
+    def build(self):
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        with self._lock:
+            self._pending = []
+        try:
+            offsets = array('q', [0])
+            targets = array('q')
+            edges = Follow.objects.order_by('follower_id', 'following_id').values_list('follower_id', 'following_id')
+            for follower_id, following_id in edges.iterator(chunk_size=10000):
+                while len(offsets) <= follower_id:
+                    offsets.append(len(targets))
+                targets.append(following_id)
+            offsets.append(len(targets))
+            with self._lock:
+                self._csr = (offsets, targets)
+                self._added, self._removed, self._delta = {}, {}, 0
+                # The scan may or may not have read these rows; replaying them in order is correct either way.
+                for follower_id, following_id, added in self._pending:
+                    self._apply(follower_id, following_id, added)
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def _rebuild(self):
+        try:
+            self.build()
+        except Exception as e:
+            # Keep serving the old snapshot; the next stale read starts another attempt.
+            logger.warning('follow_graph.rebuild_failed', error=e)
+        finally:
+            with self._lock:
+                self._building = False
+            connections.close_all()
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            # Nothing to serve yet: build here, and let concurrent first readers wait for the same build.
+            with self._build_lock:
+                if self._built_at is None:
+                    self._build()
+            return
+        max_age = getattr(settings, 'FOLLOW_GRAPH_REBUILD_SECONDS', 600)
+        max_delta = getattr(settings, 'FOLLOW_GRAPH_MAX_DELTA', 50000)
+        with self._lock:
+            if self._building or (time.monotonic() - self._built_at <= max_age and self._delta <= max_delta):
+                return
+            self._building = True
+        threading.Thread(target=self._rebuild, name='follow-graph-rebuild', daemon=True).start()
+
+    def _snapshot_edges(self, user_id):
+        # Slicing an array copies in C; no per-element Python work.
+        offsets, targets = self._csr
+        if user_id + 1 < len(offsets):
+            return targets[offsets[user_id]:offsets[user_id + 1]]
+        return array('q')
+
+    def following(self, user_id):
+        """Ids followed by `user_id`, as an array when there is no pending delta, otherwise a set."""
+        edges = self._snapshot_edges(user_id)
+        added = self._added.get(user_id)
+        removed = self._removed.get(user_id)
+        if not added and not removed:
+            return edges
+        return (set(edges) - (removed or set())) | (added or set())
+
+    def _apply(self, follower_id, following_id, added):
+        into, out_of = (self._added, self._removed) if added else (self._removed, self._added)
+        out_of.get(follower_id, set()).discard(following_id)
+        into.setdefault(follower_id, set()).add(following_id)
+        self._delta += 1
+
+    def _record(self, follower_id, following_id, added):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((follower_id, following_id, added))
+            if self._built_at is not None:
+                self._apply(follower_id, following_id, added)
+
+    def add_edge(self, follower_id, following_id):
+        self._record(follower_id, following_id, True)
+
+    def remove_edge(self, follower_id, following_id):
+        self._record(follower_id, following_id, False)
+
+    def suggest(self, user_id, limit):
+        """Rank 2-hop candidates by the number of followed users who follow them.
+
+        Returns up to `limit` (candidate_id, mutual_count) pairs.
+        """
+        self._ensure_fresh()
+        direct = self.following(user_id)
+        mutuals = Counter()
+        for followed_id in direct:
+            # Counter.update() over an int array counts in C.
+            mutuals.update(self.following(followed_id))
+        mutuals.pop(user_id, None)
+        for followed_id in direct:
+            mutuals.pop(followed_id, None)
+        return mutuals.most_common(limit)
+
+follow_graph = FollowGraph()
+
+SUGGESTIONS_CACHE_KEY = 'interactions:suggestions:{}'
+MAX_SUGGESTIONS = 50
+
+def suggested_users(user, limit=10):
+    """Follow suggestions for `user`: active, non-private users ranked by mutual follows.
+
+    The ranking (up to MAX_SUGGESTIONS ids) is cached per user for
+    SUGGESTIONS_CACHE_TIMEOUT seconds. Returns [(User, mutual_count)].
+    """
+    key = SUGGESTIONS_CACHE_KEY.format(user.pk)
+    ranked = cache.get(key)
+    record_cache(ranked is not None)
+    if ranked is None:
+        # Over-fetch so candidates dropped by the privacy filter do not shrink the list.
+        candidates = follow_graph.suggest(user.pk, MAX_SUGGESTIONS * 3)
+        visible = set(
+            User.objects.filter(pk__in=[pk for pk, _ in candidates], is_active=True)
+            .exclude(privacy='private')
+            .values_list('pk', flat=True)
+        )
+        ranked = [(pk, mutual) for pk, mutual in candidates if pk in visible][:MAX_SUGGESTIONS]
+        cache.set(key, ranked, getattr(settings, 'SUGGESTIONS_CACHE_TIMEOUT', 300))
+    ranked = ranked[:limit]
+    users = User.objects.in_bulk([pk for pk, _ in ranked])
+    return [(users[pk], mutual) for pk, mutual in ranked if pk in users]
+
+def invalidate_suggestions(user_id):
+    cache.delete(SUGGESTIONS_CACHE_KEY.format(user_id))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from interactions.partitioning import COPY_CHUNK_SIZE, PARTITION_KEYS, PARTITIONS, partition_count, partition_table, unpartition_table
+
+
+class Command(BaseCommand):
+    help = ('Hash-partition the Like and Follow tables online (what migration interactions 0003 does), with control '
+            'over chunking and pacing. Run it before `migrate` on large tables; the migration then finds them '
+            'partitioned and does nothing.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partitions', type=int, default=PARTITIONS, help='Hash partitions per table.')
+        parser.add_argument('--chunk-size', type=int, default=COPY_CHUNK_SIZE, help='Rows copied per transaction.')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between chunks, to limit load on the primary.')
+        parser.add_argument('--reverse', action='store_true', help='Rebuild partitioned tables as plain tables.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to rebuild.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL.')
+        for table, key in PARTITION_KEYS.items():
+            if options['reverse']:
+                changed = unpartition_table(connection, table, key, options['chunk_size'], options['sleep'])
+            else:
+                changed = partition_table(connection, table, key, options['partitions'], options['chunk_size'], options['sleep'])
+            self.stdout.write(f'{table}: {"rebuilt" if changed else "unchanged"}, '
+                              f'{partition_count(connection, table)} partitions')
+        self.stdout.write(self.style.SUCCESS('Done.'))
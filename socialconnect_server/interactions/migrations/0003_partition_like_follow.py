@@ -0,0 +1,30 @@
+from django.db import migrations
+from interactions.partitioning import PARTITION_KEYS, partition_table, unpartition_table
+
+
+def partition(apps, schema_editor):
+    # Declarative partitioning is PostgreSQL only; other databases keep plain tables.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, key in PARTITION_KEYS.items():
+        partition_table(schema_editor.connection, table, key)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, key in PARTITION_KEYS.items():
+        unpartition_table(schema_editor.connection, table, key)
+
+
+class Migration(migrations.Migration):
+    # The copy commits chunk by chunk, so writes continue while it runs.
+    atomic = False
+
+    dependencies = [
+        ('interactions', '0002_follow_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from accounts.models import User
 from posts.models import Post
 
+# On PostgreSQL the Follow and Like tables are hash partitioned (see interactions.partitioning).
 class Follow(models.Model):
     follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following_set')
     following = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers_set')
@@ -9,6 +10,11 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('follower', 'following')
+        # Serve the cursor-paginated follower/following lists straight from the index.
+        indexes = [
+            models.Index(fields=['following', '-id'], name='follow_following_id_idx'),
+            models.Index(fields=['follower', '-id'], name='follow_follower_id_idx'),
+        ]
 
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
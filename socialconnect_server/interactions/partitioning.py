@@ -0,0 +1,178 @@
+"""Hash partitioning of the Like and Follow tables on PostgreSQL.
+
+Like is partitioned by post_id, so like-status checks and per-post like counts
+touch one partition. Follow is partitioned by follower_id, so the feed's
+following ids, follow checks and following lists touch one partition.
+Follower lists (by following_id) read every partition's index and merge the
+results. Hashing by follower spreads rows evenly, whereas hashing by following
+would put all of a popular account's followers in one partition. The models
+and ORM queries are unchanged.
+
+`partition_table` rebuilds a table online:
+
+1. It creates `<table>_new`, partitioned, with the table's columns,
+   constraints and indexes under temporary names. PostgreSQL requires the
+   partition key in the primary key, so that becomes (id, key). A trigger on
+   the table mirrors every insert, update and delete into the copy.
+2. It copies existing rows by id range, COPY_CHUNK_SIZE rows per transaction.
+   Each chunk key-share locks the rows it reads, so a concurrent delete either
+   happens first (and the row is skipped) or waits and is mirrored.
+3. Under a brief ACCESS EXCLUSIVE lock, it drops the table, renames the copy,
+   its constraints and its indexes to the old names, and continues the id
+   sequence from where it was.
+
+A run interrupted during the copy resumes: the copy is repeated, and rows
+already copied are skipped with ON CONFLICT DO NOTHING. `unpartition_table`
+reverses the rebuild the same way. Requires PostgreSQL 11 or later.
+"""
+import time
+from django.db import transaction
+from socialconnect_server.log import get_logger
+
+logger = get_logger('users')
+
+# Table -> hash partition key.
+PARTITION_KEYS = {'interactions_like': 'post_id', 'interactions_follow': 'follower_id'}
+PARTITIONS = 16
+COPY_CHUNK_SIZE = 10000
+
+def _quote(name):
+    return '"%s"' % name
+
+def _temporary(name):
+    # Index-backed names are unique per schema, so the copy's differ until the swap.
+    return f'{name[:58]}_swap'
+
+def _index_backed(contype):
+    return contype in ('p', 'u')
+
+def catalog(cursor, table):
+    """The table's constraints as (name, type, definition) rows and its other indexes as (name, definition) rows."""
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f', 'c') ORDER BY conname", [table])
+    constraints = cursor.fetchall()
+    cursor.execute(
+        "SELECT i.relname, pg_get_indexdef(x.indexrelid) FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+        "WHERE x.indrelid = %s::regclass AND NOT EXISTS ("
+        "SELECT 1 FROM pg_constraint c WHERE c.conrelid = x.indrelid AND c.conindid = x.indexrelid) ORDER BY i.relname",
+        [table])
+    return constraints, cursor.fetchall()
+
+def copy_statements(table, key, partitions, constraints, indexes):
+    """SQL that creates `<table>_new` (hash partitioned by `key` when `partitions`) and the trigger that keeps it in step."""
+    new, function = _quote(f'{table}_new'), _quote(f'{table}_mirror')
+    statements = [
+        f'CREATE TABLE {new} (LIKE {_quote(table)} INCLUDING DEFAULTS)' + (f' PARTITION BY HASH ({key})' if partitions else ''),
+        # The id default (identity or serial) stays with the table until the swap.
+        f'ALTER TABLE {new} ALTER COLUMN id DROP DEFAULT',
+    ]
+    statements += [
+        f'CREATE TABLE {_quote(f"{table}_p{remainder}")} PARTITION OF {new} '
+        f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        for remainder in range(partitions)
+    ]
+    for name, contype, definition in constraints:
+        if contype == 'p':
+            definition = f'PRIMARY KEY (id, {key})' if partitions else 'PRIMARY KEY (id)'
+        statements.append(f'ALTER TABLE {new} ADD CONSTRAINT {_quote(_temporary(name) if _index_backed(contype) else name)} {definition}')
+    for name, definition in indexes:
+        unique = 'UNIQUE ' if definition.startswith('CREATE UNIQUE') else ''
+        statements.append(f'CREATE {unique}INDEX {_quote(_temporary(name))} ON {new} USING {definition.split(" USING ", 1)[1]}')
+    statements += [
+        f'''CREATE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM {new} WHERE id = OLD.id AND {key} = OLD.{key};
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO {new} SELECT NEW.* ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END $$''',
+        f'CREATE TRIGGER {function} AFTER INSERT OR UPDATE OR DELETE ON {_quote(table)} FOR EACH ROW EXECUTE FUNCTION {function}()',
+    ]
+    return statements
+
+def swap_statements(table, constraints, indexes, next_id):
+    """SQL that replaces `table` with `<table>_new`; run under an ACCESS EXCLUSIVE lock on `table`."""
+    sequence = _quote(f'{table}_id_seq')
+    # Dropping the table drops the mirror trigger and the old id sequence with it.
+    statements = [f'DROP TABLE {_quote(table)}', f'DROP FUNCTION {_quote(f"{table}_mirror")}()',
+                  f'ALTER TABLE {_quote(f"{table}_new")} RENAME TO {_quote(table)}']
+    statements += [f'ALTER TABLE {_quote(table)} RENAME CONSTRAINT {_quote(_temporary(name))} TO {_quote(name)}'
+                   for name, contype, _ in constraints if _index_backed(contype)]
+    statements += [f'ALTER INDEX {_quote(_temporary(name))} RENAME TO {_quote(name)}' for name, _ in indexes]
+    # A sequence rather than an identity column: partitioned tables only support identity from PostgreSQL 17.
+    statements += [f'CREATE SEQUENCE {sequence} START WITH {next_id} OWNED BY {_quote(table)}.id',
+                   f"ALTER TABLE {_quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')"]
+    return statements
+
+def partition_count(connection, table):
+    """Number of partitions of `table`; 0 when it is a plain table (or not on PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM pg_partitioned_table p JOIN pg_inherits i ON i.inhparent = p.partrelid '
+                       'WHERE p.partrelid = to_regclass(%s)', [table])
+        return cursor.fetchone()[0]
+
+def _copy_rows(connection, table, chunk_size, sleep):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT min(id), max(id) FROM {_quote(table)}')
+        low, high = cursor.fetchone()
+    copied = 0
+    # Rows inserted after the trigger was created are mirrored; `high` covers everything before.
+    for start in range(low or 0, (high or -1) + 1, chunk_size):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {_quote(f"{table}_new")} SELECT * FROM (SELECT * FROM {_quote(table)} '
+                f'WHERE id >= %s AND id < %s FOR KEY SHARE) AS chunk ON CONFLICT DO NOTHING', [start, start + chunk_size])
+            copied += cursor.rowcount
+        logger.debug('partition.chunk', table=table, up_to=start + chunk_size - 1, of=high)
+        if sleep:
+            time.sleep(sleep)
+    return copied
+
+def _rebuild(connection, table, key, partitions, chunk_size, sleep):
+    with connection.cursor() as cursor:
+        constraints, indexes = catalog(cursor, table)
+        cursor.execute('SELECT to_regclass(%s)', [f'{table}_new'])
+        resuming = cursor.fetchone()[0] is not None
+    if not resuming:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            for sql in copy_statements(table, key, partitions, constraints, indexes):
+                cursor.execute(sql)
+    logger.info('partition.copying', table=table, partitions=partitions, resuming=resuming)
+    copied = _copy_rows(connection, table, chunk_size, sleep)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {_quote(table)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        next_id = 1
+        if sequence:
+            cursor.execute(f'SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM {sequence}')
+            next_id = cursor.fetchone()[0]
+        cursor.execute(f'SELECT coalesce(max(id), 0) + 1 FROM {_quote(f"{table}_new")}')
+        for sql in swap_statements(table, constraints, indexes, max(next_id, cursor.fetchone()[0])):
+            cursor.execute(sql)
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {_quote(table)}')
+    logger.info('partition.done', table=table, partitions=partitions, copied=copied)
+
+def partition_table(connection, table, key, partitions=PARTITIONS, chunk_size=COPY_CHUNK_SIZE, sleep=None):
+    """Rebuild `table` hash partitioned by `key`, online; False if it already is partitioned.
+
+    Run outside a transaction: every chunk of the copy commits on its own.
+    """
+    if partition_count(connection, table):
+        return False
+    _rebuild(connection, table, key, partitions, chunk_size, sleep)
+    return True
+
+def unpartition_table(connection, table, key, chunk_size=COPY_CHUNK_SIZE, sleep=None):
+    """Rebuild partitioned `table` as a plain table, online; False if it is not partitioned."""
+    if not partition_count(connection, table):
+        return False
+    _rebuild(connection, table, key, 0, chunk_size, sleep)
+    return True
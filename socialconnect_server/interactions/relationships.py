@@ -0,0 +1,35 @@
+from django.db.models import Q
+from .models import Follow
+
+def resolve_relationships(viewer, user_ids):
+    """Follow state between `viewer` and each user id, in both directions, from a single query.
+
+    Returns {user_id: {'following': bool, 'followed_by': bool}} where `following`
+    means the viewer follows that user and `followed_by` means that user follows the viewer.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    result = {pk: {'following': False, 'followed_by': False} for pk in user_ids}
+    if not user_ids or not viewer.is_authenticated:
+        return result
+    rows = Follow.objects.filter(
+        Q(follower=viewer, following__in=user_ids) | Q(following=viewer, follower__in=user_ids)
+    ).values_list('follower_id', 'following_id')
+    for follower_id, following_id in rows:
+        if follower_id == viewer.pk:
+            result[following_id]['following'] = True
+        else:
+            result[follower_id]['followed_by'] = True
+    return result
+
+def can_view_profile(viewer, user, following=None):
+    """Apply User.privacy: public to everyone, followers_only to followers, private to the owner.
+
+    Pass `following` when the viewer's follow state is already known to skip the lookup.
+    """
+    if user.privacy == 'public' or (viewer.is_authenticated and viewer.pk == user.pk):
+        return True
+    if user.privacy == 'followers_only':
+        if following is None:
+            following = resolve_relationships(viewer, [user.pk])[user.pk]['following']
+        return following
+    return False
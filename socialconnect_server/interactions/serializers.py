@@ -1,11 +1,12 @@
 from rest_framework import serializers
+from socialconnect_server.metrics import TimedSerializerMixin
 from .models import Comment
 from accounts.serializers import UserSerializer
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
 
     class Meta:
         model = Comment
         fields = ['id', 'content', 'author', 'post', 'created_at']
-        read_only_fields = ['post', 'created_at']
\ No newline at end of file
+        read_only_fields = ['post', 'created_at']
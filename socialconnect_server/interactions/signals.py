@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from accounts.counters import adjust_follow_counts
+from socialconnect_server.conditional import bump_profiles
+from .graph import follow_graph, invalidate_suggestions
+from .models import Follow
+
+@receiver(post_save, sender=Follow)
+def add_follow_edge(sender, instance, created, **kwargs):
+    if created:
+        adjust_follow_counts([(instance.follower_id, instance.following_id)], 1)
+        transaction.on_commit(lambda: follow_graph.add_edge(instance.follower_id, instance.following_id))
+        transaction.on_commit(lambda: invalidate_suggestions(instance.follower_id))
+        # Both profiles' counts changed, and with them who may view followers-only content.
+        transaction.on_commit(lambda: bump_profiles([instance.follower_id, instance.following_id]))
+
+@receiver(post_delete, sender=Follow)
+def remove_follow_edge(sender, instance, **kwargs):
+    adjust_follow_counts([(instance.follower_id, instance.following_id)], -1)
+    transaction.on_commit(lambda: follow_graph.remove_edge(instance.follower_id, instance.following_id))
+    transaction.on_commit(lambda: invalidate_suggestions(instance.follower_id))
+    transaction.on_commit(lambda: bump_profiles([instance.follower_id, instance.following_id]))
@@ -1,3 +1,99 @@
-from django.test import TestCase
+import time
+from unittest import mock
+from django.test import SimpleTestCase
+from accounts.models import User
+from socialconnect_server.testing import GraphTestCase
+from .graph import FollowGraph, follow_graph, invalidate_suggestions, suggested_users
+from .models import Follow
+from .partitioning import copy_statements, swap_statements
 
-# Create your tests here.
+class PartitioningTests(SimpleTestCase):
+    # Catalog rows as PostgreSQL reports them for interactions_like.
+    constraints = [
+        ('interactions_like_pkey', 'p', 'PRIMARY KEY (id)'),
+        ('interactions_like_post_id_fk', 'f', 'FOREIGN KEY (post_id) REFERENCES posts_post(id) DEFERRABLE INITIALLY DEFERRED'),
+        ('interactions_like_user_id_post_id_uniq', 'u', 'UNIQUE (user_id, post_id)'),
+    ]
+    indexes = [('interactions_like_user_id_idx', 'CREATE INDEX interactions_like_user_id_idx ON public.interactions_like USING btree (user_id)')]
+
+    def test_copy_is_partitioned_with_the_same_constraints_and_indexes(self):
+        sql = '\n'.join(copy_statements('interactions_like', 'post_id', 4, self.constraints, self.indexes))
+        self.assertIn('PARTITION BY HASH (post_id)', sql)
+        self.assertEqual(sql.count('PARTITION OF "interactions_like_new"'), 4)
+        self.assertIn('"interactions_like_pkey_swap" PRIMARY KEY (id, post_id)', sql)
+        self.assertIn('"interactions_like_user_id_post_id_uniq_swap" UNIQUE (user_id, post_id)', sql)
+        # Foreign key names are per table, so they keep theirs.
+        self.assertIn('"interactions_like_post_id_fk" FOREIGN KEY (post_id)', sql)
+        self.assertIn('INDEX "interactions_like_user_id_idx_swap" ON "interactions_like_new" USING btree (user_id)', sql)
+        self.assertIn('AFTER INSERT OR UPDATE OR DELETE ON "interactions_like"', sql)
+
+    def test_swap_restores_names_and_continues_ids(self):
+        sql = '\n'.join(swap_statements('interactions_like', self.constraints, self.indexes, 501))
+        self.assertIn('RENAME CONSTRAINT "interactions_like_pkey_swap" TO "interactions_like_pkey"', sql)
+        self.assertIn('ALTER INDEX "interactions_like_user_id_idx_swap" RENAME TO "interactions_like_user_id_idx"', sql)
+        self.assertNotIn('interactions_like_post_id_fk', sql)
+        self.assertIn('START WITH 501', sql)
+        # Back to a plain table: the primary key is the id alone and there are no partitions.
+        plain = '\n'.join(copy_statements('interactions_like', 'post_id', 0, self.constraints, self.indexes))
+        self.assertNotIn('PARTITION', plain)
+        self.assertIn('PRIMARY KEY (id)', plain)
+
+
+class FollowGraphTests(GraphTestCase):
+    def following(self, user):
+        return set(Follow.objects.filter(follower=user).values_list('following_id', flat=True))
+
+    def test_build_indexes_every_follower(self):
+        graph = FollowGraph()
+        graph.build()
+        for user in User.objects.all():
+            self.assertEqual(set(graph.following(user.pk)), self.following(user))
+        self.assertEqual(len(graph.following(User.objects.order_by('-pk')[0].pk + 10)), 0)
+
+    def test_deltas_apply_until_the_next_build(self):
+        graph, viewer = FollowGraph(), self.graph.viewer
+        graph.build()
+        graph.add_edge(viewer.pk, self.graph.stranger.pk)
+        graph.remove_edge(viewer.pk, self.graph.author.pk)
+        self.assertEqual(graph.following(viewer.pk), self.following(viewer) - {self.graph.author.pk} | {self.graph.stranger.pk})
+        graph.build()
+        self.assertEqual(set(graph.following(viewer.pk)), self.following(viewer))
+
+    def test_events_during_a_build_are_replayed_onto_it(self):
+        graph, viewer = FollowGraph(), self.graph.viewer
+        order_by = Follow.objects.order_by
+
+        def follow_during_scan(*fields):
+            # Arrive after the build started, as an on_commit callback from another request would.
+            graph.add_edge(viewer.pk, self.graph.stranger.pk)
+            graph.remove_edge(viewer.pk, self.graph.author.pk)
+            return order_by(*fields)
+        with mock.patch.object(Follow.objects, 'order_by', follow_during_scan):
+            graph.build()
+        self.assertEqual(graph.following(viewer.pk), self.following(viewer) - {self.graph.author.pk} | {self.graph.stranger.pk})
+
+    def test_stale_snapshot_is_rebuilt_once_in_the_background(self):
+        graph, viewer = FollowGraph(), self.graph.viewer
+        graph.build()
+        before = graph.suggest(viewer.pk, 10)
+        Follow.objects.create(follower=User.objects.get(username='member1'), following=self.graph.private)
+        graph._built_at = time.monotonic() - 3600
+        with mock.patch('interactions.graph.threading.Thread') as thread:
+            self.assertEqual(graph.suggest(viewer.pk, 10), before)
+            self.assertEqual(graph.suggest(viewer.pk, 10), before)
+        thread.assert_called_once()
+        with mock.patch('interactions.graph.connections'):
+            thread.call_args.kwargs['target']()
+        self.assertIn((self.graph.private.pk, 1), graph.suggest(viewer.pk, 10))
+        self.assertFalse(graph._building)
+
+    def test_suggestions_skip_private_and_inactive_users(self):
+        member = User.objects.get(username='member1')
+        for user in (self.graph.private, self.graph.pending):
+            Follow.objects.create(follower=member, following=user)
+        follow_graph.build()
+        invalidate_suggestions(self.graph.viewer.pk)
+        candidates = dict(follow_graph.suggest(self.graph.viewer.pk, 10))
+        self.assertIn(self.graph.private.pk, candidates)
+        suggested = [user.username for user, _ in suggested_users(self.graph.viewer)]
+        self.assertEqual(suggested, ['stranger'])
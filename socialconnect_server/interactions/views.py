@@ -1,10 +1,10 @@
-import logging
 from rest_framework import viewsets
 from socialconnect_server.permissions import IsOwnerOrAdmin
 from .models import Comment
+from socialconnect_server.log import get_logger
 from .serializers import CommentSerializer
 
-logger = logging.getLogger('users')
+logger = get_logger('users')
 
 class CommentViewSet(viewsets.ModelViewSet):
     queryset = Comment.objects.filter(is_active=True)
@@ -21,7 +21,7 @@ class CommentViewSet(viewsets.ModelViewSet):
             instance.post.comment_count -= 1
             instance.post.save()
             instance.delete()
-            logger.info(f"Comment ID {comment_id} on post ID {post_id} deleted by user {self.request.user.username})")
+            logger.info('comment.deleted', comment_id=comment_id, post_id=post_id, user_id=self.request.user.id)
         except Exception as e:
-            logger.error(f"Failed to delete comment ID {comment_id} on post ID {post_id} by user {self.request.user.username}: {str(e)}")
+            logger.error('comment.delete_failed', comment_id=comment_id, post_id=post_id, user_id=self.request.user.id, error=e)
             raise
\ No newline at end of file
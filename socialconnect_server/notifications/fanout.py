@@ -0,0 +1,86 @@
+"""Announcement fan-out: notify an author's followers of an announcement in the background.
+
+One Notification.objects.create per follower would stall the request for a
+large account. Publishing an announcement instead queues a FanoutJob, one per
+post. `run_fanout_jobs` (the `fanout_announcements` command) then streams the
+author's followers by Follow id through the (following, -id) index, writing
+FANOUT_CHUNK_SIZE notifications per bulk_create. Each chunk commits together
+with the job's cursor, so an interrupted job resumes after the last chunk
+written and never notifies a follower twice.
+
+Each worker writes at most FANOUT_ROWS_PER_SECOND notifications per second and
+sleeps between chunks when it gets ahead, so a large fan-out leaves room for
+other writes. Jobs are claimed, leased and retried through
+socialconnect_server.jobs, like purge jobs. A job stops when the post is
+hidden, is no longer an announcement or its author turns private. The author follows progress through `sent` and `total`.
+"""
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from interactions.models import Follow
+from posts.models import Post
+from socialconnect_server.jobs import LeasedJobs
+from socialconnect_server.log import get_logger
+from .models import FanoutJob, Notification
+
+logger = get_logger('users')
+
+def queue_fanout(post):
+    """Queue notifying `post`'s author's followers; a no-op if it is queued or done, and resumes a cancelled job."""
+    FanoutJob.objects.bulk_create([FanoutJob(post=post)], ignore_conflicts=True)
+    FanoutJob.objects.filter(post=post, status='cancelled').update(status='pending', updated_at=timezone.now())
+    logger.info('fanout.queued', post_id=post.id, author_id=post.author_id)
+
+def _followers(post, after):
+    return Follow.objects.filter(following_id=post.author_id, id__gt=after, follower__is_active=True).order_by('id')
+
+def _announced(post):
+    # Private authors' posts are visible to themselves only.
+    return Post.objects.filter(pk=post.pk, is_active=True, category='announcement').exclude(author__privacy='private').exists()
+
+jobs = LeasedJobs(FanoutJob, 'FANOUT', 'fanout', lambda job: {'post_id': job.post_id})
+
+def run_job(job, chunk_size=None, rate=None):
+    """Notify the followers after `job.cursor`, one committed chunk at a time, at most `rate` rows per second."""
+    chunk_size = chunk_size or getattr(settings, 'FANOUT_CHUNK_SIZE', 1000)
+    rate = getattr(settings, 'FANOUT_ROWS_PER_SECOND', 5000) if rate is None else rate
+    post = Post.objects.select_related('author').get(pk=job.post_id)
+    if job.total is None:
+        job.total = _followers(post, 0).count()
+        job.save(update_fields=['total', 'updated_at'])
+    message = f'{post.author.username} posted an announcement.'
+    started, written = time.monotonic(), 0
+    while True:
+        if not _announced(post):
+            job.status, job.lease_expires_at = 'cancelled', None
+            job.save(update_fields=['status', 'lease_expires_at', 'updated_at'])
+            logger.info('fanout.cancelled', job_id=job.id, post_id=post.id, sent=job.sent)
+            return job
+        with transaction.atomic():
+            rows = list(_followers(post, job.cursor).values_list('id', 'follower_id')[:chunk_size])
+            Notification.objects.bulk_create([
+                Notification(recipient_id=follower_id, sender_id=post.author_id, notification_type='announcement',
+                             post_id=post.id, message=message)
+                for _, follower_id in rows
+            ])
+            if rows:
+                job.cursor, job.sent = rows[-1][0], job.sent + len(rows)
+            job.lease_expires_at = jobs.lease()
+            job.save(update_fields=['cursor', 'sent', 'lease_expires_at', 'updated_at'])
+        if len(rows) < chunk_size:
+            break
+        written += len(rows)
+        logger.debug('fanout.chunk', job_id=job.id, post_id=post.id, sent=job.sent, total=job.total)
+        ahead = written / rate - (time.monotonic() - started) if rate else 0
+        if ahead > 0:
+            time.sleep(ahead)
+    job.status, job.lease_expires_at, job.finished_at = 'done', None, timezone.now()
+    job.save(update_fields=['status', 'lease_expires_at', 'finished_at', 'updated_at'])
+    logger.info('fanout.done', job_id=job.id, post_id=post.id, sent=job.sent)
+    return job
+
+def run_fanout_jobs(limit=None, chunk_size=None, rate=None):
+    """Claim and run jobs until none is due (or `limit` ran). Returns (done, failed) counts."""
+    # Chunks already committed stay sent; a retry resumes after the cursor.
+    return jobs.run(lambda job: run_job(job, chunk_size, rate), limit)
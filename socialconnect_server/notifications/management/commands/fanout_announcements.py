@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from notifications.fanout import run_fanout_jobs
+
+
+class Command(BaseCommand):
+    help = "Notify authors' followers of announcement posts queued as FanoutJobs, in rate-limited chunks that resume after interruption."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None, help='Notifications per bulk insert (defaults to FANOUT_CHUNK_SIZE).')
+        parser.add_argument('--rate', type=float, default=None,
+                            help='Maximum notifications written per second (defaults to FANOUT_ROWS_PER_SECOND; 0 for no limit).')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for jobs instead of exiting once none are due.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls in --loop mode.')
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        try:
+            while True:
+                done, failed = run_fanout_jobs(chunk_size=options['chunk_size'], rate=options['rate'])
+                total_done += done
+                total_failed += failed
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Ran {total_done} fan-out jobs, {total_failed} failed.'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_purgejob'),
+        ('notifications', '0002_fanoutjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReadMark',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_read_mark', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('read_up_to', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
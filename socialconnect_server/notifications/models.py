@@ -7,9 +7,36 @@ class Notification(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     notification_type = models.CharField(
         max_length=20,
-        choices=[('follow', 'Follow'), ('like', 'Like'), ('comment', 'Comment')]
+        choices=[('follow', 'Follow'), ('like', 'Like'), ('comment', 'Comment'), ('announcement', 'Announcement')]
     )
     post = models.ForeignKey(Post, on_delete=models.SET_NULL, null=True, blank=True)
     message = models.CharField(max_length=200)
     is_read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class NotificationReadMark(models.Model):
+    """A user's read watermark: their notifications with id <= read_up_to count as read (see notifications.read_state)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_read_mark')
+    read_up_to = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class FanoutJob(models.Model):
+    """Background delivery of an announcement post to the author's followers (see notifications.fanout)."""
+    STATUS_CHOICES = [('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')]
+
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='fanout_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Id of the last Follow row notified: the job resumes after it.
+    cursor = models.PositiveBigIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    # Followers when the job started; more may follow while it runs.
+    total = models.PositiveIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'], name='fanoutjob_status_idx')]
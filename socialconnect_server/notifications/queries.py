@@ -0,0 +1,19 @@
+from django.db.models import Exists, OuterRef, Value
+from interactions.models import Like
+from .read_state import with_read_mark
+
+def with_notification_relations(queryset, user):
+    """Join sender and post author and annotate what NotificationSerializer reads, so a page is one query."""
+    queryset = with_read_mark(queryset).select_related('sender', 'post__author')
+    if user is not None and user.is_authenticated:
+        return queryset.annotate(post_liked_by_user=Exists(Like.objects.filter(post=OuterRef('post_id'), user=user)))
+    return queryset.annotate(post_liked_by_user=Value(False))
+
+def copy_related_annotations(notification):
+    # Hand the post's liked flag to the post the nested serializer renders.
+    post = notification.post
+    if post is not None:
+        liked = getattr(notification, 'post_liked_by_user', None)
+        if liked is not None:
+            post.liked_by_user = liked
+    return notification
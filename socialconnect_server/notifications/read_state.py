@@ -0,0 +1,43 @@
+"""Read state of notifications: per-row flags plus a per-user watermark.
+
+A notification is read when its `is_read` flag is set or its id is at or below
+the recipient's NotificationReadMark. Marking specific notifications sets the
+flag with one UPDATE for the whole id list. Marking everything up to a point
+("mark all read", or read up to an id or a time) only raises the watermark,
+which writes one row however many notifications it covers. The watermark only
+moves up, and only to the id of one of the user's own notifications, so later
+notifications stay unread.
+"""
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+from .models import NotificationReadMark
+
+def with_read_mark(queryset):
+    """Annotate `read_by_mark`: whether the recipient's watermark covers each notification."""
+    return queryset.annotate(read_by_mark=Exists(NotificationReadMark.objects.filter(
+        user_id=OuterRef('recipient_id'), read_up_to__gte=OuterRef('pk'))))
+
+def mark_ids_read(user, ids):
+    """Set the read flag on `user`'s notifications among `ids`; returns how many changed."""
+    return user.notifications.filter(pk__in=ids, is_read=False).update(is_read=True)
+
+def mark_read_up_to(user, up_to_id=None, before=None):
+    """Raise `user`'s watermark to their newest notification with id <= `up_to_id` / created at or before `before`.
+
+    With neither, covers all their notifications. Returns the id the watermark
+    now covers from this call, or None if no notification matched.
+    """
+    notifications = user.notifications.all()
+    if up_to_id is not None:
+        notifications = notifications.filter(pk__lte=up_to_id)
+    if before is not None:
+        notifications = notifications.filter(created_at__lte=before)
+    top = notifications.aggregate(top=Max('id'))['top']
+    if top is None:
+        return None
+    marks = NotificationReadMark.objects.filter(user=user, read_up_to__lt=top)
+    if not marks.update(read_up_to=top, updated_at=timezone.now()):
+        # No mark yet, or it is already higher. The second update covers a mark created concurrently.
+        NotificationReadMark.objects.bulk_create([NotificationReadMark(user=user, read_up_to=top)], ignore_conflicts=True)
+        marks.update(read_up_to=top, updated_at=timezone.now())
+    return top
@@ -1,12 +1,46 @@
 from rest_framework import serializers
-from .models import Notification
+from socialconnect_server.metrics import TimedSerializerMixin
+from .models import FanoutJob, Notification
+from .queries import copy_related_annotations
 from accounts.serializers import UserSerializer
 from posts.serializers import PostSerializer
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     post = PostSerializer(read_only=True)
+    is_read = serializers.SerializerMethodField()
 
     class Meta:
         model = Notification
-        fields = ['id', 'sender', 'notification_type', 'post', 'message', 'is_read', 'created_at']
\ No newline at end of file
+        fields = ['id', 'sender', 'notification_type', 'post', 'message', 'is_read', 'created_at']
+
+    def to_representation(self, instance):
+        return super().to_representation(copy_related_annotations(instance))
+
+    def get_is_read(self, obj):
+        # The row's flag or the recipient's watermark (notifications.read_state).
+        return obj.is_read or getattr(obj, 'read_by_mark', False)
+
+class BulkReadSerializer(serializers.Serializer):
+    """What to mark read: an id list (flagged row by row) or everything up to an id or a time (the watermark)."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False, max_length=1000)
+    up_to_id = serializers.IntegerField(min_value=1, required=False)
+    before = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if len(attrs) != 1:
+            raise serializers.ValidationError('Provide exactly one of "ids", "up_to_id" or "before".')
+        return attrs
+
+class FanoutJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FanoutJob
+        fields = ['post', 'status', 'sent', 'total', 'progress', 'created_at', 'updated_at', 'finished_at']
+
+    def get_progress(self, obj):
+        """Percent of the followers at the start that have been notified."""
+        if obj.status == 'done' or obj.total == 0:
+            return 100
+        return min(99, obj.sent * 100 // obj.total) if obj.total else 0
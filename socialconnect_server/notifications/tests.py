@@ -1,3 +1,104 @@
-from django.test import TestCase
+from unittest import mock
+from interactions.models import Follow
+from posts.models import Post
+from socialconnect_server.testing import GraphTestCase
+from .fanout import run_fanout_jobs
+from .models import FanoutJob, Notification
 
-# Create your tests here.
+class AnnouncementFanoutTests(GraphTestCase):
+    def setUp(self):
+        super().setUp()
+        self.followers = set(Follow.objects.filter(following=self.graph.viewer).values_list('follower_id', flat=True))
+
+    def announce(self):
+        response = self.graph.client(self.graph.viewer).post('/api/posts/', {'content': 'Big news', 'category': 'announcement'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def recipients(self, post_id):
+        return list(Notification.objects.filter(post_id=post_id, notification_type='announcement').values_list('recipient_id', flat=True))
+
+    def test_followers_are_notified_in_rate_limited_chunks(self):
+        post_id = self.announce()
+        client = self.graph.client(self.graph.viewer)
+        self.assertEqual(client.get(f'/api/posts/{post_id}/fanout/').data['status'], 'pending')
+        self.assertEqual(self.recipients(post_id), [])
+        with mock.patch('notifications.fanout.time.sleep') as sleep:
+            self.assertEqual(run_fanout_jobs(chunk_size=1, rate=1), (1, 0))
+        self.assertTrue(sleep.called)
+        self.assertEqual(sorted(self.recipients(post_id)), sorted(self.followers))
+        progress = client.get(f'/api/posts/{post_id}/fanout/').data
+        self.assertEqual((progress['status'], progress['sent'], progress['total'], progress['progress']), ('done', 3, 3, 100))
+        self.assertEqual(self.graph.client(self.graph.stranger).get(f'/api/posts/{post_id}/fanout/').status_code, 403)
+        self.assertEqual(run_fanout_jobs(), (0, 0))
+
+    def test_interrupted_fanout_resumes_without_duplicates(self):
+        post_id = self.announce()
+        real_bulk_create = Notification.objects.bulk_create
+        calls = []
+        def fail_second_chunk(objs, *args, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return real_bulk_create(objs, *args, **kwargs)
+        with mock.patch.object(Notification.objects, 'bulk_create', fail_second_chunk):
+            self.assertEqual(run_fanout_jobs(chunk_size=2, rate=0), (0, 1))
+        job = FanoutJob.objects.get(post_id=post_id)
+        self.assertEqual((job.status, job.sent, job.attempts), ('pending', 2, 1))
+        FanoutJob.objects.filter(pk=job.pk).update(lease_expires_at=None)  # the retry delay has passed
+        self.assertEqual(run_fanout_jobs(chunk_size=2, rate=0), (1, 0))
+        recipients = self.recipients(post_id)
+        self.assertEqual(sorted(recipients), sorted(self.followers))
+
+    def test_hidden_announcement_is_cancelled(self):
+        post_id = self.announce()
+        Post.objects.filter(pk=post_id).update(is_active=False)
+        self.assertEqual(run_fanout_jobs(), (1, 0))
+        self.assertEqual(FanoutJob.objects.get(post_id=post_id).status, 'cancelled')
+        self.assertEqual(self.recipients(post_id), [])
+
+
+class NotificationReadStateTests(GraphTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = self.graph.client(self.graph.viewer)
+        self.ids = list(Notification.objects.filter(recipient=self.graph.viewer).order_by('id').values_list('id', flat=True))
+
+    def unread(self):
+        data = self.client.get('/api/notifications/').data['results']
+        return sorted(row['id'] for row in data if not row['is_read'])
+
+    def notify(self):
+        return Notification.objects.create(recipient=self.graph.viewer, sender=self.graph.stranger,
+                                           notification_type='follow', message='new').pk
+
+    def test_id_list_is_one_update_of_own_notifications(self):
+        other = Notification.objects.exclude(recipient=self.graph.viewer).first()
+        response = self.client.post('/api/notifications/bulk-read/', {'ids': self.ids[:2] + [other.pk]}, format='json')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(self.unread(), self.ids[2:])
+        other.refresh_from_db()
+        self.assertFalse(other.is_read)
+
+    def test_watermark_marks_without_row_writes(self):
+        response = self.client.post('/api/notifications/bulk-read/', {'up_to_id': self.ids[1]}, format='json')
+        self.assertEqual(response.data['read_up_to'], self.ids[1])
+        self.assertEqual(self.unread(), self.ids[2:])
+        self.assertFalse(Notification.objects.filter(recipient=self.graph.viewer, is_read=True).exists())
+
+        self.assertEqual(self.client.post('/api/notifications/mark-all-read/').status_code, 200)
+        later = self.notify()
+        self.assertEqual(self.unread(), [later])
+        # The watermark never moves down and never past the user's own notifications.
+        self.client.post('/api/notifications/bulk-read/', {'up_to_id': self.ids[0]}, format='json')
+        self.client.post('/api/notifications/bulk-read/', {'up_to_id': 10 ** 12}, format='json')
+        self.assertEqual(self.unread(), [])
+        newest = self.notify()
+        self.assertEqual(self.unread(), [newest])
+        # Already read through the watermark: nothing to write.
+        self.assertEqual(self.client.post(f'/api/notifications/{later}/read/').status_code, 200)
+        self.assertFalse(Notification.objects.get(pk=later).is_read)
+
+    def test_exactly_one_target(self):
+        for body in ({}, {'ids': [1], 'up_to_id': 1}, {'ids': []}, {'before': 'yesterday'}):
+            self.assertEqual(self.client.post('/api/notifications/bulk-read/', body, format='json').status_code, 400)
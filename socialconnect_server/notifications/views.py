@@ -1,59 +1,104 @@
-import logging
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from socialconnect_server.async_views import AsyncAPIView, AsyncPageNumberPagination
+from socialconnect_server.log import get_logger
 from .models import Notification
-from .serializers import NotificationSerializer
+from .queries import with_notification_relations
+from .read_state import mark_ids_read, mark_read_up_to, with_read_mark
+from .serializers import BulkReadSerializer, NotificationSerializer
 
-logger = logging.getLogger('users')
+logger = get_logger('users')
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.request.user.notifications.order_by('-created_at')
+        queryset = self.request.user.notifications.order_by('-created_at')
+        if self.action in ('list', 'retrieve'):
+            return with_notification_relations(queryset, self.request.user)
+        if self.action == 'mark_read':
+            return with_read_mark(queryset)
+        return queryset
 
     def list(self, request, *args, **kwargs):
         try:
             response = super().list(request, *args, **kwargs)
-            logger.info(f"User {request.user.username} (ID: {request.user.id}) retrieved notification list")
+            logger.info('notifications.listed', user_id=request.user.id)
             return response
         except Exception as e:
-            logger.error(f"User {request.user.username} (ID: {request.user.id}) failed to retrieve notification list: {str(e)}")
+            logger.error('notifications.list_failed', user_id=request.user.id, error=e)
             raise
 
     def retrieve(self, request, *args, **kwargs):
         try:
             response = super().retrieve(request, *args, **kwargs)
-            notification = self.get_object()
-            logger.info(f"User {request.user.username} (ID: {request.user.id}) retrieved notification ID: {notification.id}")
+            logger.info('notification.retrieved', user_id=request.user.id, notification_id=response.data['id'])
             return response
         except Exception as e:
-            logger.error(f"User {request.user.username} (ID: {request.user.id}) failed to retrieve notification ID {self.kwargs.get('pk')}: {str(e)}")
+            logger.error('notification.retrieve_failed', user_id=request.user.id, notification_id=self.kwargs.get('pk'), error=e)
             raise
 
     @action(detail=True, methods=['post'], url_path='read')
     def mark_read(self, request, pk=None):
         try:
             notification = self.get_object()
-            if notification.is_read:
-                logger.warning(f"User {request.user.username} (ID: {request.user.id}) attempted to mark already-read notification ID: {notification.id}")
-            notification.is_read = True
-            notification.save()
-            logger.info(f"User {request.user.username} (ID: {request.user.id}) marked notification ID: {notification.id} as read")
+            if notification.is_read or notification.read_by_mark:
+                logger.warning('notification.already_read', user_id=request.user.id, notification_id=notification.id)
+            else:
+                notification.is_read = True
+                notification.save(update_fields=['is_read'])
+                logger.info('notification.read', user_id=request.user.id, notification_id=notification.id)
             return Response({'detail': 'Marked as read.'})
         except Exception as e:
-            logger.error(f"User {request.user.username} (ID: {request.user.id}) failed to mark notification ID {pk} as read: {str(e)}")
+            logger.error('notification.read_failed', user_id=request.user.id, notification_id=pk, error=e)
             raise
 
     @action(detail=False, methods=['post'], url_path='mark-all-read')
     def mark_all_read(self, request):
         try:
-            updated_count = request.user.notifications.filter(is_read=False).update(is_read=True)
-            logger.info(f"User {request.user.username} (ID: {request.user.id}) marked {updated_count} notifications as read")
+            # Raises the read watermark instead of flagging every unread row.
+            read_up_to = mark_read_up_to(request.user)
+            logger.info('notifications.read_all', user_id=request.user.id, read_up_to=read_up_to)
             return Response({'detail': 'All marked as read.'})
         except Exception as e:
-            logger.error(f"User {request.user.username} (ID: {request.user.id}) failed to mark all notifications as read: {str(e)}")
-            raise
\ No newline at end of file
+            logger.error('notifications.read_all_failed', user_id=request.user.id, error=e)
+            raise
+
+    @action(detail=False, methods=['post'], url_path='bulk-read')
+    def bulk_read(self, request):
+        serializer = BulkReadSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.warning('notifications.bulk_read_invalid', user_id=request.user.id, errors=serializer.errors)
+            return Response(serializer.errors, status=400)
+        data = serializer.validated_data
+        try:
+            if 'ids' in data:
+                updated_count = mark_ids_read(request.user, data['ids'])
+                logger.info('notifications.read_ids', user_id=request.user.id, requested=len(data['ids']), count=updated_count)
+                return Response({'detail': 'Marked as read.', 'updated': updated_count})
+            read_up_to = mark_read_up_to(request.user, up_to_id=data.get('up_to_id'), before=data.get('before'))
+            logger.info('notifications.read_up_to', user_id=request.user.id, read_up_to=read_up_to)
+            return Response({'detail': 'Marked as read.', 'read_up_to': read_up_to})
+        except Exception as e:
+            logger.error('notifications.bulk_read_failed', user_id=request.user.id, error=e)
+            raise
+
+class AsyncNotificationListView(AsyncAPIView):
+    """NotificationViewSet.list for ASGI: the count and the page are fetched concurrently."""
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        user = request.user
+        try:
+            paginator = AsyncPageNumberPagination()
+            queryset = with_notification_relations(Notification.objects.filter(recipient=user).order_by('-created_at'), user)
+            page = await paginator.paginate(queryset, request)
+            serializer = NotificationSerializer(page, many=True)
+            logger.info('notifications.listed', user_id=user.id)
+            return paginator.get_paginated_data(serializer.data)
+        except Exception as e:
+            logger.error('notifications.list_failed', user_id=user.id, error=e)
+            raise
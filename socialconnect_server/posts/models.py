@@ -14,4 +14,26 @@ class Post(models.Model):
     )
     is_active = models.BooleanField(default=True)
     like_count = models.PositiveIntegerField(default=0)
-    comment_count = models.PositiveIntegerField(default=0)
\ No newline at end of file
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='post_created_idx'),
+            models.Index(fields=['-like_count'], name='post_like_count_idx'),
+            models.Index(fields=['-comment_count'], name='post_comment_count_idx'),
+        ]
+
+    # What public post pages show of the post itself; like and comment counts are left out.
+    LISTED_FIELDS = ('content', 'image_url', 'category', 'is_active')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Lets save signals tell counter-only saves from changes public pages show; deferred fields are missing.
+        post._loaded_listing = {field: post.__dict__.get(field) for field in cls.LISTED_FIELDS}
+        return post
+
+    def listing_changed(self):
+        """Whether the listed fields differ from the values loaded from the database (True if unknown)."""
+        loaded = getattr(self, '_loaded_listing', None)
+        return loaded is None or any(getattr(self, field) != value for field, value in loaded.items())
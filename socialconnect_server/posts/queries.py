@@ -0,0 +1,22 @@
+from django.db.models import Exists, OuterRef, Q, Value
+from interactions.models import Follow, Like
+from .models import Post
+
+def visible_posts(user):
+    """Active posts `user` may see, newest first: their own, public authors' and followers-only authors they follow."""
+    queryset = Post.objects.filter(is_active=True).order_by('-created_at')
+    if user is None or not user.is_authenticated:
+        return queryset.filter(author__privacy='public')
+    following_ids = Follow.objects.filter(follower=user).values_list('following_id', flat=True)
+    return queryset.filter(
+        Q(author=user) |
+        Q(author__privacy='public') |
+        Q(author__privacy='followers_only', author__in=following_ids)
+    )
+
+def with_post_relations(queryset, user):
+    """Join the author and annotate everything PostSerializer reads, so a page serializes without extra queries."""
+    queryset = queryset.select_related('author')
+    if user is not None and user.is_authenticated:
+        return queryset.annotate(liked_by_user=Exists(Like.objects.filter(post=OuterRef('pk'), user=user)))
+    return queryset.annotate(liked_by_user=Value(False))
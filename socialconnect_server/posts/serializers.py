@@ -1,13 +1,13 @@
-import logging
 from rest_framework import serializers
 from .models import Post
+from socialconnect_server import storage
+from socialconnect_server.log import get_logger
+from socialconnect_server.metrics import TimedSerializerMixin
 from accounts.serializers import UserSerializer
-from django.conf import settings
-from supabase import create_client  # type: ignore
 
-logger = logging.getLogger('users')
+logger = get_logger('users')
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     image = serializers.FileField(write_only=True, required=False)
     author = UserSerializer(read_only=True)
     liked = serializers.SerializerMethodField(read_only=True)
@@ -17,12 +17,15 @@ class PostSerializer(serializers.ModelSerializer):
         fields = ['id', 'content', 'author', 'created_at', 'updated_at', 'image_url', 'category', 'like_count', 'comment_count', 'image', 'liked']
 
     def get_liked(self, obj):
+        liked = getattr(obj, 'liked_by_user', None)
+        if liked is not None:
+            return liked
         user = self.context['request'].user
         if user.is_authenticated:
             liked = obj.like_set.filter(user=user).exists()
-            logger.debug(f"Checked like status for post ID {obj.id} by user {user.username} (ID: {user.id}): {liked}")
+            logger.debug('post.like_checked', post_id=obj.id, user_id=user.id, liked=liked)
             return liked
-        logger.debug(f"Checked like status for post ID {obj.id} by anonymous user: False")
+        logger.debug('post.like_checked', post_id=obj.id, user_id=None, liked=False)
         return False
 
     def create(self, validated_data):
@@ -32,90 +35,90 @@ class PostSerializer(serializers.ModelSerializer):
             validated_data['author'] = self.context['request'].user
             post = Post(**validated_data)
             post.save()
-            logger.info(f"User {self.context['request'].user.username} (ID: {self.context['request'].user.id}) created post ID: {post.id}")
+            logger.info('post.created', post_id=post.id, user_id=self.context['request'].user.id)
             
             if image:
                 if image.size > 2 * 1024 * 1024:
-                    logger.warning(f"Image upload failed for post ID {post.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id}): Image size exceeds 2MB")
+                    logger.warning('post.image_rejected', post_id=post.id, user_id=self.context['request'].user.id, reason='size')
                     raise serializers.ValidationError({'image': 'Image size exceeds 2MB.'})
                 if image.content_type not in ['image/jpeg', 'image/png']:
-                    logger.warning(f"Image upload failed for post ID {post.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id}): Invalid image format ({image.content_type})")
+                    logger.warning('post.image_rejected', post_id=post.id, user_id=self.context['request'].user.id, reason='format', content_type=image.content_type)
                     raise serializers.ValidationError({'image': 'Invalid image format. Only JPEG/PNG allowed.'})
                 try:
-                    supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+                    posts = storage.bucket('posts')
                     path = f"{post.id}/{image.name}"
-                    logger.debug(f"Uploading image to Supabase bucket 'posts' at path: {path} for post ID {post.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id})")
-                    upload_response = supabase.storage.from_('posts').upload(
+                    logger.debug('post.image_uploading', post_id=post.id, user_id=self.context['request'].user.id, bucket='posts', path=path)
+                    upload_response = posts.upload(
                         path,
                         image.read(),
                         {'content-type': image.content_type, 'upsert': 'true'}
                     )
-                    logger.debug(f"Supabase upload response for post ID {post.id}: {upload_response}")
+                    logger.debug('post.image_upload_response', post_id=post.id, response=upload_response)
                     if isinstance(upload_response, dict) and 'error' in upload_response:
                         error_msg = upload_response['error']
                         if upload_response.get('statusCode') == 403:
                             error_msg = 'Permission denied: Check Supabase bucket policies.'
                         elif upload_response.get('statusCode') == 409:
                             error_msg = 'Image already exists.'
-                        logger.error(f"Image upload failed for post ID {post.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id}): {error_msg}")
+                        logger.error('post.image_upload_failed', post_id=post.id, user_id=self.context['request'].user.id, error=error_msg)
                         raise serializers.ValidationError({'image': f'Upload failed: {error_msg}'})
-                    public_url_response = supabase.storage.from_('posts').get_public_url(path)
+                    public_url_response = posts.get_public_url(path)
                     post.image_url = public_url_response if isinstance(public_url_response, str) else public_url_response.get('public_url', '')
                     if not post.image_url:
-                        logger.error(f"Failed to generate public URL for post ID {post.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id})")
+                        logger.error('post.image_url_missing', post_id=post.id, user_id=self.context['request'].user.id)
                         raise serializers.ValidationError({'image': 'Failed to generate public URL.'})
-                    logger.info(f"Image uploaded successfully for post ID {post.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id}). Public URL: {post.image_url}")
+                    logger.info('post.image_uploaded', post_id=post.id, user_id=self.context['request'].user.id, url=post.image_url)
                     post.save()
                 except Exception as e:
-                    logger.error(f"Supabase error during image upload for post ID {post.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id}): {str(e)}")
+                    logger.error('post.image_upload_failed', post_id=post.id, user_id=self.context['request'].user.id, error=e)
                     raise serializers.ValidationError({'image': f'Failed to upload image: {str(e)}'})
             return post
         except Exception as e:
-            logger.error(f"User {self.context['request'].user.username} (ID: {self.context['request'].user.id}) failed to create post: {str(e)}")
+            logger.error('post.create_failed', user_id=self.context['request'].user.id, error=e)
             raise
 
     def update(self, instance, validated_data):
         try:
             image = validated_data.pop('image', None)
             instance = super().update(instance, validated_data)
-            logger.info(f"User {self.context['request'].user.username} (ID: {self.context['request'].user.id}) updated post ID: {instance.id}")
+            logger.info('post.updated', post_id=instance.id, user_id=self.context['request'].user.id)
             
             if image:
                 if image.size > 2 * 1024 * 1024:
-                    logger.warning(f"Image upload failed for post ID {instance.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id}): Image size exceeds 2MB")
+                    logger.warning('post.image_rejected', post_id=instance.id, user_id=self.context['request'].user.id, reason='size')
                     raise serializers.ValidationError({'image': 'Image size exceeds 2MB.'})
                 if image.content_type not in ['image/jpeg', 'image/png']:
-                    logger.warning(f"Image upload failed for post ID {instance.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id}): Invalid image format ({image.content_type})")
+                    logger.warning('post.image_rejected', post_id=instance.id, user_id=self.context['request'].user.id, reason='format', content_type=image.content_type)
                     raise serializers.ValidationError({'image': 'Invalid image format. Only JPEG/PNG allowed.'})
                 try:
-                    supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+                    posts = storage.bucket('posts')
                     path = f"{instance.id}/{image.name}"
-                    logger.debug(f"Uploading image to Supabase bucket 'posts' at path: {path} for post ID {instance.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id})")
-                    upload_response = supabase.storage.from_('posts').upload(
+                    logger.debug('post.image_uploading', post_id=instance.id, user_id=self.context['request'].user.id, bucket='posts', path=path)
+                    upload_response = posts.upload(
                         path,
                         image.read(),
                         {'content-type': image.content_type, 'upsert': 'true'}
                     )
-                    logger.debug(f"Supabase upload response for post ID {instance.id}: {upload_response}")
+                    logger.debug('post.image_upload_response', post_id=instance.id, response=upload_response)
                     if isinstance(upload_response, dict) and 'error' in upload_response:
                         error_msg = upload_response['error']
                         if upload_response.get('statusCode') == 403:
                             error_msg = 'Permission denied: Check Supabase bucket policies.'
                         elif upload_response.get('statusCode') == 409:
                             error_msg = 'Image already exists.'
-                        logger.error(f"Image upload failed for post ID {instance.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id}): {error_msg}")
+                        logger.error('post.image_upload_failed', post_id=instance.id, user_id=self.context['request'].user.id, error=error_msg)
                         raise serializers.ValidationError({'image': f'Upload failed: {error_msg}'})
-                    public_url_response = supabase.storage.from_('posts').get_public_url(path)
+                    public_url_response = posts.get_public_url(path)
                     instance.image_url = public_url_response if isinstance(public_url_response, str) else public_url_response.get('public_url', '')
                     if not instance.image_url:
-                        logger.error(f"Failed to generate public URL for post ID {instance.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id})")
+                        logger.error('post.image_url_missing', post_id=instance.id, user_id=self.context['request'].user.id)
                         raise serializers.ValidationError({'image': 'Failed to generate public URL.'})
-                    logger.info(f"Image uploaded successfully for post ID {instance.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id}). Public URL: {instance.image_url}")
+                    logger.info('post.image_uploaded', post_id=instance.id, user_id=self.context['request'].user.id, url=instance.image_url)
                     instance.save()
                 except Exception as e:
-                    logger.error(f"Supabase error during image upload for post ID {instance.id} by user {self.context['request'].user.username} (ID: {self.context['request'].user.id}): {str(e)}")
+                    logger.error('post.image_upload_failed', post_id=instance.id, user_id=self.context['request'].user.id, error=e)
                     raise serializers.ValidationError({'image': f'Failed to upload image: {str(e)}'})
             return instance
         except Exception as e:
-            logger.error(f"User {self.context['request'].user.username} (ID: {self.context['request'].user.id}) failed to update post ID {instance.id}: {str(e)}")
+            logger.error('post.update_failed', post_id=instance.id, user_id=self.context['request'].user.id, error=e)
             raise
\ No newline at end of file
@@ -1,21 +1,45 @@
-import logging
+import time
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from rest_framework.decorators import action
-from django.db.models import Q
 from rest_framework.views import APIView
-from .models import Post
+from rest_framework.exceptions import NotFound
+from accounts.purge import delete_post
+from .queries import visible_posts, with_post_relations
 from .serializers import PostSerializer
 from interactions.serializers import CommentSerializer
 from interactions.models import Like, Comment
+from notifications.fanout import queue_fanout
+from notifications.models import FanoutJob
+from notifications.serializers import FanoutJobSerializer
 from socialconnect_server.permissions import IsOwnerOrAdmin
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
-from accounts.models import User
-from interactions.models import Follow
+from socialconnect_server.async_views import AsyncAPIView, AsyncPageNumberPagination, gather
+from socialconnect_server import page_cache
+from socialconnect_server.conditional import (
+    apublic_posts_version, aprofile_versions, feed_etag, is_conditional, not_modified, post_validators,
+    profile_versions, public_posts_version, set_validators, unchanged_since,
+)
+from socialconnect_server.log import get_logger
 
-logger = logging.getLogger('users')
+logger = get_logger('users')
+
+FEED_PAGE_SIZE = 20
+
+def requested_page(request):
+    """The `?page=` number if it is a plain positive integer, otherwise None (left to the paginator)."""
+    number = request.query_params.get('page') or '1'
+    return int(number) if number.isdigit() and int(number) > 0 else None
+
+def feed_rows(posts, number):
+    """The cheap form of a feed page for validation: (id, updated_at, author id) rows."""
+    offset = (number - 1) * FEED_PAGE_SIZE
+    return lambda: list(posts.values_list('id', 'updated_at', 'author_id')[offset:offset + FEED_PAGE_SIZE])
+
+def page_rows(page):
+    return [(post.id, post.updated_at, post.author_id) for post in page]
 
 class PostViewSet(viewsets.ModelViewSet):
     serializer_class = PostSerializer
@@ -23,71 +47,107 @@ class PostViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        # Base queryset: active posts
-        queryset = Post.objects.filter(is_active=True).order_by('-created_at')
-        if user.is_authenticated:
-            # Include posts from users the requester can view
-            following_ids = Follow.objects.filter(follower=user).values_list('following_id', flat=True)
-            return queryset.filter(
-                Q(author=user) |  # Own posts
-                Q(author__privacy='public') |  # Public profiles
-                Q(author__privacy='followers_only', author__in=following_ids)  # Followers-only for followed users
-            )
-        # Unauthenticated users see only public posts
-        return queryset.filter(author__privacy='public')
+        # Own posts, public profiles and followers-only profiles the user follows.
+        queryset = visible_posts(user)
+        if self.action in ('list', 'retrieve', 'update', 'partial_update'):
+            # Annotations survive save(), so update responses serialize without extra queries too.
+            return with_post_relations(queryset, user)
+        return queryset
 
     def list(self, request, *args, **kwargs):
         try:
-            response = super().list(request, *args, **kwargs)
-            logger.info(f"User {request.user.username if request.user.is_authenticated else 'anonymous'} "
-                        f"(ID: {request.user.id if request.user.is_authenticated else 'N/A'}) retrieved post list")
+            if page_cache.enabled(request):
+                # Every anonymous visitor sees the same public pages.
+                status_code, data = page_cache.cached_page(
+                    request, 'posts', public_posts_version(), lambda: self._list_data(request, *args, **kwargs))
+                response = Response(data, status=status_code)
+            else:
+                response = super().list(request, *args, **kwargs)
+            logger.info('posts.listed', viewer_id=request.user.id)
             return response
         except Exception as e:
-            logger.error(f"User {request.user.username if request.user.is_authenticated else 'anonymous'} "
-                         f"(ID: {request.user.id if request.user.is_authenticated else 'N/A'}) failed to retrieve post list: {str(e)}")
+            logger.error('posts.list_failed', viewer_id=request.user.id, error=e)
             raise
 
+    def _list_data(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        return response.status_code, response.data
+
     def retrieve(self, request, *args, **kwargs):
         try:
-            response = super().retrieve(request, *args, **kwargs)
+            pk = str(self.kwargs['pk'])
+            if is_conditional(request) and pk.isdigit():
+                # Validate against the post's timestamps before loading and serializing it.
+                row = visible_posts(request.user).filter(pk=pk).values_list('updated_at', 'author_id').first()
+                if row is not None:
+                    version = profile_versions([row[1]])[row[1]]
+                    response = not_modified(request, *post_validators(int(pk), row[0], version, request.user))
+                    if response is not None:
+                        logger.info('post.not_modified', viewer_id=request.user.id, post_id=int(pk))
+                        return response
+            started = time.time()
             post = self.get_object()
-            logger.info(f"User {request.user.username if request.user.is_authenticated else 'anonymous'} "
-                        f"(ID: {request.user.id if request.user.is_authenticated else 'N/A'}) retrieved post ID: {post.id} by {post.author.username}")
+            response = Response(self.get_serializer(post).data)
+            version = profile_versions([post.author_id])[post.author_id]
+            if unchanged_since([version], started):
+                set_validators(response, *post_validators(post.id, post.updated_at, version, request.user))
+            logger.info('post.retrieved', viewer_id=request.user.id, post_id=post.id, author_id=post.author_id)
             return response
         except Exception as e:
-            logger.error(f"User {request.user.username if request.user.is_authenticated else 'anonymous'} "
-                         f"(ID: {request.user.id if request.user.is_authenticated else 'N/A'}) failed to retrieve post ID {self.kwargs.get('pk')}: {str(e)}")
+            logger.error('post.retrieve_failed', viewer_id=request.user.id, post_id=self.kwargs.get('pk'), error=e)
             raise
 
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
             return [IsOwnerOrAdmin()]
+        if self.action == 'fanout':
+            return [IsAuthenticated(), IsOwnerOrAdmin()]
         return super().get_permissions()
 
     def perform_create(self, serializer):
         try:
             post = serializer.save(author=self.request.user)
-            logger.info(f"User {self.request.user.username} (ID: {self.request.user.id}) created post ID: {post.id}")
+            if post.category == 'announcement':
+                # Followers are notified in the background (notifications.fanout).
+                queue_fanout(post)
+            logger.info('post.created', user_id=self.request.user.id, post_id=post.id)
         except Exception as e:
-            logger.error(f"User {self.request.user.username} (ID: {self.request.user.id}) failed to create post: {str(e)}")
+            logger.error('post.create_failed', user_id=self.request.user.id, error=e)
             raise
 
     def perform_update(self, serializer):
         try:
+            was_announcement = serializer.instance.category == 'announcement'
             post = serializer.save()
-            logger.info(f"User {self.request.user.username} (ID: {self.request.user.id}) updated post ID: {post.id}")
+            if post.category == 'announcement' and not was_announcement:
+                queue_fanout(post)
+            logger.info('post.updated', user_id=self.request.user.id, post_id=post.id)
         except Exception as e:
-            logger.error(f"User {self.request.user.username} (ID: {self.request.user.id}) failed to update post ID {self.get_object().id}: {str(e)}")
+            logger.error('post.update_failed', user_id=self.request.user.id, post_id=self.kwargs.get('pk'), error=e)
             raise
 
     def perform_destroy(self, instance):
         try:
-            post_id = instance.id
-            author_username = instance.author.username
-            instance.delete()
-            logger.info(f"User {self.request.user.username} (ID: {self.request.user.id}) deleted post ID: {post_id} by {author_username}")
+            # Hidden now; likes, comments and the row are removed in the background.
+            delete_post(instance, requested_by=self.request.user)
+            logger.info('post.deleted', user_id=self.request.user.id, post_id=instance.id, author_id=instance.author_id)
         except Exception as e:
-            logger.error(f"User {self.request.user.username} (ID: {self.request.user.id}) failed to delete post ID {instance.id}: {str(e)}")
+            logger.error('post.delete_failed', user_id=self.request.user.id, post_id=instance.id, error=e)
+            raise
+
+    @action(detail=True, methods=['get'])
+    def fanout(self, request, pk=None):
+        """Progress of notifying the author's followers of this announcement (author and admins only)."""
+        try:
+            post = self.get_object()
+            job = FanoutJob.objects.filter(post=post).first()
+            if job is None:
+                logger.warning('post.fanout_missing', user_id=request.user.id, post_id=post.id)
+                return Response({'detail': 'This post has no announcement fan-out.'}, status=status.HTTP_404_NOT_FOUND)
+            logger.info('post.fanout_checked', user_id=request.user.id, post_id=post.id, status=job.status)
+            return Response(FanoutJobSerializer(job).data)
+        except Exception as e:
+            logger.error('post.fanout_failed', user_id=request.user.id, post_id=pk, error=e)
             raise
 
     @action(detail=True, methods=['post'])
@@ -98,12 +158,12 @@ class PostViewSet(viewsets.ModelViewSet):
             if created:
                 post.like_count += 1
                 post.save()
-                logger.info(f"User {request.user.username} (ID: {request.user.id}) liked post ID: {post.id} by {post.author.username}")
+                logger.info('post.liked', user_id=request.user.id, post_id=post.id, author_id=post.author_id)
                 return Response({'detail': 'Liked.'})
-            logger.warning(f"User {request.user.username} (ID: {request.user.id}) already liked post ID: {post.id}")
+            logger.warning('post.already_liked', user_id=request.user.id, post_id=post.id)
             return Response({'detail': 'Already liked.'})
         except Exception as e:
-            logger.error(f"User {request.user.username} (ID: {self.request.user.id}) failed to like post ID {pk}: {str(e)}")
+            logger.error('post.like_failed', user_id=request.user.id, post_id=pk, error=e)
             raise
 
     @action(detail=True, methods=['delete'])
@@ -115,12 +175,12 @@ class PostViewSet(viewsets.ModelViewSet):
                 like.delete()
                 post.like_count -= 1
                 post.save()
-                logger.info(f"User {request.user.username} (ID: {request.user.id}) unliked post ID: {post.id} by {post.author.username}")
+                logger.info('post.unliked', user_id=request.user.id, post_id=post.id, author_id=post.author_id)
                 return Response({'detail': 'Unliked.'})
-            logger.warning(f"User {request.user.username} (ID: {request.user.id}) attempted to unlike unliked post ID: {post.id}")
+            logger.warning('post.not_liked', user_id=request.user.id, post_id=post.id)
             return Response({'detail': 'Not liked.'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.error(f"User {request.user.username} (ID: {self.request.user.id}) failed to unlike post ID {pk}: {str(e)}")
+            logger.error('post.unlike_failed', user_id=request.user.id, post_id=pk, error=e)
             raise
 
     @action(detail=True, methods=['get'], url_path='like-status')
@@ -128,10 +188,10 @@ class PostViewSet(viewsets.ModelViewSet):
         try:
             post = self.get_object()
             liked = Like.objects.filter(user=request.user, post=post).exists()
-            logger.info(f"User {request.user.username} (ID: {request.user.id}) checked like status for post ID: {post.id} (liked: {liked})")
+            logger.info('post.like_status', user_id=request.user.id, post_id=post.id, liked=liked)
             return Response({'liked': liked})
         except Exception as e:
-            logger.error(f"User {request.user.username} (ID: {self.request.user.id}) failed to check like status for post ID {pk}: {str(e)}")
+            logger.error('post.like_status_failed', user_id=request.user.id, post_id=pk, error=e)
             raise
 
     @action(detail=True, methods=['get', 'post'], url_path='comments')
@@ -139,10 +199,9 @@ class PostViewSet(viewsets.ModelViewSet):
         try:
             post = self.get_object()
             if request.method == 'GET':
-                comments = post.comments.filter(is_active=True).order_by('-created_at')
+                comments = post.comments.filter(is_active=True).select_related('author').order_by('-created_at')
                 serializer = CommentSerializer(comments, many=True)
-                logger.info(f"User {request.user.username if request.user.is_authenticated else 'anonymous'} "
-                            f"(ID: {request.user.id if request.user.is_authenticated else 'N/A'}) retrieved comments for post ID: {post.id}")
+                logger.info('comments.listed', viewer_id=request.user.id, post_id=post.id)
                 return Response(serializer.data)
             elif request.method == 'POST':
                 serializer = CommentSerializer(data=request.data)
@@ -150,13 +209,12 @@ class PostViewSet(viewsets.ModelViewSet):
                     comment = serializer.save(author=request.user, post=post)
                     post.comment_count += 1
                     post.save()
-                    logger.info(f"User {request.user.username} (ID: {request.user.id}) created comment ID: {comment.id} on post ID: {post.id}")
+                    logger.info('comment.created', user_id=request.user.id, comment_id=comment.id, post_id=post.id)
                     return Response(serializer.data, status=status.HTTP_201_CREATED)
-                logger.warning(f"User {request.user.username} (ID: {request.user.id}) failed to create comment on post ID: {post.id}: {serializer.errors}")
+                logger.warning('comment.invalid', user_id=request.user.id, post_id=post.id, errors=serializer.errors)
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.error(f"User {request.user.username if request.user.is_authenticated else 'anonymous'} "
-                         f"(ID: {request.user.id if request.user.is_authenticated else 'N/A'}) failed to process comments for post ID {pk}: {str(e)}")
+            logger.error('comments.failed', viewer_id=request.user.id, post_id=pk, error=e)
             raise
 
 class FeedView(APIView):
@@ -166,20 +224,112 @@ class FeedView(APIView):
     def get(self, request):
         try:
             user = request.user
-            # Filter posts based on author privacy
-            following_ids = Follow.objects.filter(follower=user).values_list('following_id', flat=True)
-            posts = Post.objects.filter(
-                Q(is_active=True) &
-                (Q(author=user) |  # Own posts
-                 Q(author__privacy='public') |  # Public profiles
-                 Q(author__privacy='followers_only', author__in=following_ids))  # Followers-only for followed users
-            ).order_by('-created_at')
+            posts = visible_posts(user)
+            number = requested_page(request)
+            if is_conditional(request) and number is not None:
+                # The page's ids and timestamps plus the count decide freshness; nothing is serialized.
+                rows, count = feed_rows(posts, number)(), posts.count()
+                versions = profile_versions({row[2] for row in rows} | {user.pk})
+                response = not_modified(request, feed_etag(user, number, count, rows, versions))
+                if response is not None:
+                    logger.info('feed.not_modified', user_id=user.id, page=number)
+                    return response
+            started = time.time()
             paginator = self.pagination_class()
-            paginator.page_size = 20
-            page = paginator.paginate_queryset(posts, request)
+            paginator.page_size = FEED_PAGE_SIZE
+            page = paginator.paginate_queryset(with_post_relations(posts, user), request)
+            serializer = PostSerializer(page, many=True, context={'request': request})
+            response = paginator.get_paginated_response(serializer.data)
+            rows = page_rows(page)
+            versions = profile_versions({row[2] for row in rows} | {user.pk})
+            if unchanged_since(versions.values(), started):
+                set_validators(response, feed_etag(user, paginator.page.number, paginator.page.paginator.count, rows, versions))
+            logger.info('feed.retrieved', user_id=user.id, count=len(page))
+            return response
+        except Exception as e:
+            logger.error('feed.failed', user_id=request.user.id, error=e)
+            raise
+
+class AsyncFeedView(AsyncAPIView):
+    """FeedView for ASGI: the count and the page are fetched concurrently."""
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        user = request.user
+        try:
+            posts = visible_posts(user)
+            number = requested_page(request)
+            if is_conditional(request) and number is not None:
+                rows, count = await gather(feed_rows(posts, number), posts.count)
+                versions = await aprofile_versions({row[2] for row in rows} | {user.pk})
+                response = not_modified(request, feed_etag(user, number, count, rows, versions))
+                if response is not None:
+                    logger.info('feed.not_modified', user_id=user.id, page=number)
+                    return response
+            started = time.time()
+            paginator = AsyncPageNumberPagination()
+            paginator.page_size = FEED_PAGE_SIZE
+            page = await paginator.paginate(with_post_relations(posts, user), request)
             serializer = PostSerializer(page, many=True, context={'request': request})
-            logger.info(f"User {user.username} (ID: {user.id}) retrieved feed with {len(page)} posts")
-            return paginator.get_paginated_response(serializer.data)
+            response = self.render(paginator.get_paginated_data(serializer.data))
+            rows = page_rows(page)
+            versions = await aprofile_versions({row[2] for row in rows} | {user.pk})
+            if unchanged_since(versions.values(), started):
+                set_validators(response, feed_etag(user, paginator.number, paginator.count, rows, versions))
+            logger.info('feed.retrieved', user_id=user.id, count=len(page))
+            return response
+        except Exception as e:
+            logger.error('feed.failed', user_id=user.id, error=e)
+            raise
+
+class AsyncPostListView(AsyncAPIView):
+    """PostViewSet.list for ASGI; POST goes to PostViewSet.create."""
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    async def get(self, request):
+        user = request.user
+        try:
+            async def build():
+                paginator = AsyncPageNumberPagination()
+                page = await paginator.paginate(with_post_relations(visible_posts(user), user), request)
+                serializer = PostSerializer(page, many=True, context={'request': request})
+                return 200, paginator.get_paginated_data(serializer.data)
+
+            if page_cache.enabled(request):
+                _, data = await page_cache.acached_page(request, 'posts', await apublic_posts_version(), build)
+            else:
+                _, data = await build()
+            logger.info('posts.listed', viewer_id=user.id)
+            return data
         except Exception as e:
-            logger.error(f"User {user.username} (ID: {user.id}) failed to retrieve feed: {str(e)}")
-            raise
\ No newline at end of file
+            logger.error('posts.list_failed', viewer_id=user.id, error=e)
+            raise
+
+class AsyncPostDetailView(AsyncAPIView):
+    """PostViewSet.retrieve for ASGI; updates and deletes go to PostViewSet."""
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    async def get(self, request, pk):
+        user = request.user
+        try:
+            if is_conditional(request):
+                row = await visible_posts(user).filter(pk=pk).values_list('updated_at', 'author_id').afirst()
+                if row is not None:
+                    version = (await aprofile_versions([row[1]]))[row[1]]
+                    response = not_modified(request, *post_validators(int(pk), row[0], version, user))
+                    if response is not None:
+                        logger.info('post.not_modified', viewer_id=user.id, post_id=int(pk))
+                        return response
+            started = time.time()
+            post = await with_post_relations(visible_posts(user), user).filter(pk=pk).afirst()
+            if post is None:
+                raise NotFound('No Post matches the given query.')
+            response = self.render(PostSerializer(post, context={'request': request}).data)
+            version = (await aprofile_versions([post.author_id]))[post.author_id]
+            if unchanged_since([version], started):
+                set_validators(response, *post_validators(post.id, post.updated_at, version, user))
+            logger.info('post.retrieved', viewer_id=user.id, post_id=post.id, author_id=post.author_id)
+            return response
+        except Exception as e:
+            logger.error('post.retrieve_failed', viewer_id=user.id, post_id=pk, error=e)
+            raise
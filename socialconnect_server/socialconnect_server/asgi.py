@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'socialconnect_server.settings')
+# Route the read-heavy GET endpoints to the async views (see settings.ASYNC_READ_VIEWS).
+os.environ.setdefault('ASYNC_READ_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,168 @@
+"""Async views for the read-heavy GET endpoints.
+
+DRF views are synchronous, so under ASGI each request to them holds a worker
+thread for its whole lifetime. AsyncAPIView keeps the parts of APIView the read
+endpoints rely on (authentication, permission classes, error bodies, JSON
+rendering) on the event loop and reaches the database through Django's async
+ORM or `gather`. Requests with other methods are handed to `sync_view`, the DRF
+view normally routed at the same URL, so writes behave exactly as before.
+
+These views are routed when ASYNC_READ_VIEWS is on, which asgi.py does by default.
+"""
+import asyncio
+import time
+from math import ceil
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import close_old_connections
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBase, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .metrics import current_metrics
+
+def _run_query(query):
+    # Worker threads keep their connection between calls; drop it if it expired or broke.
+    close_old_connections()
+    return query()
+
+async def gather(*queries):
+    """Run independent synchronous ORM callables at the same time and return their results in order.
+
+    Each runs on its own worker thread and database connection. With
+    ASYNC_CONCURRENT_QUERIES off (the test suite, whose fixtures sit in an
+    uncommitted transaction) they run one after another on the request's thread.
+    """
+    if not getattr(settings, 'ASYNC_CONCURRENT_QUERIES', True):
+        return [await sync_to_async(query)() for query in queries]
+    return await asyncio.gather(*(sync_to_async(_run_query, thread_sensitive=False)(query) for query in queries))
+
+async def _pull(chunks):
+    # thread_sensitive keeps every step on the request's sync thread, and so on the connection its cursors use.
+    step = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    chunks = iter(chunks)
+    while (chunk := await step(chunks, done)) is not done:
+        yield chunk
+
+def streaming_response(request, chunks, **kwargs):
+    """StreamingHttpResponse over the synchronous iterator `chunks` that also streams under ASGI.
+
+    Django's ASGI handler reads a synchronous iterator into a list before
+    sending any of it, so ASGI requests get an async iterator that produces one
+    chunk at a time instead.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        chunks = _pull(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
+
+class AsyncPageNumberPagination:
+    """PageNumberPagination's `?page=` handling and response body, fetching the count and the page concurrently."""
+
+    page_size = api_settings.PAGE_SIZE
+    page_query_param = 'page'
+
+    async def paginate(self, queryset, request):
+        self.request = request
+        number = request.query_params.get(self.page_query_param) or 1
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 0
+        if number < 1:
+            raise exceptions.NotFound('Invalid page.')
+        offset = (number - 1) * self.page_size
+        self.count, page = await gather(queryset.count, lambda: list(queryset[offset:offset + self.page_size]))
+        if number > max(1, ceil(self.count / self.page_size)):
+            raise exceptions.NotFound('Invalid page.')
+        self.number = number
+        return page
+
+    def get_paginated_data(self, data):
+        url = self.request.build_absolute_uri()
+        has_next = self.number * self.page_size < self.count
+        if self.number == 1:
+            previous = None
+        elif self.number == 2:
+            previous = remove_query_param(url, self.page_query_param)
+        else:
+            previous = replace_query_param(url, self.page_query_param, self.number - 1)
+        return {
+            'count': self.count,
+            'next': replace_query_param(url, self.page_query_param, self.number + 1) if has_next else None,
+            'previous': previous,
+            'results': data,
+        }
+
+class AsyncAPIView(View):
+    """Base for async GET endpoints that mirror a synchronous DRF view.
+
+    Subclasses implement `async def get(self, request, ...)` and return the
+    response data, or a response built with `render()` when they set headers;
+    raise DRF exceptions for error responses.
+    """
+
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Same as APIView: authentication is token based, not session based.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            if self.sync_view is None:
+                return self.http_method_not_allowed(request, *args, **kwargs)
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+        # A DRF Request gives the handlers query_params and the same request.user as DRF views.
+        request = Request(request)
+        try:
+            request.user = await self.authenticate(request)
+            self.check_permissions(request)
+            data = await self.get(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+        if isinstance(data, HttpResponseBase):
+            return data
+        return self.render(data)
+
+    async def authenticate(self, request):
+        for authentication_class in self.authentication_classes:
+            result = await authentication_class().aauthenticate(request)
+            if result is not None:
+                return result[0]
+        return AnonymousUser()
+
+    def check_permissions(self, request):
+        for permission in [permission_class() for permission_class in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    def handle_exception(self, request, exc):
+        headers = {}
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            # As in APIView: 401 with a challenge from the first authenticator.
+            exc.status_code = 401
+            headers['WWW-Authenticate'] = self.authentication_classes[0]().authenticate_header(request)
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return self.render(data, status=exc.status_code, headers=headers)
+
+    def render(self, data, status=200, headers=None):
+        start = time.perf_counter()
+        response = HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json', headers=headers)
+        patch_vary_headers(response, ('Accept',))
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.render_time += time.perf_counter() - start
+        return response
@@ -0,0 +1,54 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from accounts.cache import aget_cached_user, get_cached_user
+from .db_router import abind_user, bind_user
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that resolves the principal from the user cache.
+
+    The token is verified statelessly as before; the user row comes from
+    `accounts.cache`, so most requests authenticate without touching the database.
+    `aauthenticate` is the same check for the async views.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        # Decide replica vs primary for this user before the first read.
+        bind_user(user_id)
+        return self.check_user(get_cached_user(user_id), validated_token)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        # Signature and expiry checks are pure CPU; only the user lookup awaits.
+        validated_token = self.get_validated_token(raw_token)
+        user_id = self.get_user_id(validated_token)
+        await abind_user(user_id)
+        user = self.check_user(await aget_cached_user(user_id), validated_token)
+        return user, validated_token
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def check_user(self, user, validated_token):
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
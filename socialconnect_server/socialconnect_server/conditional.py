@@ -0,0 +1,102 @@
+"""Validators for conditional GET (ETag / Last-Modified) on posts, profiles and the feed.
+
+Serialized posts and profiles embed follower, following and post counts that
+change without touching the user row, so every user has a profile version in
+the cache: the time of the last change to their profile or counts. Profile
+saves and admin bulk updates move it through accounts.cache.invalidate_user(s);
+follow and post signals move it for count changes. Post validators combine
+`Post.updated_at` (likes and comments save the post) with the author's version;
+the feed combines the page's (id, updated_at, author) rows, the total count and
+the versions of the authors and the viewer.
+
+Every ETag includes the viewer, because `liked` and visibility differ per
+user. A version missing from the cache is reset to now, which can only turn a
+304 into a 200. Validators are only attached to a 200 when no version it depends
+on moved while (or, for replica reads, up to DATABASE_REPLICA_PIN_SECONDS before)
+the body was built, so a client never stores an older body under a newer tag.
+Use a shared cache backend when running several workers.
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from .db_router import read_from_replica
+
+PROFILE_VERSION_KEY = 'profile-version:{}'
+# Public post pages embed posts and their authors' profiles, so either kind of change moves it.
+PUBLIC_POSTS_VERSION_KEY = 'public-posts-version'
+
+def bump_profiles(user_ids):
+    now = time.time()
+    versions = {PROFILE_VERSION_KEY.format(pk): now for pk in user_ids}
+    cache.set_many({**versions, PUBLIC_POSTS_VERSION_KEY: now}, None)
+
+def bump_public_posts():
+    cache.set(PUBLIC_POSTS_VERSION_KEY, time.time(), None)
+
+def public_posts_version():
+    return cache.get_or_set(PUBLIC_POSTS_VERSION_KEY, time.time, None)
+
+async def apublic_posts_version():
+    return await cache.aget_or_set(PUBLIC_POSTS_VERSION_KEY, time.time, None)
+
+def profile_versions(user_ids):
+    """{user_id: version} for `user_ids`, starting missing versions now."""
+    keys = {PROFILE_VERSION_KEY.format(pk): pk for pk in set(user_ids)}
+    versions = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+async def aprofile_versions(user_ids):
+    keys = {PROFILE_VERSION_KEY.format(pk): pk for pk in set(user_ids)}
+    versions = await cache.aget_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+def is_conditional(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+def not_modified(request, etag, last_modified=None):
+    """The 304 (or 412) response when the client's copy is current, otherwise None."""
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified) if last_modified else None)
+    if response is not None and response.status_code == 304:
+        set_validators(response, etag, last_modified)
+    return response
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Bodies are per user: shared caches must not store them and clients revalidate each time.
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+def unchanged_since(versions, started):
+    """False if a version moved after `started`, when the response body may predate it."""
+    if read_from_replica():
+        started -= getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 10)
+    return all(version <= started for version in versions)
+
+def post_validators(post_id, updated_at, author_version, viewer):
+    updated = updated_at.timestamp()
+    return make_etag('post', post_id, updated, author_version, viewer.pk), max(updated, author_version)
+
+def profile_validators(user_id, version, viewer):
+    return make_etag('user', user_id, version, viewer.pk, viewer.is_staff), version
+
+def feed_etag(viewer, page_number, count, rows, versions):
+    """`rows` are the page's (post id, updated_at, author id) tuples; `versions` covers the authors and the viewer."""
+    page = [(pk, updated_at.timestamp(), versions[author_id]) for pk, updated_at, author_id in rows]
+    return make_etag('feed', viewer.pk, versions[viewer.pk], page_number, count, page)
@@ -0,0 +1,95 @@
+"""Read-replica routing with read-your-writes stickiness.
+
+ReplicaRoutingMiddleware opens a RoutingState for each request in a context
+variable. ReplicaRouter sends reads to one of DATABASE_REPLICAS only while the
+state allows it: the request uses a safe method, nothing has been written to
+the primary during the request, no transaction is open on the primary, and the
+authenticated user is not pinned. A user is pinned to the primary for
+DATABASE_REPLICA_PIN_SECONDS after a request of theirs wrote to it, so they
+always read their own likes, comments, follows and posts. Pins are kept in the
+default cache; use a shared cache backend when running several workers.
+Outside a request (management commands, workers) everything uses the primary.
+"""
+import contextvars
+import random
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_CACHE_KEY = 'db:pinned:{}'
+
+_current = contextvars.ContextVar('db_routing', default=None)
+
+class RoutingState:
+    __slots__ = ('read_only', 'user_id', 'pinned', 'wrote', 'replica')
+
+    def __init__(self, read_only):
+        self.read_only = read_only
+        self.user_id = None
+        self.pinned = False
+        self.wrote = False
+        self.replica = None
+
+    def use_replica(self):
+        return self.read_only and not self.pinned and not self.wrote
+
+def start_request(read_only):
+    state = RoutingState(read_only)
+    return state, _current.set(state)
+
+def finish_request(token):
+    _current.reset(token)
+
+def bind_user(user_id):
+    """Record the authenticated user; reads go to the primary from here on if they are pinned."""
+    state = _current.get()
+    if state is None or state.user_id == user_id:
+        return
+    state.user_id = user_id
+    if state.use_replica():
+        state.pinned = bool(cache.get(PIN_CACHE_KEY.format(user_id)))
+
+async def abind_user(user_id):
+    state = _current.get()
+    if state is None or state.user_id == user_id:
+        return
+    state.user_id = user_id
+    if state.use_replica():
+        state.pinned = bool(await cache.aget(PIN_CACHE_KEY.format(user_id)))
+
+def pin_user(user_id):
+    cache.set(PIN_CACHE_KEY.format(user_id), True, getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 10))
+
+async def apin_user(user_id):
+    await cache.aset(PIN_CACHE_KEY.format(user_id), True, getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 10))
+
+def read_from_replica():
+    """Whether the current request has read from a replica, whose rows may lag the primary."""
+    state = _current.get()
+    return state is not None and state.replica is not None
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if state is None or not replicas or not state.use_replica():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            # One replica per request, so a page and its counts come from the same snapshot.
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects loaded from either may be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in getattr(settings, 'DATABASE_REPLICAS', ())
@@ -0,0 +1,79 @@
+"""Leased background jobs: claim, lease renewal and retry with backoff.
+
+Purge jobs (accounts.purge) and announcement fan-out jobs (notifications.fanout)
+share this lifecycle. A worker claims the oldest due job with a conditional
+UPDATE, so only one worker wins each job, and holds it through a lease that
+every committed chunk renews; a job whose worker died is claimed again once its
+lease runs out. A job that raises goes back to pending with the lease as its
+retry delay, doubled after every failed attempt, and fails for good after
+{prefix}_MAX_ATTEMPTS attempts.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .log import get_logger
+
+logger = get_logger('users')
+
+class LeasedJobs:
+    """Claims and runs rows of a job model with status, attempts, lease_expires_at, last_error and updated_at fields.
+
+    Reads the {prefix}_LEASE_SECONDS, {prefix}_MAX_ATTEMPTS and
+    {prefix}_RETRY_BACKOFF settings. Failures are logged as `{event}.failed`
+    with the fields `describe(job)` returns; `progress_fields` are saved with
+    them, for progress the job keeps on the instance between commits.
+    """
+
+    def __init__(self, model, prefix, event, describe, progress_fields=()):
+        self.model = model
+        self.prefix = prefix
+        self.event = event
+        self.describe = describe
+        self.progress_fields = list(progress_fields)
+
+    def setting(self, name, default):
+        return getattr(settings, f'{self.prefix}_{name}', default)
+
+    def lease(self):
+        """Expiry for a lease taken or renewed now."""
+        return timezone.now() + timedelta(seconds=self.setting('LEASE_SECONDS', 300))
+
+    def claim(self):
+        """Take the oldest due job: pending (and past any retry delay), or running under an expired lease."""
+        now = timezone.now()
+        candidates = self.model.objects.filter(
+            Q(status='pending', lease_expires_at__isnull=True) | Q(status__in=['pending', 'running'], lease_expires_at__lt=now))
+        for job in candidates.order_by('created_at', 'id')[:10]:
+            # A conditional UPDATE: only one worker wins each job.
+            claimed = self.model.objects.filter(pk=job.pk, status=job.status, lease_expires_at=job.lease_expires_at).update(
+                status='running', lease_expires_at=self.lease(), attempts=F('attempts') + 1, updated_at=now)
+            if claimed:
+                job.refresh_from_db()
+                return job
+        return None
+
+    def run(self, run_job, limit=None):
+        """Claim jobs and pass each to `run_job` until none is due (or `limit` ran). Returns (done, failed) counts."""
+        max_attempts = self.setting('MAX_ATTEMPTS', 5)
+        backoff = self.setting('RETRY_BACKOFF', 60)
+        done = failed = 0
+        while limit is None or done + failed < limit:
+            job = self.claim()
+            if job is None:
+                break
+            try:
+                run_job(job)
+                done += 1
+            except Exception as e:
+                # Work committed before the failure is kept; the next attempt resumes from it.
+                job.last_error = str(e)
+                if job.attempts >= max_attempts:
+                    job.status, job.lease_expires_at = 'failed', None
+                else:
+                    job.status = 'pending'
+                    job.lease_expires_at = timezone.now() + timedelta(seconds=backoff * 2 ** (job.attempts - 1))
+                job.save(update_fields=['last_error', 'status', *self.progress_fields, 'lease_expires_at', 'updated_at'])
+                failed += 1
+                logger.error(f'{self.event}.failed', job_id=job.id, **self.describe(job), attempt=job.attempts, error=e)
+        return done, failed
@@ -0,0 +1,97 @@
+"""Structured, non-blocking logging.
+
+Views log events as ``logger.info('post.liked', user_id=..., post_id=...)``.
+Nothing is built when the level is disabled; field values may be zero-argument
+callables, which are only called for records that are actually emitted. The
+rendered ``event key=value ...`` line is formatted and written by a
+QueueListener thread, so request threads only pay for an enqueue.
+"""
+import atexit
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+class StructuredEvent:
+    """Log message rendered as ``event key=value ...`` when a handler formats it."""
+    __slots__ = ('event', 'fields')
+
+    def __init__(self, event, fields):
+        self.event = event
+        self.fields = fields
+
+    def resolve(self):
+        for key, value in self.fields.items():
+            if callable(value):
+                self.fields[key] = value()
+
+    def __str__(self):
+        self.resolve()
+        parts = [self.event]
+        for key, value in self.fields.items():
+            text = str(value)
+            parts.append(f'{key}={text!r}' if not text or ' ' in text else f'{key}={text}')
+        return ' '.join(parts)
+
+class EventLogger:
+    """Thin wrapper over a stdlib logger that emits StructuredEvent messages."""
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+
+    def _log(self, level, event, fields):
+        # The level check is the only work done for disabled levels.
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, StructuredEvent(event, fields), extra={'event': event})
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+
+def get_logger(name):
+    return EventLogger(name)
+
+class SamplingFilter(logging.Filter):
+    """Keep only a `rate` fraction of records at or below `max_level`; more severe records always pass."""
+
+    def __init__(self, rate=1.0, max_level='INFO'):
+        super().__init__()
+        self.rate = float(rate)
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+
+    def filter(self, record):
+        return record.levelno > self.max_level or self.rate >= 1.0 or random.random() < self.rate
+
+class BackgroundQueueHandler(QueueHandler):
+    """Enqueue records on the calling thread; a QueueListener thread formats and writes them.
+
+    Lazy fields are resolved before enqueueing so callables run on the thread
+    that logged (and never touch the ORM from the listener thread).
+    """
+
+    def __init__(self, target=None, format=None):
+        super().__init__(queue.SimpleQueue())
+        target = target or logging.StreamHandler()
+        if format:
+            target.setFormatter(logging.Formatter(format))
+        self.listener = QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Flush queued records and stop the listener thread; safe to call more than once."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def prepare(self, record):
+        if isinstance(record.msg, StructuredEvent):
+            record.msg.resolve()
+        return record
@@ -0,0 +1,205 @@
+"""Per-request performance metrics and per-route histograms.
+
+RequestMetricsMiddleware opens a RequestMetrics for each request in a context
+variable; the database execute wrapper (installed on every connection, so
+queries on async worker threads count too), TimedSerializerMixin and the cache
+helpers (via record_cache) add to it. When the response is done the values are
+written to the Server-Timing header and folded into the process-wide registry
+served by metrics_view in the Prometheus text format. Each worker process keeps
+its own registry, so scrape every worker.
+"""
+import contextvars
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'db_time', 'serializer_time', 'render_time',
+                 'render_started', 'cache_hits', 'cache_misses', 'serializer_depth')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.serializer_depth = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'ser;dur={self.serializer_time * 1000:.1f}',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+def finish_request(token):
+    _current.reset(token)
+
+def current_metrics():
+    """The RequestMetrics of the request being handled, or None outside a request."""
+    return _current.get()
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+def install_query_recorder(connection, **kwargs):
+    """Attach record_query to `connection` once; it reports to whichever request is current."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+connection_created.connect(install_query_recorder)
+
+def record_cache(hit):
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+class TimedSerializerMixin:
+    """Adds top-level to_representation time to the current request's serializer time.
+
+    Nested serializers run inside their parent's call and are not counted twice.
+    """
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None or metrics.serializer_depth:
+            return super().to_representation(instance)
+        metrics.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - start
+            metrics.serializer_depth -= 1
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Process-wide histograms and counters keyed by (metric, route)."""
+
+    HISTOGRAMS = {
+        'http_request_duration_seconds': ('Total request time.', DURATION_BUCKETS),
+        'http_request_db_seconds': ('Time spent executing SQL.', DURATION_BUCKETS),
+        'http_request_db_queries': ('SQL statements executed.', QUERY_BUCKETS),
+        'http_request_serializer_seconds': ('Time spent in serializer to_representation.', DURATION_BUCKETS),
+        'http_request_render_seconds': ('Time spent rendering the response body.', DURATION_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._cache = {}
+        self._responses = {}
+
+    def observe(self, route, status, metrics, total):
+        values = {
+            'http_request_duration_seconds': total,
+            'http_request_db_seconds': metrics.db_time,
+            'http_request_db_queries': metrics.queries,
+            'http_request_serializer_seconds': metrics.serializer_time,
+            'http_request_render_seconds': metrics.render_time,
+        }
+        with self._lock:
+            for name, value in values.items():
+                key = (name, route)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(self.HISTOGRAMS[name][1])
+                histogram.observe(value)
+            for result, count in (('hit', metrics.cache_hits), ('miss', metrics.cache_misses)):
+                if count:
+                    self._cache[(route, result)] = self._cache.get((route, result), 0) + count
+            self._responses[(route, status)] = self._responses.get((route, status), 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._cache.clear()
+            self._responses.clear()
+
+    def render(self):
+        """Prometheus text exposition (format 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, (help_text, buckets) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, route), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{route="{route}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{route="{route}"}} {histogram.total}')
+                    lines.append(f'{name}_count{{route="{route}"}} {histogram.count}')
+            lines.append('# HELP http_request_cache_total Cache lookups made while handling requests.')
+            lines.append('# TYPE http_request_cache_total counter')
+            for (route, result), count in sorted(self._cache.items()):
+                lines.append(f'http_request_cache_total{{route="{route}",result="{result}"}} {count}')
+            lines.append('# HELP http_responses_total Responses by route and status code.')
+            lines.append('# TYPE http_responses_total counter')
+            for (route, status), count in sorted(self._responses.items()):
+                lines.append(f'http_responses_total{{route="{route}",status="{status}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+def metrics_view(request):
+    """Serve the registry. Requires `Authorization: Bearer <METRICS_TOKEN>` when the token is set; otherwise DEBUG only."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            raise Http404
+    elif not settings.DEBUG:
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
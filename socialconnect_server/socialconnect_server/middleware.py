@@ -0,0 +1,115 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from . import db_router
+from .metrics import current_metrics, finish_request, install_query_recorder, registry, start_request
+
+class RequestMetricsMiddleware:
+    """Collect SQL, serializer, cache and render timings for each request.
+
+    Adds a Server-Timing header and records the values in the per-route
+    histograms, keyed by the resolved URL name (e.g. `post-list`, `feed`).
+    Place it first in MIDDLEWARE so the total covers the whole stack.
+    Works in both sync and async stacks, so it does not force async views
+    under ASGI onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = start_request()
+        try:
+            # Connections opened before the metrics module was imported miss the
+            # connection_created hook; no database connection is opened here.
+            for connection in connections.all():
+                install_query_recorder(connection)
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self._finish(request, response, metrics)
+
+    def _finish(self, request, response, metrics):
+        total = metrics.elapsed()
+        if getattr(settings, 'SERVER_TIMING', True):
+            response['Server-Timing'] = metrics.server_timing(total)
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match and match.view_name else 'unmatched'
+        registry.observe(route, response.status_code, metrics, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook; the post-render callback closes the interval.
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self._render_done(metrics))
+        return response
+
+    @staticmethod
+    def _render_done(metrics):
+        metrics.render_time += time.perf_counter() - metrics.render_started
+
+class ReplicaRoutingMiddleware:
+    """Let safe-method requests read from DATABASE_REPLICAS (see db_router).
+
+    After a request that wrote to the primary, its user is pinned to the
+    primary for DATABASE_REPLICA_PIN_SECONDS so they read their own writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = db_router.start_request(request.method in ('GET', 'HEAD', 'OPTIONS'))
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.finish_request(token)
+        user_id = self._writer(request, state)
+        if user_id is not None:
+            db_router.pin_user(user_id)
+        return response
+
+    async def __acall__(self, request):
+        state, token = db_router.start_request(request.method in ('GET', 'HEAD', 'OPTIONS'))
+        try:
+            response = await self.get_response(request)
+        finally:
+            db_router.finish_request(token)
+        user_id = self._writer(request, state)
+        if user_id is not None:
+            await db_router.apin_user(user_id)
+        return response
+
+    @staticmethod
+    def _writer(request, state):
+        """The id of the user whose request wrote to the primary, if any."""
+        if not state.wrote:
+            return None
+        # JWT users are bound during authentication; DRF also sets request.user for session users.
+        user = getattr(request, 'user', None)
+        return state.user_id or (user.pk if user is not None and user.is_authenticated else None)
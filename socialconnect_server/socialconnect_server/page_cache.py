@@ -0,0 +1,129 @@
+"""Shared cache of anonymous responses for public post pages and profiles.
+
+Every anonymous visitor gets the same public post list and the same public
+profile, so their serialized bodies are cached for PAGE_CACHE_TIMEOUT seconds
+in the default cache, keyed by host, path and normalised page number. Other
+query parameters are dropped before the body is built, so tracking parameters
+and cache busters neither split nor bypass an entry. Post pages are keyed under the public posts version and profiles
+under the profile version from `conditional`, so post and profile changes
+start new keys rather than deleting old ones.
+
+Rebuilds are single-flight. The request that wins an `add()` lock rebuilds the
+entry; the lock is held for at most PAGE_CACHE_LOCK_TIMEOUT seconds, and its
+value is a token of the winner's own, so a rebuild that outlives its lock does
+not release the lock another request took over after it expired. While a
+rebuild runs, the other requests serve the expired copy for up to
+PAGE_CACHE_STALE_SECONDS more. With no copy to serve, they wait up to
+PAGE_CACHE_LOCK_WAIT seconds for the winner before building one themselves.
+Use a shared cache backend when running several workers.
+"""
+import asyncio
+import hashlib
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.http import QueryDict
+from django.utils.http import urlencode
+from .metrics import record_cache
+
+PAGE_CACHE_KEY = 'page:{}:{}:{}'
+POLL_INTERVAL = 0.05
+
+def _page(request):
+    """The `page` parameter without leading zeros; '' for the first page. Other values are kept as given."""
+    page = request.GET.get('page', '').strip()
+    if page.isdigit():
+        page = str(int(page))
+    return '' if page == '1' else page
+
+def _canonicalise(request):
+    # Pagination links are built from the request URL; keep them the same for every request sharing the key.
+    page = _page(request)
+    query = urlencode({'page': page}) if page else ''
+    request = getattr(request, '_request', request)
+    request.META['QUERY_STRING'] = query
+    request.GET = QueryDict(query)
+
+def _key(scope, version, request):
+    digest = hashlib.md5(f'{request.get_host()}{request.path}?{_page(request)}'.encode(), usedforsecurity=False).hexdigest()
+    return PAGE_CACHE_KEY.format(scope, version, digest)
+
+def _settings():
+    fresh = getattr(settings, 'PAGE_CACHE_TIMEOUT', 30)
+    timeout = fresh + getattr(settings, 'PAGE_CACHE_STALE_SECONDS', 60)
+    return fresh, timeout, getattr(settings, 'PAGE_CACHE_LOCK_TIMEOUT', 10), getattr(settings, 'PAGE_CACHE_LOCK_WAIT', 2.0)
+
+def enabled(request):
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 30) > 0 and not request.user.is_authenticated
+
+def _entry(data, fresh):
+    return {'fresh_until': time.time() + fresh, 'data': data}
+
+def _release(lock, token):
+    # Only the holder releases: past its timeout the lock may belong to another rebuild.
+    if cache.get(lock) == token:
+        cache.delete(lock)
+
+async def _arelease(lock, token):
+    if await cache.aget(lock) == token:
+        await cache.adelete(lock)
+
+def cached_page(request, scope, version, build):
+    """The body `build()` returns for this anonymous request, from the cache when possible.
+
+    `build` returns (status, data); only 200 bodies are cached.
+    """
+    _canonicalise(request)
+    key = _key(scope, version, request)
+    fresh, timeout, lock_timeout, wait = _settings()
+    entry = cache.get(key)
+    record_cache(entry is not None)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return 200, entry['data']
+    lock, token = f'{key}:lock', uuid.uuid4().hex
+    if cache.add(lock, token, lock_timeout):
+        try:
+            status, data = build()
+            if status == 200:
+                cache.set(key, _entry(data, fresh), timeout)
+            return status, data
+        finally:
+            _release(lock, token)
+    if entry is not None:
+        return 200, entry['data']
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return 200, entry['data']
+    return build()
+
+async def acached_page(request, scope, version, build):
+    """cached_page for the async views; `build` is a coroutine function."""
+    _canonicalise(request)
+    key = _key(scope, version, request)
+    fresh, timeout, lock_timeout, wait = _settings()
+    entry = await cache.aget(key)
+    record_cache(entry is not None)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return 200, entry['data']
+    lock, token = f'{key}:lock', uuid.uuid4().hex
+    if await cache.aadd(lock, token, lock_timeout):
+        try:
+            status, data = await build()
+            if status == 200:
+                await cache.aset(key, _entry(data, fresh), timeout)
+            return status, data
+        finally:
+            await _arelease(lock, token)
+    if entry is not None:
+        return 200, entry['data']
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return 200, entry['data']
+    return await build()
@@ -3,6 +3,7 @@ from rest_framework import permissions
 class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # For Post/Comment: obj.author, for others adjust
-        if hasattr(obj, 'author'):
-            return obj.author == request.user or request.user.is_staff
+        if hasattr(obj, 'author_id'):
+            # Compare ids so the check does not load the author row.
+            return obj.author_id == request.user.pk or request.user.is_staff
         return obj == request.user or request.user.is_staff
\ No newline at end of file
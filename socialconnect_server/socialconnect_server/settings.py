@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url
@@ -57,6 +58,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'socialconnect_server.middleware.RequestMetricsMiddleware',
+    'socialconnect_server.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -73,20 +76,36 @@ CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "").split(",")
 FRONTEND_URL = os.getenv("FRONTEND_URL")
 BASE_URL = os.getenv("BASE_URL")
 
-# settings.py
+# Application loggers emit structured events (socialconnect_server.log) through a
+# background queue handler; LOG_INFO_SAMPLE_RATE keeps a fraction of info/debug events.
+# Test runs default to warnings and errors so request events do not fill the output.
+TESTING = sys.argv[1:2] == ['test']
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING' if TESTING else 'INFO')
+APP_LOGGERS = ('users', 'accounts', 'posts', 'interactions', 'notifications', 'admin_panel', 'socialconnect_server')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'sample_info': {
+            '()': 'socialconnect_server.log.SamplingFilter',
+            'rate': float(os.getenv('LOG_INFO_SAMPLE_RATE', '1.0')),
+        },
+    },
     'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
+        'background': {
+            '()': 'socialconnect_server.log.BackgroundQueueHandler',
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
         },
     },
     'loggers': {
-        'posts': {
-            'handlers': ['console'],
-            'level': 'INFO',
-        },
+        name: {
+            'handlers': ['background'],
+            'filters': ['sample_info'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        }
+        for name in APP_LOGGERS
     },
 }
 
@@ -111,7 +130,7 @@ TEMPLATES = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'socialconnect_server.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -126,10 +145,64 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.FilteredTokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'accounts.serializers.FilteredTokenBlacklistSerializer',
 }
 
+# In-memory Bloom filter of blacklisted refresh tokens (see accounts.tokens).
+TOKEN_BLACKLIST_FILTER_CAPACITY = 100000
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = 0.01
+TOKEN_BLACKLIST_FILTER_SYNC_SECONDS = 30
+
 AUTH_USER_MODEL = 'accounts.User'
 
+# Authenticated users are served from the cache for this many seconds (see accounts.cache).
+USER_CACHE_TIMEOUT = 60
+
+# Rows per UPDATE for the admin bulk moderation endpoints.
+ADMIN_BULK_CHUNK_SIZE = 500
+
+# Shared cache of anonymous public post pages and profiles (see socialconnect_server.page_cache); 0 disables it.
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '30'))
+PAGE_CACHE_STALE_SECONDS = 60
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_LOCK_WAIT = 2.0
+
+# Background purge of deleted users and posts (see accounts.purge and `purge_deleted`).
+PURGE_CHUNK_SIZE = 1000
+PURGE_LEASE_SECONDS = 300
+PURGE_MAX_ATTEMPTS = 5
+PURGE_RETRY_BACKOFF = 60  # seconds, doubled after every failed attempt
+
+# Background announcement fan-out (see notifications.fanout and `fanout_announcements`).
+FANOUT_CHUNK_SIZE = 1000
+FANOUT_ROWS_PER_SECOND = 5000  # per worker; 0 disables the limit
+FANOUT_LEASE_SECONDS = 300
+FANOUT_MAX_ATTEMPTS = 5
+FANOUT_RETRY_BACKOFF = 60  # seconds, doubled after every failed attempt
+
+# Budget for a new worker's time to first request, checked by `benchmark_startup`.
+STARTUP_BUDGET_MS = 1500
+
+# User autocomplete (see accounts.search).
+AUTOCOMPLETE_MAX_RESULTS = 20
+AUTOCOMPLETE_TIMEOUT_MS = 200  # PostgreSQL statement_timeout per autocomplete query; 0 disables it
+AUTOCOMPLETE_TIMEOUT_CACHE_SECONDS = 10  # a prefix whose lookup overran answers [] this long
+AUTOCOMPLETE_CACHE_MAX_LENGTH = 3  # prefixes up to this many characters are cached in-process
+AUTOCOMPLETE_CACHE_SIZE = 1024
+AUTOCOMPLETE_CACHE_SECONDS = 60
+
+# In-memory follow graph used for suggestions (see interactions.graph).
+FOLLOW_GRAPH_REBUILD_SECONDS = 600
+FOLLOW_GRAPH_MAX_DELTA = 50000
+SUGGESTIONS_CACHE_TIMEOUT = 300
+
+# Maximum user ids per /api/users/relationships/ lookup.
+RELATIONSHIP_LOOKUP_MAX = 100
+
+# Repeated logins within this many seconds (on the same day) do not rewrite last_login.
+LAST_LOGIN_UPDATE_INTERVAL = 300
+
 
 WSGI_APPLICATION = 'socialconnect_server.wsgi.application'
 
@@ -146,10 +219,45 @@ DATABASES = {
     }
 }
 
+# DB_ENGINE=sqlite runs against a local SQLite file instead (DB_NAME, default db.sqlite3),
+# e.g. for generate_dataset and benchmark_workload without a Postgres server.
+if os.getenv("DB_ENGINE", "postgresql") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("DB_NAME") or BASE_DIR / "db.sqlite3",
+            "OPTIONS": {"timeout": 20},  # seconds to wait for the write lock under concurrent load
+        }
+    }
+
+# Read replicas: DB_REPLICAS is a comma-separated list of hosts with the primary's credentials
+# (with DB_ENGINE=sqlite, of database files; e.g. DB_REPLICAS=db.sqlite3 adds a second alias on
+# the same file for local testing). Safe-method requests read from them (see db_router).
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv("DB_REPLICAS", "").split(","))):
+    key = "NAME" if DATABASES["default"]["ENGINE"].endswith("sqlite3") else "HOST"
+    alias = f"replica_{index}"
+    DATABASES[alias] = {**DATABASES["default"], key: replica.strip(), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['socialconnect_server.db_router.ReplicaRouter']
+
+# After a request writes to the primary, its user reads from the primary for this many seconds.
+DATABASE_REPLICA_PIN_SECONDS = 10
+
+# Use a shared backend (e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache,
+# CACHE_LOCATION=redis://...) when running several workers so invalidations reach all of them.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'socialconnect'),
+    }
+}
+
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -157,6 +265,25 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD') 
 DEFAULT_FROM_EMAIL=os.getenv('EMAIL_HOST_USER')
 
+# Email outbox: mail is queued in the database and delivered by `manage.py send_queued_emails`.
+# EMAIL_OUTBOX_EAGER drains the outbox on commit instead (useful with the locmem backend in tests).
+EMAIL_OUTBOX_EAGER = os.getenv('EMAIL_OUTBOX_EAGER', 'False') == 'True'
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BACKOFF = 60  # seconds, doubled after every failed attempt
+EMAIL_OUTBOX_LEASE_SECONDS = 300  # a claimed email is claimed again after this if its worker died
+
+# Request metrics: Server-Timing headers on every response and per-route histograms at /metrics.
+# Scrapes must send `Authorization: Bearer $METRICS_TOKEN`; without a token the endpoint is DEBUG-only.
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Serve GET on the feed, post list/detail, notification list and profiles from async views
+# (socialconnect_server.async_views). asgi.py turns this on; WSGI keeps the DRF views.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+# Let async views run independent queries at the same time on separate connections.
+ASYNC_CONCURRENT_QUERIES = True
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
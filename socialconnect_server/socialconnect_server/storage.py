@@ -0,0 +1,13 @@
+"""Supabase Storage access for avatar and post image uploads.
+
+The supabase package pulls in gotrue, postgrest, realtime, storage3 and httpx,
+roughly 0.3 s of imports. Uploads are rare, so it is imported on the first call
+to `bucket()` rather than when the serializers load. Workers, management
+commands and test runs that never upload never pay for it.
+"""
+from django.conf import settings
+
+def bucket(name):
+    """The storage bucket `name` (`upload()`, `get_public_url()`) on a new Supabase client."""
+    from supabase import create_client  # type: ignore  # deferred: see module docstring
+    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY).storage.from_(name)
@@ -0,0 +1,102 @@
+"""Shared fixtures for the apps' test modules."""
+from django.contrib.auth.tokens import default_token_generator
+from django.test import TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import PurgeJob, User
+from accounts.purge import delete_post
+from interactions.models import Comment, Follow, Like
+from notifications.fanout import queue_fanout
+from notifications.models import Notification
+from posts.models import Post
+
+PASSWORD = 'Budget-pass-123'
+
+class FixtureGraph:
+    """A viewer with followers, followees, posts, likes, comments and notifications in every privacy mode."""
+
+    def __init__(self):
+        self.rows = 0
+        self.viewer = self.user('viewer')
+        self.admin = self.user('admin', is_staff=True, is_superuser=True)
+        self.author = self.user('author')
+        self.fo_author = self.user('fo_author', privacy='followers_only')
+        self.private = self.user('private', privacy='private')
+        self.stranger = self.user('stranger')
+        self.pending = self.user('pending', is_active=False)
+        for followed in (self.author, self.fo_author):
+            Follow.objects.create(follower=self.viewer, following=followed)
+        self.viewer_post = Post.objects.create(author=self.viewer, content='viewer post')
+        self.author_post = Post.objects.create(author=self.author, content='author post')
+        self.stranger_post = Post.objects.create(author=self.stranger, content='stranger post')
+        self.spare_post = Post.objects.create(author=self.viewer, content='spare post')
+        self.like(self.viewer, self.author_post)
+        self.comment = self.add_comment(self.viewer, self.author_post)
+
+    def user(self, username, **fields):
+        fields.setdefault('is_active', True)
+        return User.objects.create_user(username=username, email=f'{username}@example.com', password=PASSWORD, **fields)
+
+    def like(self, user, post):
+        Like.objects.create(user=user, post=post)
+        Post.objects.filter(pk=post.pk).update(like_count=post.like_set.count())
+
+    def add_comment(self, user, post):
+        comment = Comment.objects.create(author=user, post=post, content=f'comment by {user.username}')
+        Post.objects.filter(pk=post.pk).update(comment_count=post.comments.count())
+        return comment
+
+    def grow(self, rows):
+        """Add `rows` users who follow and are followed by the viewer, post, like and comment."""
+        for _ in range(rows):
+            self.rows += 1
+            member = self.user(f'member{self.rows}', privacy='followers_only' if self.rows % 3 == 0 else 'public')
+            Follow.objects.create(follower=member, following=self.viewer)
+            Follow.objects.create(follower=self.viewer, following=member)
+            Follow.objects.create(follower=member, following=self.author)
+            Follow.objects.create(follower=member, following=self.stranger)
+            Post.objects.create(author=member, content=f'post {self.rows}')
+            self.like(member, self.viewer_post)
+            self.like(member, self.author_post)
+            self.add_comment(member, self.author_post)
+            self.add_comment(member, self.viewer_post)
+
+    def client(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def refresh_token(self):
+        return str(RefreshToken.for_user(self.viewer))
+
+    def uid_token(self, user):
+        return urlsafe_base64_encode(force_bytes(user.pk)), default_token_generator.make_token(user)
+
+    def member_ids(self):
+        return ','.join(str(pk) for pk in User.objects.filter(username__startswith='member').values_list('pk', flat=True)[:100])
+
+    def own_notification(self):
+        return Notification.objects.filter(recipient=self.viewer).first()
+
+    def announcement(self):
+        post = Post.objects.create(author=self.viewer, content='announcement', category='announcement')
+        queue_fanout(post)
+        return post
+
+    def purge_job(self):
+        delete_post(self.spare_post, requested_by=self.viewer)
+        return PurgeJob.objects.get(target='post', object_id=self.spare_post.pk)
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class GraphTestCase(TestCase):
+    """A TestCase with a FixtureGraph grown by `rows` members in `self.graph`."""
+
+    rows = 3
+
+    def setUp(self):
+        self.graph = FixtureGraph()
+        if self.rows:
+            self.graph.grow(self.rows)
@@ -0,0 +1,498 @@
+"""Query budgets for every API route.
+
+ROUTES gives each URL pattern in socialconnect_server.urls a request to send and
+the most SQL statements it may run. List routes are measured on a small fixture
+graph and again after it has grown past a full page, and must run the same
+number of statements both times, so per-row queries (N+1s) fail here even when
+they fit the budget on small data. When a budget is exceeded the failure lists
+the statements that ran more than once.
+
+ReplicaRoutingTests covers which database alias reads are routed to, and
+AsyncReadViewTests checks the async read views against the DRF views they mirror.
+Behaviour tests of each app live in its own tests.py, on the FixtureGraph from
+socialconnect_server.testing.
+"""
+import json
+import re
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from collections import Counter, namedtuple
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import URLResolver, get_resolver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.management.commands.benchmark_startup import run_child
+from accounts.models import PurgeJob
+from accounts.purge import jobs as purge_jobs
+from accounts.tokens import blacklist_filter
+from interactions.graph import follow_graph
+from posts.models import Post
+from accounts.views import AsyncUserDetailView
+from notifications.views import AsyncNotificationListView
+from posts.views import AsyncFeedView, AsyncPostDetailView, AsyncPostListView
+from . import page_cache
+from .conditional import public_posts_version
+from .db_router import ReplicaRouter, bind_user
+from .middleware import ReplicaRoutingMiddleware
+from .testing import PASSWORD, GraphTestCase
+
+# `path` and `data` are called with the FixtureGraph; `user` names one of its users (None for anonymous).
+Route = namedtuple('Route', 'name method path budget status data user scaled', defaults=(None, 'viewer', False))
+
+ROUTES = [
+    Route('api-root', 'get', lambda g: '/api/', 1, 200),
+    Route('metrics', 'get', lambda g: '/metrics', 0, 200, user=None),
+    Route('register', 'post', lambda g: '/api/auth/register/', 7, 201, user=None,
+          data=lambda g: {'username': 'newcomer', 'email': 'newcomer@example.com', 'password': PASSWORD}),
+    Route('login', 'post', lambda g: '/api/auth/login/', 7, 200, user=None,
+          data=lambda g: {'username': 'viewer', 'password': PASSWORD}),
+    Route('token_refresh', 'post', lambda g: '/api/auth/token/refresh/', 7, 200, user=None,
+          data=lambda g: {'refresh': g.refresh_token()}),
+    Route('logout', 'post', lambda g: '/api/auth/logout/', 5, 200, user=None,
+          data=lambda g: {'refresh': g.refresh_token()}),
+    Route('password_reset', 'post', lambda g: '/api/auth/password-reset/', 2, 200, user=None,
+          data=lambda g: {'email': 'viewer@example.com'}),
+    Route('password_reset_confirm', 'post', lambda g: '/api/auth/password-reset-confirm/', 2, 200, user=None,
+          data=lambda g: dict(zip(('uid', 'token'), g.uid_token(g.viewer)), password='Another-pass-456')),
+    Route('change_password', 'post', lambda g: '/api/auth/change-password/', 2, 200,
+          data=lambda g: {'old_password': PASSWORD, 'new_password': 'Another-pass-456'}),
+    Route('verify-email', 'get', lambda g: '/api/verify/{}/{}/'.format(*g.uid_token(g.pending)), 2, 302, user=None),
+    Route('feed', 'get', lambda g: '/api/feed/', 3, 200, scaled=True),
+    Route('admin_stats', 'get', lambda g: '/api/admin/stats/', 2, 200, user='admin'),
+    Route('admin_stats_daily', 'get', lambda g: '/api/admin/stats/daily/', 2, 200, user='admin'),
+    Route('user-list', 'get', lambda g: '/api/users/', 3, 200, scaled=True),
+    Route('user-relationships', 'get', lambda g: f'/api/users/relationships/?ids={g.member_ids()}', 2, 200, scaled=True),
+    Route('user-suggestions', 'get', lambda g: '/api/users/suggestions/', 3, 200, scaled=True),
+    Route('user-autocomplete', 'get', lambda g: '/api/users/autocomplete/?q=member', 4, 200),
+    Route('user-detail', 'get', lambda g: f'/api/users/{g.author.pk}/', 2, 200),
+    Route('user-detail', 'get', lambda g: '/api/users/me/', 2, 200),
+    Route('user-detail', 'patch', lambda g: '/api/users/me/', 3, 200, data=lambda g: {'bio': 'Updated bio'}),
+    Route('user-detail', 'delete', lambda g: '/api/users/me/', 7, 204),
+    Route('user-detail', 'delete', lambda g: f'/api/users/{g.author.pk}/', 2, 403),
+    Route('user-follow', 'post', lambda g: f'/api/users/{g.stranger.pk}/follow/', 8, 200),
+    Route('user-unfollow', 'delete', lambda g: f'/api/users/{g.author.pk}/unfollow/', 5, 200),
+    Route('user-followers', 'get', lambda g: f'/api/users/{g.viewer.pk}/followers/', 3, 200, scaled=True),
+    Route('user-followers', 'get', lambda g: f'/api/users/{g.viewer.pk}/followers/?with_relationship=1', 4, 200, scaled=True),
+    Route('user-following', 'get', lambda g: f'/api/users/{g.viewer.pk}/following/', 3, 200, scaled=True),
+    Route('user-following', 'get', lambda g: f'/api/users/{g.viewer.pk}/following/?ids_only=1', 2, 200, scaled=True),
+    Route('user-export', 'get', lambda g: '/api/users/me/export/', 1, 200),
+    Route('user-export', 'get', lambda g: f'/api/users/{g.author.pk}/export/', 2, 403),
+    Route('post-list', 'get', lambda g: '/api/posts/', 3, 200, scaled=True),
+    Route('post-list', 'get', lambda g: '/api/posts/', 2, 200, user=None, scaled=True),
+    Route('post-list', 'post', lambda g: '/api/posts/', 7, 201, data=lambda g: {'content': 'New post', 'category': 'general'}),
+    Route('post-list', 'post', lambda g: '/api/posts/', 9, 201, data=lambda g: {'content': 'News', 'category': 'announcement'}),
+    Route('post-detail', 'get', lambda g: f'/api/posts/{g.author_post.pk}/', 2, 200),
+    Route('post-detail', 'patch', lambda g: f'/api/posts/{g.viewer_post.pk}/', 3, 200, data=lambda g: {'content': 'Edited'}),
+    Route('post-detail', 'delete', lambda g: f'/api/posts/{g.spare_post.pk}/', 7, 204),
+    Route('post-comments', 'get', lambda g: f'/api/posts/{g.author_post.pk}/comments/', 3, 200, scaled=True),
+    Route('post-comments', 'post', lambda g: f'/api/posts/{g.author_post.pk}/comments/', 10, 201, data=lambda g: {'content': 'Nice'}),
+    Route('post-like', 'post', lambda g: f'/api/posts/{g.stranger_post.pk}/like/', 10, 200),
+    Route('post-unlike', 'delete', lambda g: f'/api/posts/{g.author_post.pk}/unlike/', 5, 200),
+    Route('post-fanout', 'get', lambda g: f'/api/posts/{g.announcement().pk}/fanout/', 3, 200),
+    Route('post-fanout', 'get', lambda g: f'/api/posts/{g.announcement().pk}/fanout/', 2, 403, user='stranger'),
+    Route('post-like-status', 'get', lambda g: f'/api/posts/{g.author_post.pk}/like-status/', 3, 200),
+    Route('comment-list', 'get', lambda g: '/api/comments/', 1, 405),
+    Route('comment-detail', 'delete', lambda g: f'/api/comments/{g.comment.pk}/', 5, 204),
+    Route('notification-list', 'get', lambda g: '/api/notifications/', 3, 200, scaled=True),
+    Route('notification-detail', 'get', lambda g: f'/api/notifications/{g.own_notification().pk}/', 2, 200),
+    Route('notification-mark-read', 'post', lambda g: f'/api/notifications/{g.own_notification().pk}/read/', 3, 200),
+    Route('notification-mark-all-read', 'post', lambda g: '/api/notifications/mark-all-read/', 5, 200),
+    Route('notification-bulk-read', 'post', lambda g: '/api/notifications/bulk-read/', 2, 200,
+          data=lambda g: {'ids': [g.own_notification().pk]}),
+    Route('notification-bulk-read', 'post', lambda g: '/api/notifications/bulk-read/', 5, 200,
+          data=lambda g: {'up_to_id': g.own_notification().pk}),
+    Route('admin-user-list', 'get', lambda g: '/api/admin/users/', 3, 200, user='admin', scaled=True),
+    Route('admin-user-detail', 'get', lambda g: f'/api/admin/users/{g.author.pk}/', 2, 200, user='admin'),
+    Route('admin-user-activate', 'post', lambda g: f'/api/admin/users/{g.pending.pk}/activate/', 3, 200, user='admin'),
+    Route('admin-user-deactivate', 'post', lambda g: f'/api/admin/users/{g.stranger.pk}/deactivate/', 3, 200, user='admin'),
+    Route('admin-user-bulk-activate', 'post', lambda g: '/api/admin/users/bulk-activate/', 4, 200, user='admin',
+          data=lambda g: {'filter': {'username__startswith': 'member'}}, scaled=True),
+    Route('admin-user-bulk-deactivate', 'post', lambda g: '/api/admin/users/bulk-deactivate/', 7, 200, user='admin',
+          data=lambda g: {'filter': {'username__startswith': 'member'}}, scaled=True),
+    Route('admin-post-list', 'get', lambda g: '/api/admin/posts/', 3, 200, user='admin', scaled=True),
+    Route('admin-post-detail', 'get', lambda g: f'/api/admin/posts/{g.author_post.pk}/', 2, 200, user='admin'),
+    Route('admin-post-detail', 'delete', lambda g: f'/api/admin/posts/{g.spare_post.pk}/', 7, 204, user='admin'),
+    Route('admin-purge-job-list', 'get', lambda g: '/api/admin/purge-jobs/', 3, 200, user='admin'),
+    Route('admin-purge-job-detail', 'get', lambda g: f'/api/admin/purge-jobs/{g.purge_job().pk}/', 2, 200, user='admin'),
+    Route('admin-post-bulk-delete', 'post', lambda g: '/api/admin/posts/bulk-delete/', 9, 200, user='admin',
+          data=lambda g: {'filter': {'content__icontains': 'post'}}, scaled=True),
+]
+
+# Namespaces outside the API (the Django admin site) are not budgeted.
+UNBUDGETED_NAMESPACES = {'admin'}
+
+def route_names(patterns=None):
+    for pattern in patterns if patterns is not None else get_resolver().url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace not in UNBUDGETED_NAMESPACES:
+                yield from route_names(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name
+
+def normalise(sql):
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'IN \((\?(, )?)+\)', 'IN (...)', sql)
+
+def report(route, label, captured):
+    statements = [query['sql'] for query in captured.captured_queries]
+    repeated = [(count, sql) for sql, count in Counter(map(normalise, statements)).most_common() if count > 1]
+    lines = [f'{route.method.upper()} {label} ({route.name}) ran {len(statements)} queries; budget is {route.budget}.']
+    if repeated:
+        lines.append('Repeated statements:')
+        lines.extend(f'  {count}x {sql}' for count, sql in repeated)
+    lines.append('All statements:')
+    lines.extend(f'  {index}. {sql}' for index, sql in enumerate(statements, 1))
+    return '\n'.join(lines)
+
+@override_settings(
+    METRICS_TOKEN=None,
+    DEBUG=True,
+)
+class QueryBudgetTests(GraphTestCase):
+    def setUp(self):
+        super().setUp()
+        # Warm the process-wide indexes so a lazy first build does not count against one route.
+        follow_graph.build()
+        blacklist_filter.rebuild()
+
+    def measure(self, route):
+        """Send the route's request with a cold cache and return (captured queries, path)."""
+        graph = self.graph
+        client = graph.client(getattr(graph, route.user) if route.user else None)
+        path = route.path(graph)
+        data = route.data(graph) if route.data else None
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(client, route.method)(path, data, format='json')
+        self.assertEqual(response.status_code, route.status, f'{route.method.upper()} {path}: {getattr(response, "data", response)}')
+        return captured, path
+
+    def assertWithinBudget(self, route, captured, path):
+        if len(captured) > route.budget:
+            self.fail(report(route, path, captured))
+
+    def test_every_route_has_a_budget(self):
+        budgeted = {route.name for route in ROUTES}
+        missing = sorted(set(route_names()) - budgeted)
+        self.assertEqual(missing, [], f'Routes without a query budget: {", ".join(missing)}')
+
+    def test_routes_within_budget(self):
+        for route in ROUTES:
+            with self.subTest(route=route.name, method=route.method):
+                with transaction.atomic():
+                    captured, path = self.measure(route)
+                    transaction.set_rollback(True)
+                self.assertWithinBudget(route, captured, path)
+
+    def test_list_routes_do_not_grow_with_rows(self):
+        scaled = [route for route in ROUTES if route.scaled]
+        small = {}
+        for index, route in enumerate(scaled):
+            with transaction.atomic():
+                small[index] = self.measure(route)
+                transaction.set_rollback(True)
+        # Past a full page (20) for every list.
+        self.graph.grow(22)
+        for index, route in enumerate(scaled):
+            with self.subTest(route=route.name, method=route.method):
+                with transaction.atomic():
+                    captured, path = self.measure(route)
+                    transaction.set_rollback(True)
+                self.assertWithinBudget(route, captured, path)
+                small_captured, _ = small[index]
+                if len(captured) != len(small_captured):
+                    self.fail(f'Query count grew from {len(small_captured)} to {len(captured)} with more rows.\n'
+                              + report(route, path, captured))
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def route(self, method, user_id=None, write=False):
+        """Send a request through ReplicaRoutingMiddleware and return the alias a read inside it used."""
+        router = ReplicaRouter()
+
+        def view(request):
+            if user_id is not None:
+                bind_user(user_id)
+            if write:
+                router.db_for_write(Post)
+            return HttpResponse(router.db_for_read(Post))
+
+        request = getattr(RequestFactory(), method)('/api/feed/')
+        return ReplicaRoutingMiddleware(view)(request).content.decode()
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.route('get'), 'replica_0')
+        self.assertEqual(self.route('get', user_id=1), 'replica_0')
+
+    def test_unsafe_requests_read_from_primary(self):
+        self.assertEqual(self.route('post', user_id=1), 'default')
+
+    def test_reads_after_a_write_in_the_same_request_use_primary(self):
+        self.assertEqual(self.route('get', user_id=1, write=True), 'default')
+
+    def test_writer_is_pinned_to_primary(self):
+        self.route('post', user_id=1, write=True)
+        self.assertEqual(self.route('get', user_id=1), 'default')
+        self.assertEqual(self.route('get', user_id=2), 'replica_0')
+
+    @override_settings(DATABASE_REPLICA_PIN_SECONDS=0)
+    def test_pin_expires(self):
+        self.route('post', user_id=1, write=True)
+        self.assertEqual(self.route('get', user_id=1), 'replica_0')
+
+    def test_outside_a_request_reads_use_primary(self):
+        self.assertEqual(ReplicaRouter().db_for_read(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_reads_use_primary(self):
+        self.assertEqual(self.route('get', user_id=1), 'default')
+
+@override_settings(ASYNC_CONCURRENT_QUERIES=False)
+class AsyncReadViewTests(GraphTestCase):
+    # Past a full page, so next/previous links are exercised.
+    rows = 22
+
+    def compare(self, view, path, user, **kwargs):
+        """GET `path` from the DRF view (as routed) and from the async view; both must answer the same."""
+        graph = self.graph
+        cache.clear()
+        with CaptureQueriesContext(connection) as sync_queries:
+            expected = graph.client(user).get(path)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'} if user else {}
+        request = RequestFactory().get(path, **headers)
+        cache.clear()
+        with CaptureQueriesContext(connection) as async_queries:
+            response = async_to_sync(view.as_view())(request, **kwargs)
+        self.assertEqual(response.status_code, expected.status_code, path)
+        self.assertEqual(json.loads(response.content), expected.json(), path)
+        if expected.status_code == 200:
+            # Out-of-range pages may cost the async view its speculative page query.
+            self.assertLessEqual(len(async_queries), len(sync_queries), path)
+
+    def test_feed(self):
+        self.compare(AsyncFeedView, '/api/feed/', self.graph.viewer)
+        self.compare(AsyncFeedView, '/api/feed/?page=2', self.graph.viewer)
+        self.compare(AsyncFeedView, '/api/feed/?page=9', self.graph.viewer)
+        self.compare(AsyncFeedView, '/api/feed/', None)
+
+    def test_post_list(self):
+        self.compare(AsyncPostListView, '/api/posts/', self.graph.viewer)
+        self.compare(AsyncPostListView, '/api/posts/?page=2', None)
+
+    def test_post_detail(self):
+        graph = self.graph
+        self.compare(AsyncPostDetailView, f'/api/posts/{graph.author_post.pk}/', graph.viewer, pk=graph.author_post.pk)
+        self.compare(AsyncPostDetailView, f'/api/posts/{graph.author_post.pk}/', None, pk=graph.author_post.pk)
+        self.compare(AsyncPostDetailView, '/api/posts/999999/', graph.viewer, pk=999999)
+
+    def test_notification_list(self):
+        self.compare(AsyncNotificationListView, '/api/notifications/', self.graph.viewer)
+        self.compare(AsyncNotificationListView, '/api/notifications/?page=2', self.graph.viewer)
+        self.compare(AsyncNotificationListView, '/api/notifications/', None)
+
+    def test_user_detail(self):
+        graph = self.graph
+        self.compare(AsyncUserDetailView, '/api/users/me/', graph.viewer, pk='me')
+        for user in (graph.author, graph.fo_author, graph.private, graph.pending):
+            self.compare(AsyncUserDetailView, f'/api/users/{user.pk}/', graph.viewer, pk=str(user.pk))
+        self.compare(AsyncUserDetailView, f'/api/users/{graph.fo_author.pk}/', graph.stranger, pk=str(graph.fo_author.pk))
+        self.compare(AsyncUserDetailView, f'/api/users/{graph.pending.pk}/', graph.admin, pk=str(graph.pending.pk))
+
+@override_settings(ASYNC_CONCURRENT_QUERIES=False)
+class ConditionalGetTests(GraphTestCase):
+    rows = 0
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def validate(self, path, user):
+        """GET `path` as `user` until it carries an ETag; return the client and the tag."""
+        client = self.graph.client(user)
+        response = client.get(path)
+        if 'ETag' not in response:
+            # Versions restarted by cache.clear() postdate the first body.
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        self.assertIn('private', response['Cache-Control'])
+        return client, response['ETag']
+
+    def assertStatus(self, client, path, etag, expected):
+        response = client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, expected, path)
+        if expected == 304:
+            self.assertEqual(response['ETag'], etag)
+
+    def write(self, client, method, path, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertLess(getattr(client, method)(path, data).status_code, 300, path)
+
+    def test_post_detail(self):
+        graph = self.graph
+        path = f'/api/posts/{graph.stranger_post.pk}/'
+        client, etag = self.validate(path, graph.viewer)
+        self.assertStatus(client, path, etag, 304)
+        self.assertStatus(graph.client(graph.author), path, etag, 200)
+        self.write(client, 'post', f'{path}like/')
+        self.assertStatus(client, path, etag, 200)
+        client, etag = self.validate(path, graph.viewer)
+        # A follow changes the author's counts embedded in the post.
+        self.write(graph.client(graph.author), 'post', f'/api/users/{graph.stranger.pk}/follow/')
+        self.assertStatus(client, path, etag, 200)
+
+    def test_profile_revalidates_without_queries(self):
+        graph = self.graph
+        path = f'/api/users/{graph.author.pk}/'
+        client, etag = self.validate(path, graph.viewer)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertStatus(client, path, etag, 304)
+        self.assertEqual(len(queries), 0)
+        self.write(graph.client(graph.author), 'patch', '/api/users/me/', bio='new bio')
+        self.assertStatus(client, path, etag, 200)
+        client, etag = self.validate(path, graph.viewer)
+        self.write(graph.client(graph.stranger), 'post', f'{path}follow/')
+        self.assertStatus(client, path, etag, 200)
+
+    def test_feed(self):
+        graph = self.graph
+        client, etag = self.validate('/api/feed/', graph.viewer)
+        self.assertStatus(client, '/api/feed/', etag, 304)
+        self.write(graph.client(graph.author), 'post', '/api/posts/', content='fresh post')
+        self.assertStatus(client, '/api/feed/', etag, 200)
+        client, etag = self.validate('/api/feed/', graph.viewer)
+        self.write(client, 'post', f'/api/users/{graph.stranger.pk}/follow/')
+        self.assertStatus(client, '/api/feed/', etag, 200)
+
+    def test_async_views_share_validators(self):
+        graph = self.graph
+        cases = [
+            (AsyncFeedView, '/api/feed/', {}),
+            (AsyncPostDetailView, f'/api/posts/{graph.author_post.pk}/', {'pk': graph.author_post.pk}),
+            (AsyncUserDetailView, f'/api/users/{graph.author.pk}/', {'pk': str(graph.author.pk)}),
+        ]
+        token = f'Bearer {RefreshToken.for_user(graph.viewer).access_token}'
+        for view, path, kwargs in cases:
+            _, etag = self.validate(path, graph.viewer)
+            request = RequestFactory().get(path, HTTP_AUTHORIZATION=token, HTTP_IF_NONE_MATCH=etag)
+            response = async_to_sync(view.as_view())(request, **kwargs)
+            self.assertEqual(response.status_code, 304, path)
+
+@override_settings(PAGE_CACHE_LOCK_WAIT=0.1)
+class AnonymousPageCacheTests(GraphTestCase):
+    rows = 0
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def get(self, path, client=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = (client or APIClient()).get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return response.json(), len(queries)
+
+    def test_public_post_pages_are_shared_until_posts_change(self):
+        first, _ = self.get('/api/posts/')
+        self.assertEqual(self.get('/api/posts/'), (first, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.graph.client(self.graph.author).post('/api/posts/', {'content': 'fresh'})
+        data, queries = self.get('/api/posts/')
+        self.assertEqual(data['count'], first['count'] + 1)
+        self.assertGreater(queries, 0)
+        # Signed-in viewers are never served from the shared cache.
+        self.assertGreater(self.get('/api/posts/', self.graph.client(self.graph.viewer))[1], 0)
+
+    def test_counter_saves_keep_post_pages_and_edits_start_new_ones(self):
+        first, _ = self.get('/api/posts/')
+        author = self.graph.client(self.graph.author)
+        post_id = self.graph.author_post.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.graph.client(self.graph.stranger).post(f'/api/posts/{post_id}/like/').data['detail'], 'Liked.')
+        self.assertEqual(self.get('/api/posts/'), (first, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(author.patch(f'/api/posts/{post_id}/', {'content': 'edited'}).status_code, 200)
+        data, _ = self.get('/api/posts/')
+        self.assertEqual(next(post['content'] for post in data['results'] if post['id'] == post_id), 'edited')
+        with self.captureOnCommitCallbacks(execute=True):
+            author.delete(f'/api/posts/{post_id}/')
+        data, _ = self.get('/api/posts/')
+        self.assertEqual(data['count'], first['count'] - 1)
+
+    def test_public_profiles_are_shared_until_the_profile_changes(self):
+        path = f'/api/users/{self.graph.author.pk}/'
+        first, _ = self.get(path)
+        self.assertEqual(self.get(path), (first, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.graph.client(self.graph.stranger).post(f'{path}follow/')
+        data, _ = self.get(path)
+        self.assertEqual(data['followers_count'], first['followers_count'] + 1)
+
+    def test_one_rebuild_at_a_time(self):
+        first, _ = self.get('/api/posts/')
+        key = page_cache._key('posts', public_posts_version(), RequestFactory().get('/api/posts/'))
+        entry = cache.get(key)
+        cache.set(key, {**entry, 'fresh_until': 0})
+        # Another request holds the rebuild lock: expired copies are served as they are.
+        cache.add(f'{key}:lock', 1)
+        self.assertEqual(self.get('/api/posts/'), (first, 0))
+        # With nothing to serve, requests wait for the rebuild, then build it themselves.
+        cache.delete(key)
+        self.assertGreater(self.get('/api/posts/')[1], 0)
+        self.assertIsNone(cache.get(key))
+
+    def test_rebuild_keeps_a_lock_taken_over_after_its_own_expired(self):
+        request = RequestFactory().get('/api/posts/')
+        lock = f"{page_cache._key('posts', public_posts_version(), request)}:lock"
+
+        def build():
+            # The lock timed out mid-rebuild and another request won it.
+            cache.set(lock, 'other')
+            return 200, {}
+
+        page_cache.cached_page(request, 'posts', public_posts_version(), build)
+        self.assertEqual(cache.get(lock), 'other')
+
+    def test_pages_are_keyed_on_the_page_number_alone(self):
+        self.graph.grow(30)
+        second, _ = self.get('/api/posts/?page=2&utm_source=mail')
+        self.assertEqual(second['previous'], 'http://testserver/api/posts/')
+        self.assertEqual(self.get('/api/posts/?page=02&_=1712'), (second, 0))
+        first, _ = self.get('/api/posts/?page=1&ref=x')
+        self.assertEqual(first['next'], 'http://testserver/api/posts/?page=2')
+        self.assertEqual(self.get('/api/posts/'), (first, 0))
+
+
+@override_settings(PURGE_MAX_ATTEMPTS=2)
+class LeasedJobsTests(GraphTestCase):
+    rows = 0
+
+    def crash(self, job):
+        raise RuntimeError('boom')
+
+    def test_expired_lease_is_reclaimed_and_attempts_run_out(self):
+        job = self.graph.purge_job()
+        self.assertEqual(purge_jobs.claim().pk, job.pk)
+        # Held under a live lease: no other worker can take it.
+        self.assertIsNone(purge_jobs.claim())
+        PurgeJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(purge_jobs.run(self.crash), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), ('failed', 2, 'boom'))
+        self.assertEqual(purge_jobs.run(self.crash), (0, 0))
+
+class StartupTests(SimpleTestCase):
+    def test_upload_client_is_not_imported_at_startup(self):
+        # A fresh interpreter, as a new worker: set up Django, load the URLconf, serve one request.
+        result, _ = run_child('/api/')
+        self.assertFalse(result['status'].startswith('5'), result['status'])
+        self.assertNotIn('supabase', result['modules'])
+        self.assertIn('accounts.serializers', result['modules'])
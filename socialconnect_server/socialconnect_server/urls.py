@@ -14,17 +14,19 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView, TokenBlacklistView
 
 from accounts.views import RegisterView, LoginView, PasswordResetView, PasswordResetConfirmView, ChangePasswordView, VerifyEmailView
-from accounts.views import UserViewSet
-from posts.views import PostViewSet,FeedView
+from accounts.views import UserViewSet, AsyncUserDetailView
+from posts.views import PostViewSet, FeedView, AsyncFeedView, AsyncPostListView, AsyncPostDetailView
 from interactions.views import CommentViewSet
-from notifications.views import NotificationViewSet
-from admin_panel.views import AdminUserViewSet, AdminPostViewSet, AdminStatsView
+from notifications.views import NotificationViewSet, AsyncNotificationListView
+from admin_panel.views import AdminUserViewSet, AdminPostViewSet, AdminPurgeJobViewSet, AdminStatsView, AdminStatsSeriesView
+from .metrics import metrics_view
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -33,6 +35,7 @@ router.register(r'comments', CommentViewSet, basename='comment')
 router.register(r'notifications', NotificationViewSet, basename='notification')
 router.register(r'admin/users', AdminUserViewSet, basename='admin-user')
 router.register(r'admin/posts', AdminPostViewSet, basename='admin-post')
+router.register(r'admin/purge-jobs', AdminPurgeJobViewSet, basename='admin-purge-job')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -46,5 +49,19 @@ urlpatterns = [
     path('api/verify/<str:uidb64>/<str:token>/', VerifyEmailView.as_view(), name='verify-email'),
     path('api/feed/', FeedView.as_view(), name='feed'),
     path('api/admin/stats/', AdminStatsView.as_view(), name='admin_stats'),
+    path('api/admin/stats/daily/', AdminStatsSeriesView.as_view(), name='admin_stats_daily'),
     path('api/', include(router.urls)),
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Async GET handlers for the read-heavy endpoints, ahead of the router; other
+    # methods on these URLs are passed to the DRF views (see async_views).
+    detail_methods = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+    urlpatterns[:0] = [
+        path('api/feed/', AsyncFeedView.as_view(sync_view=FeedView.as_view()), name='feed'),
+        path('api/posts/', AsyncPostListView.as_view(sync_view=PostViewSet.as_view({'get': 'list', 'post': 'create'})), name='post-list'),
+        path('api/posts/<int:pk>/', AsyncPostDetailView.as_view(sync_view=PostViewSet.as_view(detail_methods)), name='post-detail'),
+        path('api/notifications/', AsyncNotificationListView.as_view(sync_view=NotificationViewSet.as_view({'get': 'list'})), name='notification-list'),
+        re_path(r'^api/users/(?P<pk>\d+|me)/$', AsyncUserDetailView.as_view(sync_view=UserViewSet.as_view(detail_methods)), name='user-detail'),
+    ]